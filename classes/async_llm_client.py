@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+
+import httpx
+
+from .circuit_breaker import CircuitOpenError
+from .llm_client import LLMClient, RETRYABLE_STATUS_CODES
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    asyncio variant of LLMClient.
+    aquery() shares one pooled httpx.AsyncClient between all in-flight requests and limits how many
+    are sent at once; timeouts, retries, backoff and the circuit breaker behave as in LLMClient.
+    The pool holds at least max_concurrency connections, so admitted requests do not queue for one.
+    """
+    def __init__(self,
+                 llm_api_url: str,
+                 llm_model_name: str,
+                 max_concurrency: int = 32,
+                 transport: httpx.AsyncBaseTransport = None,
+                 **kwargs):
+        """
+        :param max_concurrency: Maximum number of requests in flight to the LLM API.
+        :param transport: Optional httpx transport (e.g. for testing).
+        :param kwargs: Timeout, retry, pool and circuit breaker settings accepted by LLMClient;
+            pool_size is raised to max_concurrency if it is smaller.
+        """
+        super().__init__(llm_api_url, llm_model_name, **kwargs)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.transport = transport
+        self._async_client = None  # created on first use, inside the running event loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.logger = logging.getLogger(__name__)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=self._pool_limits(),
+                transport=self.transport)
+        return self._async_client
+
+    def _pool_limits(self) -> httpx.Limits:
+        # A smaller pool would make requests past the semaphore wait for a connection and hit PoolTimeout
+        connections = max(self.pool_size, self.max_concurrency)
+        return httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _apost(self, payload: dict, headers: dict) -> httpx.Response:
+        """Async counterpart of LLMClient._post."""
+        if not self.circuit_breaker.allow_request():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(f"Circuit breaker is open for {self.llm_api_url}")
+
+        client = self._get_async_client()
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                response = await client.post(self.llm_api_url, headers=headers, content=json.dumps(payload))
+                response.raise_for_status()
+            except httpx.PoolTimeout:
+                # No connection was free in our own pool; the backend was never contacted
+                self.logger.warning(f"Timed out waiting for a connection to {self.llm_api_url}")
+                raise
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()  # the backend is up, the request itself was rejected
+                    raise
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    self.circuit_breaker.record_failure()
+                    raise
+                delay = self._backoff_delay(attempt)
+                self._count("retries")
+                self.logger.warning(f"LLM request failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self.circuit_breaker.record_success()
+            return response
+
+    async def aquery(self, prompt: str):
+        """
+        Sends a query to the local LLM API without blocking the event loop.
+        :param prompt: User query string
+        :return: LLM response text
+        """
+        payload = self._build_payload(prompt)
+        headers = {"Content-Type": "application/json"}
+
+        with self.tracer.span("llm.query", model=self.llm_model_name) as span:
+            try:
+                async with self._semaphore:
+                    response = await self._apost(payload, headers)
+                return response.json().get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                if span is not None:
+                    span.error = type(e).__name__
+                self.logger.error(f"Error querying LLM: {e}")
+                return "Error: Could not connect to the LLM."
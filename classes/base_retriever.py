@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+import threading
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .hnsw_index_config import HNSWIndexConfig
+from .index_manifest import IndexManifest
+from .text_encoder import TextEncoder
+from .tracer import Tracer
+
+
+class BaseRetriever(ABC):
+    """
+    Interface of the retriever backends.
+
+    Subclasses implement query(); query embedding (with the TextEncoder used at indexing time), the
+    query embedding cache, index revisions and the conversion of (id, similarity, metadata) rows into
+    result dicts are shared so every backend returns the same results for the same scores.
+
+    Scores are similarities (higher is better, 1 for identical vectors) whatever the collection's
+    distance space. Results below score_threshold are dropped and, with relative_cutoff, results
+    scoring below relative_cutoff x the best score of the query as well.
+
+    The encoder is acquired on first use, so a backend opens its index while a background warm-up
+    is still loading the model.
+    """
+
+    def __init__(self, embedding_model_name: str,
+                 collection_name: str,
+                 vectordb_dir: str,
+                 score_threshold: float = 0.5,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 index_config: Optional[HNSWIndexConfig] = None,
+                 relative_cutoff: Optional[float] = None):
+        """
+        :param score_threshold: Minimum similarity of a returned chunk.
+        :param relative_cutoff: Optional fraction of the best similarity a chunk must reach, e.g. 0.8.
+        """
+        self.embedding_model_name = embedding_model_name
+        self.vectordb_path = Path(vectordb_dir)
+        self.collection_name = collection_name
+        self.score_threshold = score_threshold  # Minimum similarity score for valid results
+        self.relative_cutoff = relative_cutoff
+        self.index_config = index_config or HNSWIndexConfig()
+        self._manifest_mtime = None
+        self._index_revision = None
+        self.tracer = Tracer.get()
+        self._embedding_model = None
+        self._encoder_lock = threading.Lock()
+        self.embedding_cache = embedding_cache
+        if self.embedding_cache is not None:
+            self.embedding_cache.set_model(embedding_model_name)  # drops entries from a different model
+        self.logger = logging.getLogger(__name__)
+
+    @abstractmethod
+    def query(self, search_phrase: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Returns up to top_k result dicts for the search phrase, best match first."""
+
+    @property
+    def embedding_model(self) -> TextEncoder:
+        """The shared encoder for embedding_model_name, acquired from the ModelRegistry on first use."""
+        if self._embedding_model is None:
+            with self._encoder_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = TextEncoder.get(self.embedding_model_name)
+        return self._embedding_model
+
+    def close(self):
+        """Releases the shared embedding model, if it was acquired; call when the retriever is no longer used."""
+        with self._encoder_lock:
+            if self._embedding_model is not None:
+                self._embedding_model = None
+                TextEncoder.release(self.embedding_model_name)
+
+    def query_batch(self, search_phrases: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Returns one result list per search phrase, in input order."""
+        return [self.query(search_phrase, top_k=top_k) for search_phrase in search_phrases]
+
+    @property
+    def index_revision(self) -> Optional[str]:
+        """Revision of the index manifest, used to invalidate caches after re-indexing. None if there is no manifest."""
+        manifest_file = self.vectordb_path / IndexManifest.FILE_NAME
+        try:
+            mtime = manifest_file.stat().st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._manifest_mtime:
+            self._index_revision = IndexManifest(self.vectordb_path, self.collection_name).revision
+            self._manifest_mtime = mtime
+        return self._index_revision
+
+    def embed_text(self, text: str) -> List[float]:
+        """Generates an embedding vector for the input text, reusing cached vectors for repeated queries."""
+        with self.tracer.span("retriever.embed_query") as span:
+            if self.embedding_cache is not None:
+                cached = self.embedding_cache.get(text)
+                if cached is not None:
+                    if span is not None:
+                        span.set(cached=True)
+                    return cached
+
+            embedding = self.embedding_model.encode([text])[0].tolist()
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(text, embedding)
+            return embedding
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Generates embedding vectors for several texts with a single model call, skipping cached ones."""
+        with self.tracer.span("retriever.embed_query", queries=len(texts)):
+            embeddings = [self.embedding_cache.get(text) if self.embedding_cache is not None else None for text in texts]
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                vectors = self.embedding_model.encode([texts[i] for i in missing]).tolist()
+                for i, vector in zip(missing, vectors):
+                    embeddings[i] = vector
+                    if self.embedding_cache is not None:
+                        self.embedding_cache.put(texts[i], vector)
+            return embeddings
+
+    def _to_similarities(self, distances) -> np.ndarray:
+        """Converts distances in the collection's space into similarities of the unit-length embeddings."""
+        distances = np.asarray(distances, dtype=np.float32)
+        if self.index_config.space == "l2":
+            return 1.0 - distances / 2.0  # Chroma's l2 is squared: 2 - 2 * cosine for unit vectors
+        return 1.0 - distances  # cosine and ip distances are 1 - similarity
+
+    def _build_results(self, ids, metadatas, similarities, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Converts the rows of one query, already ranked best first, into result dicts,
+        keeping only rows that pass the score filters.
+        """
+        similarities = np.asarray(similarities, dtype=np.float32)[:top_k]
+        keep = similarities >= self.score_threshold
+        if self.relative_cutoff is not None and similarities.size:
+            keep &= similarities >= similarities.max() * self.relative_cutoff
+
+        return [{
+            "id": ids[i],
+            "score": round(float(similarities[i]), 4),
+            "context": metadatas[i].get("text", ""), # Chunk text
+            "source": metadatas[i].get("source", "Unknown"),
+            "chunk_index": metadatas[i].get("chunk_index", -1)
+        } for i in np.flatnonzero(keep)]
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import re
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Any, Iterable
+
+import numpy as np
+
+
+class BM25Index:
+    """
+    Lexical inverted index over the document chunks, scored with Okapi BM25.
+
+    Postings are kept in compressed-sparse-row form: for term t, doc_indices[term_offsets[t]:term_offsets[t + 1]]
+    are the chunks containing t and term_freqs the matching counts. They are stored as one compressed
+    .npz next to a JSON file with the vocabulary and the chunk texts of every source.
+    Chunk IDs match those used by EmbeddingLoader ("<stem>::chunk_<i>"), so results can be fused
+    with vector search results.
+    """
+    POSTINGS_FILE = "bm25_postings.npz"
+    CHUNKS_FILE = "bm25_chunks.json"
+    STOPWORDS = frozenset("a an and are as at be by for from has have in is it its of on or that the this to was were which with".split())
+
+    def __init__(self, index_dir: str, k1: float = 1.5, b: float = 0.75):
+        self.index_path = Path(index_dir)
+        self.k1 = k1
+        self.b = b
+        self.sources = {}  # stem -> list of chunk texts
+        self.revision = None
+        self._dirty = False
+        self._vocabulary = {}
+        self._ids = []
+        self._metadatas = []
+        self._term_offsets = np.zeros(1, dtype=np.int64)
+        self._doc_indices = np.zeros(0, dtype=np.int32)
+        self._term_freqs = np.zeros(0, dtype=np.uint16)
+        self._doc_lengths = np.zeros(0, dtype=np.int32)
+
+        self.logger = logging.getLogger(__name__)
+        self._load()
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Lowercased word tokens without stopwords; hyphenated names such as "anti-IgE" stay one token."""
+        return [token for token in re.findall(r"[a-z0-9]+(?:[-'][a-z0-9]+)*", text.lower()) if token not in cls.STOPWORDS]
+
+    def __len__(self):
+        return sum(len(chunks) for chunks in self.sources.values())
+
+    def exists(self) -> bool:
+        return (self.index_path / self.CHUNKS_FILE).exists()
+
+    def add_source(self, stem: str, chunks: List[str]):
+        """Adds or replaces the chunks of one source document."""
+        self.sources[stem] = list(chunks)
+        self._dirty = True
+
+    def remove_source(self, stem: str):
+        if self.sources.pop(stem, None) is not None:
+            self._dirty = True
+
+    def retain_sources(self, stems: Iterable[str]):
+        """Removes every source that is not in stems."""
+        keep = set(stems)
+        for stem in [stem for stem in self.sources if stem not in keep]:
+            self.remove_source(stem)
+            self.logger.info(f"Source {stem} no longer exists, removed from the lexical index.")
+
+    def save(self):
+        """Rebuilds the postings if sources changed and writes the index atomically."""
+        self._compile()
+        self.revision = uuid.uuid4().hex
+        self.index_path.mkdir(parents=True, exist_ok=True)
+
+        tmp_postings = self.index_path / f"{self.POSTINGS_FILE}.tmp"
+        with open(tmp_postings, "wb") as f:
+            np.savez_compressed(f, term_offsets=self._term_offsets, doc_indices=self._doc_indices,
+                                term_freqs=self._term_freqs, doc_lengths=self._doc_lengths)
+        os.replace(tmp_postings, self.index_path / self.POSTINGS_FILE)
+
+        tmp_chunks = self.index_path / f"{self.CHUNKS_FILE}.tmp"
+        vocabulary = sorted(self._vocabulary, key=self._vocabulary.get)
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            json.dump({"revision": self.revision, "vocabulary": vocabulary, "sources": self.sources}, f)
+        os.replace(tmp_chunks, self.index_path / self.CHUNKS_FILE)
+        self.logger.info(f"Saved lexical index with {len(self._ids)} chunks and {len(vocabulary)} terms to {self.index_path}")
+
+    def search(self, query_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Returns up to top_k chunks ranked by BM25 score, as dicts with id, score, context, source and chunk_index.
+        """
+        self._compile()
+        term_ids = {self._vocabulary[token] for token in self.tokenize(query_text) if token in self._vocabulary}
+        if not term_ids or not self._ids:
+            return []
+
+        num_docs = len(self._doc_lengths)
+        average_length = self._doc_lengths.mean()
+        length_norm = self.k1 * (1 - self.b + self.b * self._doc_lengths / average_length)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self._term_offsets[term_id], self._term_offsets[term_id + 1]
+            docs = self._doc_indices[start:end]
+            tf = self._term_freqs[start:end].astype(np.float32)
+            idf = np.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        k = min(top_k, len(matched))
+        if k == 0:
+            return []
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": self._ids[i], "score": round(float(scores[i]), 4), **self._metadatas[i]} for i in top]
+
+    def _compile(self):
+        """Rebuilds the CSR postings from the source texts."""
+        if not self._dirty:
+            return
+        vocabulary, ids, metadatas, lengths = {}, [], [], []
+        postings = {}  # term id -> list of (doc index, tf)
+        for stem in sorted(self.sources):
+            for chunk_index, text in enumerate(self.sources[stem]):
+                doc_index = len(ids)
+                ids.append(f"{stem}::chunk_{chunk_index}")
+                metadatas.append({"context": text, "source": stem, "chunk_index": chunk_index})
+                tokens = self.tokenize(text)
+                lengths.append(len(tokens))
+                for token, tf in Counter(tokens).items():
+                    term_id = vocabulary.setdefault(token, len(vocabulary))
+                    postings.setdefault(term_id, []).append((doc_index, tf))
+
+        counts = np.array([len(postings[t]) for t in range(len(vocabulary))], dtype=np.int64)
+        self._term_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        flat = [entry for t in range(len(vocabulary)) for entry in postings[t]]
+        self._doc_indices = np.array([doc for doc, _ in flat], dtype=np.int32)
+        self._term_freqs = np.minimum([tf for _, tf in flat], np.iinfo(np.uint16).max).astype(np.uint16)
+        self._doc_lengths = np.array(lengths, dtype=np.int32)
+        self._vocabulary, self._ids, self._metadatas = vocabulary, ids, metadatas
+        self._dirty = False
+
+    def _load(self):
+        chunks_file = self.index_path / self.CHUNKS_FILE
+        postings_file = self.index_path / self.POSTINGS_FILE
+        if not chunks_file.exists() or not postings_file.exists():
+            return
+        try:
+            with open(chunks_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with np.load(postings_file) as postings:
+                self._term_offsets = postings["term_offsets"]
+                self._doc_indices = postings["doc_indices"]
+                self._term_freqs = postings["term_freqs"]
+                self._doc_lengths = postings["doc_lengths"]
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Could not read lexical index in {self.index_path}, starting fresh: {e}")
+            return
+
+        self.sources = data["sources"]
+        self.revision = data.get("revision")
+        self._vocabulary = {term: i for i, term in enumerate(data["vocabulary"])}
+        # IDs and metadata follow the same sorted-source order used by _compile
+        self._ids, self._metadatas = [], []
+        for stem in sorted(self.sources):
+            for chunk_index, text in enumerate(self.sources[stem]):
+                self._ids.append(f"{stem}::chunk_{chunk_index}")
+                self._metadatas.append({"context": text, "source": stem, "chunk_index": chunk_index})
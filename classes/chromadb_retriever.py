@@ -1,54 +1,58 @@
 import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import Dict, List, Any
-from pathlib import Path
+from typing import Dict, List, Any, Optional
 import logging
 
-class ChromaDBRetriever:
+from .base_retriever import BaseRetriever
+from .embedding_cache import EmbeddingCache
+from .hnsw_index_config import HNSWIndexConfig
+
+class ChromaDBRetriever(BaseRetriever):
     """Retrieves relevant document chunks from ChromaDB based on a search phrase."""
 
     def __init__(self, embedding_model_name: str,
                  collection_name: str,
                  vectordb_dir: str,
-                 score_threshold: float = 0.5):
-
-        self.vectordb_path = Path(vectordb_dir)
+                 score_threshold: float = 0.5,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 index_config: Optional[HNSWIndexConfig] = None,
+                 relative_cutoff: Optional[float] = None):
+        super().__init__(embedding_model_name, collection_name, vectordb_dir, score_threshold, embedding_cache, index_config, relative_cutoff)
         self.client = chromadb.PersistentClient(path=str(self.vectordb_path))
-        self.collection = self.client.get_or_create_collection(name=collection_name)
-        self.embedding_model = SentenceTransformer(embedding_model_name)
-        self.score_threshold = score_threshold  # Minimum similarity score for valid results
+        self.collection = self.index_config.get_or_create_collection(self.client, collection_name)
 
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"Initialized ChromaDBRetriever: embedding_model_name: {embedding_model_name}, collection_name: {collection_name}, score_threshold: {score_threshold}")
-
-    def embed_text(self, text: str) -> List[float]:
-        """Generates an embedding vector for the input text."""
-        return self.embedding_model.encode(text, normalize_embeddings=True).tolist()
+        self.logger.info(f"Initialized ChromaDBRetriever: embedding_model_name: {embedding_model_name}, collection_name: {collection_name}, score_threshold: {score_threshold}, relative_cutoff: {relative_cutoff}, {self.index_config}")
 
     def query(self, search_phrase: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Queries ChromaDB collection and returns structured results of relevant chunks.
         """
-        embedding_vector = self.embed_text(search_phrase)
-        results = self.collection.query(query_embeddings=[embedding_vector], n_results=top_k,
-            include=["metadatas", "distances"] # Adding metadatas and distances to query
-        )
-
-        # Parse results
-        retrieved_docs = []
-        for doc_id, metadata, distance in zip(results.get("ids", [[]])[0], results.get("metadatas", [[]])[0], results.get("distances", [[]])[0]):
-            if distance < self.score_threshold:
-                continue  # Skip low-confidence matches
-            
-            retrieved_docs.append({
-                "id": doc_id,
-                "score": round(distance, 4),
-                "context": metadata.get("text", ""), # Chunk text
-                "source": metadata.get("source", "Unknown"),
-                "chunk_index": metadata.get("chunk_index", -1)
-            })  
-
-        # Sort by score (lower is better in similarity searches)
-        retrieved_docs.sort(key=lambda x: x["score"])
-
-        return retrieved_docs[:top_k]
+        with self.tracer.span("retriever.query", backend="chroma", top_k=top_k):
+            embedding_vector = self.embed_text(search_phrase)
+            with self.tracer.span("retriever.search", backend="chroma"):
+                results = self.collection.query(query_embeddings=[embedding_vector], n_results=top_k,
+                    include=["metadatas", "distances"] # Adding metadatas and distances to query
+                )
+            return self._parse_results(results, 0, top_k)
+
+    def query_batch(self, search_phrases: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Queries ChromaDB for several search phrases at once: all phrases are embedded in one model call
+        and sent as a single collection query. Returns one result list per phrase, in input order.
+        """
+        if not search_phrases:
+            return []
+        with self.tracer.span("retriever.query_batch", backend="chroma", queries=len(search_phrases), top_k=top_k):
+            embedding_vectors = self.embed_texts(search_phrases)
+            with self.tracer.span("retriever.search", backend="chroma", queries=len(search_phrases)):
+                results = self.collection.query(query_embeddings=embedding_vectors, n_results=top_k,
+                    include=["metadatas", "distances"]
+                )
+            return [self._parse_results(results, i, top_k) for i in range(len(search_phrases))]
+
+    def _parse_results(self, results: Dict[str, Any], query_index: int, top_k: int) -> List[Dict[str, Any]]:
+        """Converts the collection results of one query into result dicts."""
+        ids = (results.get("ids") or [[]] * (query_index + 1))[query_index]
+        metadatas = (results.get("metadatas") or [[]] * (query_index + 1))[query_index]
+        distances = (results.get("distances") or [[]] * (query_index + 1))[query_index]
+        return self._build_results(ids, metadatas, self._to_similarities(distances), top_k)
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a backend is down.
+    After failure_threshold consecutive failures the circuit opens and requests are rejected.
+    Once reset_timeout seconds have passed, one trial request is let through (half-open):
+    success closes the circuit again, failure re-opens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True  # the single trial request
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                self.logger.info("Circuit breaker closed.")
+            self._state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    self.logger.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive failures.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+            }
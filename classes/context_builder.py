@@ -0,0 +1,123 @@
+import logging
+import re
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into the LLM context under a token budget.
+
+    Chunks are taken in the order the retriever ranked them. A chunk that is a near-duplicate of one
+    already packed is dropped, and text a chunk shares with an earlier neighbour from the same
+    source (the splitter's chunk overlap) is trimmed before its tokens are counted.
+    """
+
+    SEPARATOR = "\n---\n"
+
+    def __init__(self,
+                 max_context_tokens: int = 2048,
+                 tokenizer_name: str = None,
+                 overlap_chars: int = 150,
+                 min_overlap_chars: int = 20,
+                 duplicate_threshold: float = 0.9,
+                 chars_per_token: float = 4.0):
+        """
+        :param max_context_tokens: Token budget for the joined context (the instruction template is not included).
+        :param tokenizer_name: Hugging Face tokenizer used to count tokens; None estimates from the character count.
+        :param overlap_chars: Longest prefix of a chunk that may repeat the end of its neighbour.
+        :param min_overlap_chars: Shortest shared text that is treated as splitter overlap.
+        :param duplicate_threshold: Word-set Jaccard similarity above which a chunk counts as a duplicate.
+        :param chars_per_token: Characters per token for the estimate used without a tokenizer.
+        """
+        self.max_context_tokens = int(max_context_tokens)
+        self.tokenizer_name = tokenizer_name
+        self.overlap_chars = overlap_chars
+        self.min_overlap_chars = min_overlap_chars
+        self.duplicate_threshold = duplicate_threshold
+        self.chars_per_token = chars_per_token
+        self._tokenizer = None
+        self._tokenizer_failed = False
+
+        self.logger = logging.getLogger(__name__)
+        self.logger.info(f"Initialized ContextBuilder: max_context_tokens: {self.max_context_tokens}, "
+                         f"tokenizer_name: {tokenizer_name or f'estimate ({chars_per_token} chars per token)'}, "
+                         f"overlap_chars: {overlap_chars}")
+
+    @property
+    def tokenizer(self):
+        """Loads the tokenizer on first use; falls back to the character estimate if it cannot be loaded."""
+        if self._tokenizer is None and self.tokenizer_name and not self._tokenizer_failed:
+            try:
+                from transformers import AutoTokenizer
+                from .model_registry import ModelRegistry
+                self._tokenizer = ModelRegistry.get().acquire("tokenizer", self.tokenizer_name,
+                                                              lambda: AutoTokenizer.from_pretrained(self.tokenizer_name))
+            except Exception as e:
+                self._tokenizer_failed = True
+                self.logger.warning(f"Could not load tokenizer {self.tokenizer_name}, estimating token counts: {e}")
+        return self._tokenizer
+
+    def close(self):
+        """Releases the shared tokenizer, if it was loaded."""
+        if self._tokenizer is not None:
+            from .model_registry import ModelRegistry
+            self._tokenizer = None
+            ModelRegistry.get().release("tokenizer", self.tokenizer_name)
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        return max(1, round(len(text) / self.chars_per_token))
+
+    def build(self, retrieved_docs: list):
+        """
+        Packs the retrieved chunks into one context string.
+        :return: (context, list of the docs that were packed, context token count)
+        """
+        separator_tokens = self.count_tokens(self.SEPARATOR)
+        packed, texts, word_sets = [], [], []
+        used_tokens = 0
+        for doc in retrieved_docs:
+            text = (doc.get("context") or "").strip()
+            if not text:
+                continue
+
+            words = set(re.findall(r"\w+", text.lower()))
+            if any(self._jaccard(words, seen) >= self.duplicate_threshold for seen in word_sets):
+                self.logger.debug(f"Dropping near-duplicate chunk {doc.get('id', 'N/A')}")
+                continue
+
+            text = self._trim_overlap(text, doc, packed, texts)
+            tokens = self.count_tokens(text) + (separator_tokens if texts else 0)
+            if used_tokens + tokens > self.max_context_tokens:
+                self.logger.debug(f"Chunk {doc.get('id', 'N/A')} ({tokens} tokens) does not fit the remaining budget")
+                continue
+
+            packed.append(doc)
+            texts.append(text)
+            word_sets.append(words)
+            used_tokens += tokens
+
+        self.logger.info(f"Packed {len(packed)}/{len(retrieved_docs)} chunk(s) into {used_tokens}/{self.max_context_tokens} context tokens")
+        return self.SEPARATOR.join(texts), packed, used_tokens
+
+    def _trim_overlap(self, text: str, doc: dict, packed: list, texts: list) -> str:
+        """Removes text at either end of a chunk that repeats a packed neighbour from the same source."""
+        for other_doc, other_text in zip(packed, texts):
+            if other_doc.get("source") != doc.get("source"):
+                continue
+            for size in range(min(self.overlap_chars, len(text), len(other_text)), self.min_overlap_chars - 1, -1):
+                if other_text.endswith(text[:size]):  # this chunk follows the packed one
+                    text = text[size:].lstrip()
+                    break
+                if other_text.startswith(text[-size:]):  # this chunk precedes the packed one
+                    text = text[:-size].rstrip()
+                    break
+        return text
+
+    @staticmethod
+    def _jaccard(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from sentence_transformers import CrossEncoder
+
+from .embedding_cache import EmbeddingCache
+from .model_registry import ModelRegistry
+
+
+class CrossEncoderReranker:
+    """
+    Re-ranks retrieved chunks with a cross-encoder and keeps only the best few.
+
+    At most max_candidates chunks are scored, in batches on the CPU. If max_latency_ms runs out between
+    batches, the chunks not yet scored stay after the scored ones in their retrieval order. Scores are
+    cached per (normalized query, chunk ID) in a bounded LRU. The model is shared per process through
+    the ModelRegistry.
+    """
+    REGISTRY_KIND = "cross_encoder"
+
+    def __init__(self,
+                 model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 top_n: int = 3,
+                 max_candidates: int = 20,
+                 batch_size: int = 16,
+                 max_latency_ms: Optional[float] = None,
+                 cache_size: int = 4096,
+                 device: str = "cpu"):
+        """
+        :param top_n: Number of chunks returned after re-ranking.
+        :param max_candidates: Number of retrieved chunks that are scored; the retriever is asked for this many.
+        :param batch_size: Query/chunk pairs scored per model call.
+        :param max_latency_ms: Time budget for scoring one query; None scores every candidate.
+        :param cache_size: Maximum number of cached (query, chunk ID) scores.
+        """
+        self.model_name = model_name
+        self.top_n = max(1, int(top_n))
+        self.max_candidates = max(self.top_n, int(max_candidates))
+        self.batch_size = max(1, int(batch_size))
+        self.max_latency_ms = max_latency_ms
+        self.cache_size = max(0, int(cache_size))
+        self.model = ModelRegistry.get().acquire(self.REGISTRY_KIND, model_name, lambda: CrossEncoder(model_name, device=device))
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self._scores = OrderedDict()  # (normalized query, chunk ID) -> score
+        self._lock = threading.Lock()
+
+        self.logger = logging.getLogger(__name__)
+        self.logger.info(f"Initialized CrossEncoderReranker: model_name: {model_name}, top_n: {self.top_n}, "
+                         f"max_candidates: {self.max_candidates}, max_latency_ms: {max_latency_ms}")
+
+    @classmethod
+    def preload(cls, model_name: str, device: str = "cpu"):
+        """Loads the shared cross-encoder without holding it, e.g. from ModelRegistry.warmup()."""
+        ModelRegistry.get().preload(cls.REGISTRY_KIND, model_name, lambda: CrossEncoder(model_name, device=device))
+
+    def close(self):
+        """Releases the shared cross-encoder; call when re-ranking is done."""
+        if self.model is not None:
+            self.model = None
+            ModelRegistry.get().release(self.REGISTRY_KIND, self.model_name)
+
+    def rerank(self, query_text: str, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Returns the top_n chunks by cross-encoder score, each with an added "rerank_score".
+        """
+        start_time = time.perf_counter()
+        candidates = retrieved_docs[:self.max_candidates]
+        query_key = EmbeddingCache.normalize(query_text)
+        scores = {}
+        with self._lock:
+            for doc in candidates:
+                score = self._scores.get((query_key, doc["id"]))
+                if score is not None:
+                    self._scores.move_to_end((query_key, doc["id"]))
+                    scores[doc["id"]] = score
+            self.hits += len(scores)
+            self.misses += len(candidates) - len(scores)
+
+        unscored = [doc for doc in candidates if doc["id"] not in scores]
+        for i in range(0, len(unscored), self.batch_size):
+            if i > 0 and self.max_latency_ms is not None and (time.perf_counter() - start_time) * 1000 > self.max_latency_ms:
+                self.timeouts += 1
+                self.logger.warning(f"Re-ranking stopped after {i} of {len(unscored)} uncached candidates (latency cap {self.max_latency_ms}ms).")
+                break
+            batch = unscored[i:i + self.batch_size]
+            batch_scores = self.model.predict([(query_text, doc.get("context", "")) for doc in batch],
+                                              batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for doc, score in zip(batch, batch_scores):
+                    scores[doc["id"]] = float(score)
+                    self._store(query_key, doc["id"], float(score))
+
+        # Scored chunks by score, then any chunks the latency cap left unscored, in retrieval order
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (candidates[i]["id"] not in scores, -scores.get(candidates[i]["id"], 0.0), i))
+        reranked = [dict(candidates[i], rerank_score=round(scores[candidates[i]["id"]], 4) if candidates[i]["id"] in scores else None)
+                    for i in order[:self.top_n]]
+
+        self.logger.info(f"Re-ranked {len(candidates)} candidate(s) to {len(reranked)} in {(time.perf_counter() - start_time) * 1000:.1f}ms")
+        return reranked
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._scores), "hits": self.hits, "misses": self.misses, "timeouts": self.timeouts,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    def _store(self, query_key: str, chunk_id: str, score: float):
+        if self.cache_size == 0:
+            return
+        self._scores[(query_key, chunk_id)] = score
+        self._scores.move_to_end((query_key, chunk_id))
+        while len(self._scores) > self.cache_size:
+            self._scores.popitem(last=False)
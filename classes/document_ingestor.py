@@ -1,4 +1,6 @@
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pdfplumber
 from transformers import AutoTokenizer
@@ -6,35 +8,73 @@ from transformers import AutoTokenizer
 import json
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from .bm25_index import BM25Index
+from .model_registry import ModelRegistry
+from .tracer import Tracer
+
 
 class DocumentIngestor:
     def __init__(self,
                  file_list,
                  input_dir,
                  output_dir,
-                 embedding_model_name):
+                 embedding_model_name,
+                 num_workers: int = 1,
+                 lexical_index: BM25Index = None,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 150,
+                 tokenizer_factory=None):
         """
         Initializes the document ingestor.
 
         :param file_list: List of file paths to process.
         :param output_dir: Directory to save cleaned text files.
         :param model_name: Hugging Face tokenizer model for preprocessing.
+        :param num_workers: Number of worker processes; 1 processes files in the current process.
+        :param lexical_index: Optional BM25 index that receives the chunks of every ingested file.
+        :param chunk_size: Maximum characters per chunk.
+        :param chunk_overlap: Characters shared by consecutive chunks.
+        :param tokenizer_factory: Called with the model name to load the tokenizer; None uses AutoTokenizer.from_pretrained.
+            It is sent to the worker processes, so it must be picklable (e.g. a module-level function or class).
         """
         self.file_list = file_list
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.tokenizer = AutoTokenizer.from_pretrained(embedding_model_name)
+        self.embedding_model_name = embedding_model_name
+        self.num_workers = max(1, int(num_workers))
+        self.lexical_index = lexical_index
+        self.chunk_size = int(chunk_size)
+        self.chunk_overlap = int(chunk_overlap)
+        self.tokenizer_factory = tokenizer_factory
+        self._tokenizer = None  # loaded on first use, so the parent of a worker pool never loads it
+        self.tracer = Tracer.get()
         
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=150,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len
         )
 
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"Initialized DocumentIngestor: input_dir: {self.input_dir}"
-                         f"output_dir: {self.output_dir}, embedding_model_name: {embedding_model_name}")
+                         f"output_dir: {self.output_dir}, embedding_model_name: {embedding_model_name}, num_workers: {self.num_workers}, "
+                         f"chunk_size: {self.chunk_size}, chunk_overlap: {self.chunk_overlap}")
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            # Shared with the TextEncoder of the same model, so a fused pipeline loads it once
+            tokenizer_factory = self.tokenizer_factory or AutoTokenizer.from_pretrained
+            self._tokenizer = ModelRegistry.get().acquire("tokenizer", self.embedding_model_name,
+                                                          lambda: tokenizer_factory(self.embedding_model_name))
+        return self._tokenizer
+
+    def close(self):
+        """Releases the shared tokenizer, if it was loaded; call when ingestion is done."""
+        if self._tokenizer is not None:
+            self._tokenizer = None
+            ModelRegistry.get().release("tokenizer", self.embedding_model_name)
 
     def _extract_text_from_pdf(self, file_path):
         """Extracts text from a PDF file using pdfplumber."""
@@ -67,35 +107,124 @@ class DocumentIngestor:
         tokens = self.tokenizer.tokenize(text)
         return self.tokenizer.convert_tokens_to_string(tokens)
 
+    def ingest_file(self, file_name):
+        """
+        Extracts, cleans and chunks a single file.
+        :return: List of chunks, or None if the file was skipped.
+        """
+        file_path = Path(self.input_dir/file_name)
+        if not file_path.exists():
+            self.logger.warning(f"File not found: {file_path}")
+            return None
+
+        self.logger.info(f"Processing file: {file_path}")
+
+        if file_path.suffix.lower() == ".pdf":
+            text = self._extract_text_from_pdf(file_path)
+        elif file_path.suffix.lower() == ".txt":
+            text = self._extract_text_from_txt(file_path)
+        else:
+            self.logger.warning(f"Unsupported file type: {file_path.suffix}")
+            return None
+
+        cleaned_text = self._clean_text(text)
+        
+        # Adding chunking
+        if cleaned_text:
+            return self.text_splitter.split_text(cleaned_text)
+        else:
+            self.logger.warning(f"Skipping {file_path} due to extraction failure or empty content.")
+            return None
+
+    def save_chunks(self, file_name, chunks):
+        """Saves chunks to a JSON file named after the input file."""
+        output_file = self.output_dir / f"{Path(file_name).stem}_cleaned_chunks.json"
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(chunks, f, indent=4)
+        self.logger.info(f"Saved {len(chunks)} chunks to {output_file}")
+        return output_file
+
+    def iter_ingested_files(self):
+        """
+        Yields (file_name, chunks, elapsed_seconds) for every file, in input order.
+        chunks is None for files that were skipped or failed.
+        Files are ingested in a worker pool when num_workers > 1.
+        """
+        if self.num_workers <= 1 or len(self.file_list) <= 1:
+            for file_name in self.file_list:
+                start_time = time.perf_counter()
+                try:
+                    chunks = self.ingest_file(file_name)
+                except Exception as e:
+                    self.logger.error(f"Failed to ingest {file_name}: {e}")
+                    chunks = None
+                elapsed = time.perf_counter() - start_time
+                self._record_file(file_name, chunks, elapsed)
+                yield file_name, chunks, elapsed
+            return
+
+        num_workers = min(self.num_workers, len(self.file_list))
+        self.logger.info(f"Ingesting {len(self.file_list)} files with {num_workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 initializer=_init_worker,
+                                 initargs=(str(self.input_dir), str(self.output_dir), self.embedding_model_name,
+                                           self.chunk_size, self.chunk_overlap, self.tokenizer_factory)) as executor:
+            futures = [executor.submit(_ingest_file_in_worker, file_name) for file_name in self.file_list]
+            # Collect results in submission order so output and logs follow the input file order
+            for file_name, future in zip(self.file_list, futures):
+                try:
+                    chunks, elapsed = future.result()
+                except Exception as e:
+                    self.logger.error(f"Failed to ingest {file_name}: {e}")
+                    chunks, elapsed = None, 0.0
+                self._record_file(file_name, chunks, elapsed)
+                yield file_name, chunks, elapsed
+
+    def _record_file(self, file_name, chunks, elapsed):
+        # Files may be ingested in worker processes, so the measured time is recorded instead of a span
+        self.tracer.record("ingest.file", elapsed, file=str(file_name), chunks=None if chunks is None else len(chunks))
+
     def process_files(self):
         """Processes the list of files, extracts, cleans, and saves them."""
-        for file_path in self.file_list:
-            file_path = Path(self.input_dir/file_path)
-            if not file_path.exists():
-                self.logger.warning(f"File not found: {file_path}")
-                continue
-
-            self.logger.info(f"Processing file: {file_path}")
-
-            if file_path.suffix.lower() == ".pdf":
-                text = self._extract_text_from_pdf(file_path)
-            elif file_path.suffix.lower() == ".txt":
-                text = self._extract_text_from_txt(file_path)
-            else:
-                self.logger.warning(f"Unsupported file type: {file_path.suffix}")
-                continue
-
-            cleaned_text = self._clean_text(text)
-            
-            # Adding chunking
-            if cleaned_text:
-                chunks = self.text_splitter.split_text(cleaned_text)
-                
-                # Save chunks to a JSON file
-                output_file = self.output_dir / f"{file_path.stem}_cleaned_chunks.json"
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(chunks, f, indent=4)
-                self.logger.info(f"Saved {len(chunks)} chunks to {output_file}")
-            else:
-                self.logger.warning(f"Skipping {file_path} due to extraction failure or empty content.")
+        for file_name, chunks, elapsed in self.iter_ingested_files():
+            if chunks is not None:
+                self.save_chunks(file_name, chunks)
+                self.index_chunks(file_name, chunks)
+            self._log_file_timing(file_name, None if chunks is None else len(chunks), elapsed)
+        self.save_lexical_index()
+
+    def index_chunks(self, file_name, chunks):
+        """Adds the chunks of a file to the lexical index, replacing any earlier version."""
+        if self.lexical_index is not None:
+            with self.tracer.span("ingest.lexical_index", file=str(file_name)):
+                self.lexical_index.add_source(Path(file_name).stem, chunks)
+
+    def save_lexical_index(self):
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+
+    def _log_file_timing(self, file_name, num_chunks, elapsed):
+        if num_chunks is None:
+            self.logger.info(f"Skipped {file_name} after {elapsed:.2f}s")
+        else:
+            self.logger.info(f"Ingested {file_name} in {elapsed:.2f}s ({num_chunks} chunks)")
+
+
+# Per-process ingestor used by the worker pool, created once by _init_worker
+_worker_ingestor = None
+
+def _init_worker(input_dir, output_dir, embedding_model_name, chunk_size, chunk_overlap, tokenizer_factory):
+    global _worker_ingestor
+    _worker_ingestor = DocumentIngestor(file_list=[],
+                                        input_dir=input_dir,
+                                        output_dir=output_dir,
+                                        embedding_model_name=embedding_model_name,
+                                        chunk_size=chunk_size,
+                                        chunk_overlap=chunk_overlap,
+                                        tokenizer_factory=tokenizer_factory)
+    _worker_ingestor.tokenizer  # load the tokenizer once per worker, before the first file arrives
 
+def _ingest_file_in_worker(file_name):
+    start_time = time.perf_counter()
+    chunks = _worker_ingestor.ingest_file(file_name)
+    return chunks, time.perf_counter() - start_time
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from .utilities import delete_directory
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache mapping normalized query text to its embedding.
+    Entries expire after ttl_seconds; an optional on-disk layer survives process restarts. When it holds
+    more than max_disk_entries files, expired ones and then the oldest are deleted down to 90% of the limit.
+    The whole cache is invalidated when the embedding model changes.
+    """
+    MODEL_MARKER_FILE = "model_name.txt"
+
+    def __init__(self,
+                 model_name: str,
+                 max_size: int = 1024,
+                 ttl_seconds: Optional[float] = None,
+                 cache_dir: Optional[str] = None,
+                 max_disk_entries: int = 65536):
+        """
+        :param max_size: Maximum number of in-memory entries (least recently used are evicted first).
+        :param ttl_seconds: Entry lifetime; None keeps entries until evicted.
+        :param cache_dir: Directory for the on-disk layer; None keeps the cache in memory only.
+        :param max_disk_entries: Maximum number of files in the on-disk layer.
+        """
+        self.max_size = max(1, int(max_size))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._disk_entries = 0  # files in cache_dir, counted once and then tracked on write
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.model_name = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()  # key -> (created_at, embedding)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.set_model(model_name)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case- and whitespace-insensitive cache key."""
+        return " ".join(text.lower().split())
+
+    def set_model(self, model_name: str):
+        """Switches the cache to another embedding model, dropping entries computed with the old one."""
+        with self._lock:
+            if model_name == self.model_name:
+                return
+            self._entries.clear()
+            self.model_name = model_name
+            if self.cache_dir is not None:
+                marker = self.cache_dir / self.MODEL_MARKER_FILE
+                if marker.exists() and marker.read_text(encoding="utf-8") != model_name:
+                    self.logger.info(f"Embedding model changed to {model_name}, clearing {self.cache_dir}")
+                    delete_directory(self.cache_dir)
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                marker.write_text(model_name, encoding="utf-8")
+                self._disk_entries = sum(1 for _ in self.cache_dir.glob("*.npy"))
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, embedding = entry
+                if not self._expired(created_at, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+            embedding = self._read_disk(key, now)
+            if embedding is not None:
+                self._store(key, embedding, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: List[float]):
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            self._store(key, embedding, now)
+            self._write_disk(key, embedding)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.cache_dir is not None:
+                for cache_file in self.cache_dir.glob("*.npy"):
+                    cache_file.unlink(missing_ok=True)
+                self._disk_entries = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _store(self, key: str, embedding: List[float], now: float):
+        self._entries[key] = (now, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _disk_file(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.npy"
+
+    def _read_disk(self, key: str, now: float) -> Optional[List[float]]:
+        if self.cache_dir is None:
+            return None
+        cache_file = self._disk_file(key)
+        try:
+            if self._expired(cache_file.stat().st_mtime, now):
+                cache_file.unlink()
+                self._disk_entries -= 1
+                return None
+            return np.load(cache_file).tolist()
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, embedding: List[float]):
+        if self.cache_dir is None:
+            return
+        cache_file = self._disk_file(key)
+        try:
+            is_new = not cache_file.exists()
+            np.save(cache_file, np.asarray(embedding, dtype=np.float32))
+        except OSError as e:
+            self.logger.warning(f"Could not write query embedding cache entry: {e}")
+            return
+        if is_new:
+            self._disk_entries += 1
+            if self._disk_entries > self.max_disk_entries:
+                self._prune_disk(time.time())
+
+    def _prune_disk(self, now: float):
+        """Deletes expired files, then the oldest ones, until the on-disk layer is at 90% of max_disk_entries."""
+        files = []
+        for cache_file in self.cache_dir.glob("*.npy"):
+            try:
+                files.append((cache_file.stat().st_mtime, cache_file))
+            except OSError:
+                continue  # removed by another process
+        files.sort()
+        target = int(self.max_disk_entries * 0.9)
+        removed = 0
+        for index, (mtime, cache_file) in enumerate(files):
+            if len(files) - index <= target and not self._expired(mtime, now):
+                break
+            cache_file.unlink(missing_ok=True)
+            removed += 1
+        self._disk_entries = len(files) - removed
+        self.logger.info(f"Pruned {removed} query embedding cache files from {self.cache_dir}")
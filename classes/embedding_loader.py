@@ -2,7 +2,12 @@ import logging
 from pathlib import Path
 import chromadb
 import json
-from typing import List
+from typing import Iterable, List, Optional
+
+from .embedding_store import EmbeddingStore
+from .index_manifest import IndexManifest
+from .hnsw_index_config import HNSWIndexConfig
+from .tracer import Tracer
 
 class EmbeddingLoader:
     def __init__(self,
@@ -11,20 +16,40 @@ class EmbeddingLoader:
                  embeddings_dir: str,
                  vectordb_dir: str,
                  collection_name: str,
-                 batch_size: int = 100): # Increased batch size for efficiency
+                 batch_size: int = 100, # Increased batch size for efficiency
+                 incremental: bool = False,
+                 prune_missing_sources: bool = False,
+                 index_config: HNSWIndexConfig = None,
+                 source_stems: Optional[Iterable[str]] = None):
+        """
+        Initializes the embedding loader.
 
+        :param incremental: Upsert only new or changed chunks (by content hash) instead of adding everything.
+        :param prune_missing_sources: Delete stored chunks of sources that no longer exist.
+        :param index_config: Distance metric and HNSW parameters used when the collection is created.
+        :param source_stems: Stems of every current source document, used for pruning. None treats the cleaned
+            chunk files on disk as the sources, which misses sources indexed without intermediate files.
+        """
         self.cleaned_text_file_list = cleaned_text_file_list
         self.cleaned_text_path = Path(cleaned_text_dir)
         self.embeddings_path = Path(embeddings_dir)
         self.vectordb_path = Path(vectordb_dir)
         self.collection_name = collection_name
         self.batch_size = batch_size
+        self.incremental = incremental
+        self.prune_missing_sources = prune_missing_sources
+        self.source_stems = set(source_stems) if source_stems is not None else None
+        self.embedding_store = EmbeddingStore(self.embeddings_path)
 
         self.logger = logging.getLogger(__name__)
+        self.tracer = Tracer.get()
 
         # Initialize ChromaDB
         self.client = chromadb.PersistentClient(path=str(self.vectordb_path))
-        self.collection = self.client.get_or_create_collection(collection_name)
+        self.index_config = index_config or HNSWIndexConfig()
+        self.collection = self.index_config.get_or_create_collection(self.client, collection_name)
+        self.manifest = IndexManifest(self.vectordb_path, collection_name)
+        self.index_changed = False
 
     def process_files(self):
         """Loads chunks and embeddings and stores them in ChromaDB."""
@@ -32,48 +57,117 @@ class EmbeddingLoader:
             original_stem = cleaned_chunk_file.replace('_cleaned_chunks.json', '')
             
             chunk_file_path = self.cleaned_text_path / cleaned_chunk_file
-            embedding_file_path = self.embeddings_path / f"{original_stem}_embeddings.json"
             
-            if not chunk_file_path.exists() or not embedding_file_path.exists():
+            if not chunk_file_path.exists() or not self.embedding_store.exists(original_stem):
                 self.logger.warning(f"Missing files for {original_stem}, skipping.")
                 continue
 
             try:
                 with open(chunk_file_path, "r", encoding="utf-8") as f:
                     chunks = json.load(f)
-                with open(embedding_file_path, "r", encoding="utf-8") as f:
-                    embeddings = json.load(f)
+                # Binary embeddings are memory-mapped, so only the batch being added is read from disk
+                embeddings = self.embedding_store.load(original_stem)
 
                 if len(chunks) != len(embeddings):
                     self.logger.error(f"Mismatch between chunk count ({len(chunks)}) and embedding count ({len(embeddings)}) for {original_stem}.")
                     continue
 
-                if not chunks:
-                    self.logger.warning(f"No chunks found for {original_stem}, skipping.")
-                    continue
-                
-                self.logger.info(f"Storing {len(chunks)} chunks for {original_stem} in ChromaDB...")
-                
-                # Prepare data for batch insertion
-                ids = [f"{original_stem}::chunk_{i}" for i in range(len(chunks))]
-                metadatas = [
-                    {"text": chunk, "source": original_stem, "chunk_index": i}
-                    for i, chunk in enumerate(chunks)
-                ]
-                
-                # Add to collection in batches
-                for i in range(0, len(ids), self.batch_size):
-                    batch_ids = ids[i:i + self.batch_size]
-                    batch_embeddings = embeddings[i:i + self.batch_size]
-                    batch_metadatas = metadatas[i:i + self.batch_size]
-                    
-                    self.collection.add(
-                        ids=batch_ids,
-                        embeddings=batch_embeddings,
-                        metadatas=batch_metadatas
-                    )
-                
-                self.logger.info(f"Stored {original_stem} chunks successfully.")
+                self.store_chunks(original_stem, chunks, embeddings)
 
             except Exception as e:
-                self.logger.error(f"Failed to process and store {original_stem}: {e}")
\ No newline at end of file
+                self.logger.error(f"Failed to process and store {original_stem}: {e}")
+
+        if self.prune_missing_sources:
+            self.remove_missing_sources(keep_stems=self.source_stems)
+
+        self.finalize()
+
+    def store_chunks(self, original_stem: str, chunks: List[str], embeddings):
+        """Stores the chunks of one source, upserting only changed chunks in incremental mode."""
+        # Prepare data for batch insertion
+        ids = [f"{original_stem}::chunk_{i}" for i in range(len(chunks))]
+        chunk_hashes = {chunk_id: IndexManifest.hash_chunk(chunk, embedding)
+                        for chunk_id, chunk, embedding in zip(ids, chunks, embeddings)}
+        previous = self.manifest.get_source(original_stem) if self.incremental else None
+
+        if previous and previous["source_hash"] == IndexManifest.hash_source(chunk_hashes):
+            self.logger.info(f"{original_stem} is unchanged, skipping.")
+            return
+
+        if previous:
+            previous_hashes = previous["chunks"]
+            changed = [i for i, chunk_id in enumerate(ids) if previous_hashes.get(chunk_id) != chunk_hashes[chunk_id]]
+            stale_ids = [chunk_id for chunk_id in previous_hashes if chunk_id not in chunk_hashes]
+        else:
+            changed = list(range(len(ids)))
+            stale_ids = []
+
+        if stale_ids:
+            self._delete_ids(stale_ids)
+            self.logger.info(f"Deleted {len(stale_ids)} stale chunks for {original_stem}.")
+            self.index_changed = True
+
+        if not chunks:
+            self.logger.warning(f"No chunks found for {original_stem}, skipping.")
+            self.manifest.remove_source(original_stem)
+            return
+
+        self.logger.info(f"Storing {len(changed)} of {len(chunks)} chunks for {original_stem} in ChromaDB...")
+
+        # Upsert in incremental mode: Chroma ignores add() for existing IDs, which the collection may still
+        # hold when the manifest was reset or an earlier run failed partway
+        write = self.collection.upsert if self.incremental else self.collection.add
+        with self.tracer.span("vectordb.store", source=original_stem, chunks=len(changed)):
+            for i in range(0, len(changed), self.batch_size):
+                batch_indices = changed[i:i + self.batch_size]
+                batch_embeddings = self._take_rows(embeddings, batch_indices)
+                batch_metadatas = [
+                    {"text": chunks[j], "source": original_stem, "chunk_index": j}
+                    for j in batch_indices
+                ]
+
+                write(
+                    ids=[ids[j] for j in batch_indices],
+                    embeddings=batch_embeddings,
+                    metadatas=batch_metadatas
+                )
+
+        self.manifest.set_source(original_stem, chunk_hashes)
+        self.index_changed = True
+        self.logger.info(f"Stored {original_stem} chunks successfully.")
+
+    @staticmethod
+    def _take_rows(embeddings, indices: List[int]):
+        """Selects embedding rows, slicing contiguous ranges so memory-mapped matrices are not copied."""
+        if not hasattr(embeddings, "shape"):
+            return [embeddings[j] for j in indices]  # legacy JSON lists
+        if indices[-1] - indices[0] + 1 == len(indices):
+            return embeddings[indices[0]:indices[-1] + 1]
+        return embeddings[indices]
+
+    def remove_missing_sources(self, keep_stems=None):
+        """
+        Deletes chunks of sources that went away.
+        :param keep_stems: Sources to keep; defaults to those with a cleaned chunk file on disk.
+        """
+        for original_stem in self.manifest.sources():
+            if keep_stems is not None and original_stem in keep_stems:
+                continue
+            if keep_stems is None and (self.cleaned_text_path / f"{original_stem}_cleaned_chunks.json").exists():
+                continue
+            stale_ids = list(self.manifest.get_source(original_stem)["chunks"].keys())
+            self._delete_ids(stale_ids)
+            self.manifest.remove_source(original_stem)
+            self.index_changed = True
+            self.logger.info(f"Source {original_stem} no longer exists, deleted {len(stale_ids)} chunks.")
+
+    def _delete_ids(self, ids: List[str]):
+        for i in range(0, len(ids), self.batch_size):
+            self.collection.delete(ids=ids[i:i + self.batch_size])
+
+    def finalize(self):
+        """Saves the index manifest, bumping its version if the stored chunks changed."""
+        if self.index_changed:
+            self.manifest.bump_version()
+            self.index_changed = False
+        self.manifest.save()
@@ -1,8 +1,14 @@
 import json
 import logging
+import random
+import time
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModel
-import torch
+import numpy as np
+
+from .embedding_store import EmbeddingStore
+from .text_encoder import TextEncoder
+from .tracer import Tracer
+from .utilities import get_peak_rss_mb
 
 
 class EmbeddingPreparer:
@@ -10,21 +16,45 @@ class EmbeddingPreparer:
                  file_list,
                  input_dir,
                  output_dir,
-                 embedding_model_name):
+                 embedding_model_name,
+                 batch_size: int = 32,
+                 max_tokens_per_batch: int = 8192,
+                 storage_format: str = "npy",
+                 encoder: TextEncoder = None):
+        """
+        Initializes the embedding preparer.
+
+        :param file_list: List of chunk files to process.
+        :param batch_size: Maximum number of chunks per forward pass.
+        :param max_tokens_per_batch: Maximum padded tokens (chunks x longest chunk) per forward pass.
+        :param storage_format: "npy" for float32 binary files, "json" for legacy lists of floats.
+        :param encoder: Encoder shared with the retriever; defaults to the process-wide TextEncoder for the model.
+        """
         self.file_list = file_list
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.embedding_model_name = embedding_model_name
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.batch_size = max(1, int(batch_size))
+        self.max_tokens_per_batch = max(1, int(max_tokens_per_batch))
 
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.embedding_store = EmbeddingStore(self.output_dir, storage_format=storage_format)
 
         self.logger = logging.getLogger(__name__)
+        self.tracer = Tracer.get()
 
-        # Load model and tokenizer
-        self.tokenizer = AutoTokenizer.from_pretrained(self.embedding_model_name)
-        self.model = AutoModel.from_pretrained(self.embedding_model_name).to(self.device)
+        # The same encoder embeds queries, so stored and query vectors are comparable
+        self._owns_encoder = encoder is None  # only a registry reference taken here is released by close()
+        self.encoder = encoder or TextEncoder.get(self.embedding_model_name)
+        self.logger.info(f"Initialized EmbeddingPreparer: embedding_model_name: {embedding_model_name}, "
+                         f"batch_size: {self.batch_size}, max_tokens_per_batch: {self.max_tokens_per_batch}")
+
+    def close(self):
+        """Releases the shared encoder unless it was passed in; call when embedding is done."""
+        if self._owns_encoder:
+            self._owns_encoder = False
+            TextEncoder.release(self.embedding_model_name)
 
     def process_files(self):
         save_log_level = logging.getLogger().getEffectiveLevel()
@@ -39,7 +69,7 @@ class EmbeddingPreparer:
                 self.logger.info(f"Processing: {file_path}")
                 with open(file_path, "r", encoding="utf-8") as f:
                     chunks = json.load(f)
-                embeddings = self._generate_embeddings_for_chunks(chunks) # Generate embeddings for all chunks in the file
+                embeddings = self.generate_embeddings(chunks) # Generate embeddings for all chunks in the file
                 self._save_embeddings(file_path, embeddings)
                 
             except Exception as e:
@@ -47,18 +77,61 @@ class EmbeddingPreparer:
 
         logging.getLogger().setLevel(save_log_level)
 
-    def _generate_embeddings_for_chunks(self, chunks: list[str]) -> list[list[float]]:
-        inputs = self.tokenizer(chunks, return_tensors="pt", truncation=True, padding=True, max_length=512).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        embeddings = outputs.last_hidden_state.mean(dim=1)
-        return embeddings.cpu().numpy().tolist()
-
-    def _save_embeddings(self, file_path: Path, embeddings: list[list[float]]):
-        output_filename = f"{file_path.stem.replace('_cleaned_chunks', '')}_embeddings.json"
-        output_file = self.output_dir / output_filename
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(embeddings, f) # Save list of floats
+    def generate_embeddings(self, chunks: list[str]) -> np.ndarray:
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+
+        start_time = time.perf_counter()
+        with self.tracer.span("embed.generate", chunks=len(chunks)):
+            embeddings = self.encoder.encode(chunks, batch_size=self.batch_size, max_tokens_per_batch=self.max_tokens_per_batch)
+
+        elapsed = time.perf_counter() - start_time
+        peak_rss = get_peak_rss_mb()
+        self.logger.info(f"Embedded {len(chunks)} chunks in {elapsed:.2f}s "
+                         f"({len(chunks) / max(elapsed, 1e-9):.1f} chunks/sec), "
+                         f"peak RSS: {f'{peak_rss:.1f} MB' if peak_rss is not None else 'N/A'}")
+        return embeddings
+
+    def verify_embeddings(self, sample_size: int = 8, tolerance: float = 1e-3, seed: int = 0) -> bool:
+        """
+        Re-encodes a random sample of chunks from every file and checks the stored vectors match.
+        Vectors written by an older, unnormalized embedding path fail and have to be regenerated.
+        :return: True if every sampled vector matches.
+        """
+        rng = random.Random(seed)
+        all_match = True
+        for file_path in self.file_list:
+            file_path = Path(self.input_dir/file_path)
+            stem = file_path.stem.replace('_cleaned_chunks', '')
+            stored = self.embedding_store.load(stem)
+            if not file_path.exists() or stored is None:
+                self.logger.warning(f"Missing chunks or embeddings for {stem}, skipping verification.")
+                continue
+            with open(file_path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            if len(chunks) != len(stored):
+                self.logger.error(f"{stem}: {len(stored)} stored embeddings for {len(chunks)} chunks.")
+                all_match = False
+                continue
+
+            sample = sorted(rng.sample(range(len(chunks)), min(sample_size, len(chunks))))
+            if not sample:
+                continue
+            result = self.encoder.verify([chunks[i] for i in sample], [stored[i] for i in sample], tolerance=tolerance)
+            if result["mismatches"]:
+                all_match = False
+                self.logger.error(f"{stem}: {result['mismatches']}/{result['checked']} sampled embeddings do not match "
+                                  f"(max deviation {result['max_deviation']}); regenerate them with step02.")
+            else:
+                self.logger.info(f"{stem}: {result['checked']} sampled embeddings match (max deviation {result['max_deviation']}).")
+        return all_match
+
+    def _save_embeddings(self, file_path: Path, embeddings: np.ndarray):
+        self.save_embeddings(file_path.stem.replace('_cleaned_chunks', ''), embeddings)
+
+    def save_embeddings(self, stem: str, embeddings: np.ndarray):
+        with self.tracer.span("embed.save", source=stem):
+            output_file = self.embedding_store.save(stem, embeddings, model_name=self.embedding_model_name)
         self.logger.info(f"Saved {len(embeddings)} embeddings to {output_file}")
 
 
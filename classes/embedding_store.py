@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union, List
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    Reads and writes per-document embedding matrices.
+
+    Embeddings are stored as float32 `<stem>_embeddings.npy` files with a small
+    `<stem>_embeddings.manifest.json` sidecar. Legacy `<stem>_embeddings.json`
+    files (lists of floats) are still readable. Saving a document removes its file in the other
+    format, so load() never returns embeddings from an earlier run.
+    """
+    SUPPORTED_FORMATS = ("npy", "json")
+
+    def __init__(self, embeddings_dir: str, storage_format: str = "npy"):
+        if storage_format not in self.SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported embedding storage format: {storage_format}. Expected one of {self.SUPPORTED_FORMATS}")
+        self.embeddings_path = Path(embeddings_dir)
+        self.storage_format = storage_format
+        self.logger = logging.getLogger(__name__)
+
+    def npy_file(self, stem: str) -> Path:
+        return self.embeddings_path / f"{stem}_embeddings.npy"
+
+    def manifest_file(self, stem: str) -> Path:
+        return self.embeddings_path / f"{stem}_embeddings.manifest.json"
+
+    def json_file(self, stem: str) -> Path:
+        return self.embeddings_path / f"{stem}_embeddings.json"
+
+    def exists(self, stem: str) -> bool:
+        return self.npy_file(stem).exists() or self.json_file(stem).exists()
+
+    def save(self, stem: str, embeddings, model_name: Optional[str] = None) -> Path:
+        """Saves the embeddings for one document and returns the written file."""
+        self.embeddings_path.mkdir(parents=True, exist_ok=True)
+
+        if self.storage_format == "json":
+            output_file = self.json_file(stem)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(np.asarray(embeddings, dtype=np.float32).tolist(), f)  # Save list of floats
+            self._remove(self.npy_file(stem), self.manifest_file(stem))  # load() would prefer them
+            return output_file
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(matrix), -1)
+
+        # Write to a temp file first so readers never see a partially written matrix
+        output_file = self.npy_file(stem)
+        tmp_file = output_file.with_suffix(".npy.tmp")
+        with open(tmp_file, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_file, output_file)
+
+        manifest = {
+            "format": "npy",
+            "file": output_file.name,
+            "dtype": str(matrix.dtype),
+            "count": int(matrix.shape[0]),
+            "dim": int(matrix.shape[1]),
+            "model_name": model_name,
+        }
+        with open(self.manifest_file(stem), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+        self._remove(self.json_file(stem))
+        return output_file
+
+    def _remove(self, *files: Path):
+        for file in files:
+            if file.exists():
+                self.logger.info(f"Removing stale embeddings file {file}")
+                file.unlink()
+
+    def load(self, stem: str, mmap: bool = True) -> Optional[Union[np.ndarray, List[List[float]]]]:
+        """
+        Loads the embeddings for one document.
+        Binary files are memory-mapped read-only; legacy JSON files are returned as lists of floats.
+        Returns None if no embeddings exist for the stem.
+        """
+        npy_file = self.npy_file(stem)
+        if npy_file.exists():
+            matrix = np.load(npy_file, mmap_mode="r" if mmap else None)
+            manifest = self.load_manifest(stem)
+            if manifest and manifest.get("count") != matrix.shape[0]:
+                self.logger.warning(f"Manifest count ({manifest.get('count')}) does not match {npy_file} ({matrix.shape[0]} rows).")
+            return matrix
+
+        json_file = self.json_file(stem)
+        if json_file.exists():
+            self.logger.debug(f"Reading legacy JSON embeddings from {json_file}")
+            with open(json_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        return None
+
+    def load_manifest(self, stem: str) -> Optional[dict]:
+        manifest_file = self.manifest_file(stem)
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
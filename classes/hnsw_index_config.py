@@ -0,0 +1,67 @@
+import logging
+
+
+class HNSWIndexConfig:
+    """
+    Distance metric and HNSW parameters of the Chroma collection.
+
+    Chroma fixes these when a collection is created, so the loader and the retriever both open the
+    collection through get_or_create_collection() here. A collection created with different settings
+    keeps them; a warning is logged, and the index must be rebuilt (step03 without incremental
+    indexing) for new values to take effect.
+    """
+
+    SPACES = ("l2", "cosine", "ip")
+
+    def __init__(self,
+                 space: str = "l2",
+                 m: int = None,
+                 construction_ef: int = None,
+                 search_ef: int = None):
+        """
+        :param space: Distance metric: "l2" (squared L2), "cosine" (1 - cosine similarity) or "ip" (1 - inner product).
+        :param m: Links per node in the HNSW graph; None keeps the Chroma default (16).
+        :param construction_ef: Candidate list size while building the graph; None keeps the default (100).
+        :param search_ef: Candidate list size while querying; None keeps the default (10).
+        """
+        if space not in self.SPACES:
+            raise ValueError(f"Unsupported distance space '{space}', expected one of {self.SPACES}")
+        self.space = space
+        self.m = int(m) if m else None
+        self.construction_ef = int(construction_ef) if construction_ef else None
+        self.search_ef = int(search_ef) if search_ef else None
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config) -> "HNSWIndexConfig":
+        return cls(space=config.get("vector_distance_space", "l2"),
+                   m=config.get("hnsw_m"),
+                   construction_ef=config.get("hnsw_construction_ef"),
+                   search_ef=config.get("hnsw_search_ef"))
+
+    def collection_metadata(self) -> dict:
+        """Collection metadata understood by Chroma's HNSW index."""
+        metadata = {"hnsw:space": self.space}
+        if self.m:
+            metadata["hnsw:M"] = self.m
+        if self.construction_ef:
+            metadata["hnsw:construction_ef"] = self.construction_ef
+        if self.search_ef:
+            metadata["hnsw:search_ef"] = self.search_ef
+        return metadata
+
+    def get_or_create_collection(self, client, collection_name: str):
+        """Opens the collection, creating it with these settings, and warns if an existing one differs."""
+        wanted = self.collection_metadata()
+        collection = client.get_or_create_collection(name=collection_name, metadata=wanted)
+        actual = collection.metadata or {}
+        mismatched = {key: actual.get(key, "default") for key, value in wanted.items()
+                      if actual.get(key, "l2" if key == "hnsw:space" else None) != value}
+        if mismatched:
+            self.logger.warning(f"Collection {collection_name} was created with {mismatched}, not {wanted}; "
+                                f"rebuild the index to apply the configured settings.")
+        return collection
+
+    def __repr__(self):
+        return (f"HNSWIndexConfig(space={self.space!r}, m={self.m}, "
+                f"construction_ef={self.construction_ef}, search_ef={self.search_ef})")
@@ -0,0 +1,122 @@
+from typing import Dict, List, Any, Optional
+import logging
+
+from .base_retriever import BaseRetriever
+from .bm25_index import BM25Index
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense vector search with BM25 keyword search using reciprocal rank fusion (RRF).
+
+    Each backend returns candidate_k candidates; a chunk's fused score is the sum of 1 / (rrf_k + rank)
+    over the lists it appears in, so exact terms such as drug and allergen names that the embedding
+    misses can still make the top k. Dense candidates have already passed the dense retriever's
+    score_threshold and relative_cutoff; chunks only BM25 found must reach min_lexical_score instead.
+    Results are ordered by fused score (higher is better), reported as "rrf_score"; "score" stays the
+    dense similarity (None for chunks only BM25 found). Without a lexical index the dense results are
+    returned unchanged. The lexical index is reloaded when the dense index revision changes.
+    """
+
+    def __init__(self, dense_retriever: BaseRetriever,
+                 lexical_index: BM25Index,
+                 candidate_k: int = 20,
+                 rrf_k: int = 60,
+                 min_lexical_score: float = 2.0):
+        """
+        :param dense_retriever: Vector search backend; also used to embed queries.
+        :param lexical_index: BM25 index built at ingest time.
+        :param candidate_k: Number of candidates taken from each backend before fusion.
+        :param rrf_k: RRF rank offset; larger values flatten the difference between top ranks.
+        :param min_lexical_score: Minimum BM25 score of a chunk the dense search did not return.
+        """
+        # Embedding, caching and revisions are delegated to the dense retriever, so the base class is not initialized
+        self.dense_retriever = dense_retriever
+        self.lexical_index = lexical_index
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.min_lexical_score = min_lexical_score
+        self.collection_name = dense_retriever.collection_name
+        self.score_threshold = dense_retriever.score_threshold
+        self._dense_revision = dense_retriever.index_revision
+
+        self.logger = logging.getLogger(__name__)
+        if not lexical_index.exists():
+            self.logger.warning(f"No lexical index found in {lexical_index.index_path}; run step01 to build it. Using vector search only.")
+        self.logger.info(f"Initialized HybridRetriever: dense: {type(dense_retriever).__name__}, "
+                         f"lexical chunks: {len(lexical_index)}, candidate_k: {candidate_k}, rrf_k: {rrf_k}, "
+                         f"min_lexical_score: {min_lexical_score}")
+
+    @property
+    def embedding_model(self):
+        return self.dense_retriever.embedding_model
+
+    @property
+    def embedding_cache(self):
+        return self.dense_retriever.embedding_cache
+
+    @property
+    def index_revision(self) -> Optional[str]:
+        dense_revision = self.dense_retriever.index_revision
+        if dense_revision is None and self.lexical_index.revision is None:
+            return None
+        return f"{dense_revision}+{self.lexical_index.revision}"
+
+    def close(self):
+        self.dense_retriever.close()
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.dense_retriever.embed_text(text)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.dense_retriever.embed_texts(texts)
+
+    def query(self, search_phrase: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Returns the top_k chunks by fused BM25 and vector rank.
+        """
+        self._refresh_lexical_index()
+        candidate_k = max(top_k, self.candidate_k)
+        return self._fuse(self.dense_retriever.query(search_phrase, top_k=candidate_k),
+                          self.lexical_index.search(search_phrase, top_k=candidate_k),
+                          top_k)
+
+    def query_batch(self, search_phrases: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        self._refresh_lexical_index()
+        candidate_k = max(top_k, self.candidate_k)
+        dense_results = self.dense_retriever.query_batch(search_phrases, top_k=candidate_k)
+        return [self._fuse(dense, self.lexical_index.search(search_phrase, top_k=candidate_k), top_k)
+                for search_phrase, dense in zip(search_phrases, dense_results)]
+
+    def _refresh_lexical_index(self):
+        """Reloads the BM25 index after re-indexing, which the query server would otherwise never see."""
+        dense_revision = self.dense_retriever.index_revision
+        if dense_revision == self._dense_revision:
+            return
+        self._dense_revision = dense_revision
+        index = self.lexical_index
+        self.lexical_index = BM25Index(index.index_path, k1=index.k1, b=index.b)
+        self.logger.info(f"Index revision changed to {dense_revision}; reloaded lexical index with {len(self.lexical_index)} chunks.")
+
+    def _fuse(self, dense_results: List[Dict[str, Any]], lexical_results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        dense_ids = {doc["id"] for doc in dense_results}
+        # A chunk only BM25 found has no similarity to check, so it needs a BM25 score of its own.
+        # Dropped chunks keep their rank, so they do not promote the weaker keyword matches after them.
+        ranked_lexical = [(rank, doc) for rank, doc in enumerate(lexical_results, start=1)
+                          if doc["id"] in dense_ids or doc["score"] >= self.min_lexical_score]
+        if not ranked_lexical:
+            return dense_results[:top_k]
+
+        fused_scores, docs = {}, {}
+        for rank, doc in [*enumerate(dense_results, start=1), *ranked_lexical]:
+            fused_scores[doc["id"]] = fused_scores.get(doc["id"], 0.0) + 1.0 / (self.rrf_k + rank)
+            docs.setdefault(doc["id"], doc)  # dense first, so "score" is the similarity when there is one
+
+        ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:top_k]
+        return [{"id": doc_id,
+                 "score": docs[doc_id]["score"] if doc_id in dense_ids else None,
+                 "rrf_score": round(fused_scores[doc_id], 6),
+                 "context": docs[doc_id].get("context", ""),
+                 "source": docs[doc_id].get("source", "Unknown"),
+                 "chunk_index": docs[doc_id].get("chunk_index", -1)}
+                for doc_id in ranked_ids]
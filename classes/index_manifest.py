@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class IndexManifest:
+    """
+    Tracks per-source and per-chunk content hashes of what is stored in the vector database,
+    so re-indexing only has to touch chunks that changed.
+    """
+    FILE_NAME = "index_manifest.json"
+
+    def __init__(self, vectordb_dir: str, collection_name: str):
+        self.manifest_file = Path(vectordb_dir) / self.FILE_NAME
+        self.collection_name = collection_name
+        self.logger = logging.getLogger(__name__)
+        self.data = self._load()
+
+    def _load(self) -> dict:
+        # index_id changes whenever the index is rebuilt from scratch, version on every change
+        empty = {"collection_name": self.collection_name, "index_id": uuid.uuid4().hex, "version": 0, "sources": {}}
+        if not self.manifest_file.exists():
+            return empty
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"Could not read index manifest {self.manifest_file}, starting fresh: {e}")
+            return empty
+        if data.get("collection_name") != self.collection_name:
+            self.logger.warning(f"Index manifest belongs to collection '{data.get('collection_name')}', starting fresh.")
+            return empty
+        data.setdefault("index_id", uuid.uuid4().hex)
+        return data
+
+    def save(self):
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix(".json.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp_file, self.manifest_file)
+
+    @property
+    def version(self) -> int:
+        """Incremented every time the stored chunks change."""
+        return self.data.get("version", 0)
+
+    @property
+    def revision(self) -> str:
+        """Identifies the exact contents of the index; changes after any re-index that modified it."""
+        return f"{self.data['index_id']}:{self.version}"
+
+    def bump_version(self):
+        self.data["version"] = self.version + 1
+
+    def sources(self) -> list:
+        return list(self.data["sources"].keys())
+
+    def get_source(self, stem: str) -> Optional[dict]:
+        return self.data["sources"].get(stem)
+
+    def set_source(self, stem: str, chunk_hashes: Dict[str, str]):
+        self.data["sources"][stem] = {
+            "source_hash": self.hash_source(chunk_hashes),
+            "chunks": chunk_hashes,
+        }
+
+    def remove_source(self, stem: str):
+        self.data["sources"].pop(stem, None)
+
+    @staticmethod
+    def hash_chunk(text: str, embedding) -> str:
+        """Hashes the chunk text together with its float32 embedding."""
+        digest = hashlib.sha256(text.encode("utf-8"))
+        digest.update(np.asarray(embedding, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_source(chunk_hashes: Dict[str, str]) -> str:
+        digest = hashlib.sha256()
+        for chunk_id in sorted(chunk_hashes):
+            digest.update(f"{chunk_id}:{chunk_hashes[chunk_id]}\n".encode("utf-8"))
+        return digest.hexdigest()
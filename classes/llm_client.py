@@ -1,28 +1,65 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
+import random
+import threading
+import time
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .tracer import Tracer
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMErrorToken(str):
+    """The error message stream_query() yields when the stream fails; callers can tell it from content with isinstance()."""
 
 
 class LLMClient:
     """
     Handles direct interactions with a locally running LLM API.
+    Requests share a pooled keep-alive session, use connect/read timeouts, are retried with
+    jittered exponential backoff on transient errors, and fail fast while the circuit breaker is open.
     """
     def __init__(self,
                  llm_api_url: str,
-                 llm_model_name: str):
+                 llm_model_name: str,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 120.0,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 pool_size: int = 10,
+                 circuit_failure_threshold: int = 5,
+                 circuit_reset_seconds: float = 30.0):
 
         self.llm_api_url = llm_api_url
         self.llm_model_name = llm_model_name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.last_stream_stats = None  # timing of the most recent stream_query call
 
+        # One keep-alive connection pool shared by all requests (and threads) of this client
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.circuit_breaker = CircuitBreaker(failure_threshold=circuit_failure_threshold,
+                                              reset_timeout=circuit_reset_seconds)
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "circuit_rejections": 0}
+        self._counters_lock = threading.Lock()
+
+        self.tracer = Tracer.get()
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"Initialized LLMClient: llm_api_url: {self.llm_api_url}, model_name: {self.llm_model_name}")
+        self.logger.info(f"Initialized LLMClient: llm_api_url: {self.llm_api_url}, model_name: {self.llm_model_name}, "
+                         f"timeouts: ({connect_timeout}s, {read_timeout}s), max_retries: {self.max_retries}, pool_size: {pool_size}")
 
-    def query(self, prompt: str):
-        """
-        Sends a query to the local LLM API.
-        :param prompt: User query string
-        :return: LLM response text
-        """
+    def _build_payload(self, prompt: str, stream: bool = False) -> dict:
         # The new payload uses the "messages" format
         payload = {
             "model": self.llm_model_name,
@@ -31,16 +68,137 @@ class LLMClient:
             ],
             "max_tokens": 2000,
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _count(self, counter: str):
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, payload: dict, headers: dict, stream: bool = False) -> requests.Response:
+        """
+        Posts to the LLM API with retries on connection errors, timeouts and retryable status codes.
+        :raises CircuitOpenError: if the backend is considered down.
+        :raises requests.exceptions.RequestException: once retries are exhausted or on a non-retryable error.
+        """
+        if not self.circuit_breaker.allow_request():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(f"Circuit breaker is open for {self.llm_api_url}")
+
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                response = self.session.post(self.llm_api_url,
+                                             headers=headers,
+                                             data=json.dumps(payload),
+                                             timeout=(self.connect_timeout, self.read_timeout),
+                                             stream=stream)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                failed_response = getattr(e, "response", None)
+                status_code = getattr(failed_response, "status_code", None)
+                if failed_response is not None:
+                    failed_response.close()  # give a streamed connection back to the pool before retrying or raising
+                if isinstance(e, requests.exceptions.HTTPError) and status_code not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()  # the backend is up, the request itself was rejected
+                    raise
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    self.circuit_breaker.record_failure()
+                    raise
+                delay = self._backoff_delay(attempt)
+                self._count("retries")
+                self.logger.warning(f"LLM request failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.circuit_breaker.record_success()
+            return response
+
+    def get_stats(self) -> dict:
+        """Request, retry and connection pool statistics for monitoring."""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        pool_container = self.adapter.poolmanager.pools
+        pools = [pool_container[key] for key in pool_container.keys()]
+        stats["pool_maxsize"] = self.pool_size
+        stats["connections_opened"] = sum(pool.num_connections for pool in pools)
+        stats["pooled_requests"] = sum(pool.num_requests for pool in pools)
+        stats["circuit_breaker"] = self.circuit_breaker.stats()
+        return stats
+
+    def query(self, prompt: str):
+        """
+        Sends a query to the local LLM API.
+        :param prompt: User query string
+        :return: LLM response text
+        """
+        payload = self._build_payload(prompt)
         headers = {"Content-Type": "application/json"}
 
-        try:
-            response = requests.post(self.llm_api_url,
-                                     headers=headers,
-                                     data=json.dumps(payload))
-            response.raise_for_status()
-            # The response structure is also different for the chat endpoint
-            return response.json().get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error querying LLM: {e}")
-            return "Error: Could not connect to the LLM."
+        with self.tracer.span("llm.query", model=self.llm_model_name) as span:
+            try:
+                response = self._post(payload, headers)
+                # The response structure is also different for the chat endpoint
+                return response.json().get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+            except (requests.exceptions.RequestException, CircuitOpenError) as e:
+                if span is not None:
+                    span.error = type(e).__name__  # handled here, so the span would not see it
+                self.logger.error(f"Error querying LLM: {e}")
+                return "Error: Could not connect to the LLM."
+
+    def stream_query(self, prompt: str):
+        """
+        Sends a query with "stream": true and yields content tokens as the server-sent events arrive.
+        Time to first token and total time are logged and kept in last_stream_stats.
+        If the request or the stream fails, the last fragment is an LLMErrorToken, possibly after content tokens.
+        :param prompt: User query string
+        :return: Generator of response text fragments
+        """
+        payload = self._build_payload(prompt, stream=True)
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
 
+        start_time = time.perf_counter()
+        first_token_time = None
+        num_tokens = 0
+        streaming = False
+        try:
+            with self._post(payload, headers, stream=True) as response:
+                streaming = True
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue  # keep-alives and comments
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    token = json.loads(data).get("choices", [{}])[0].get("delta", {}).get("content")
+                    if not token:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start_time
+                    num_tokens += 1
+                    yield token
+        except (requests.exceptions.RequestException, json.JSONDecodeError, CircuitOpenError) as e:
+            if streaming and isinstance(e, requests.exceptions.RequestException):
+                # _post() only saw the response headers succeed; a read error mid-stream is a backend failure too
+                self._count("failures")
+                self.circuit_breaker.record_failure()
+            self.logger.error(f"Error streaming from LLM: {e}")
+            yield LLMErrorToken("Error: Could not connect to the LLM.")
+        finally:
+            total_time = time.perf_counter() - start_time
+            self.last_stream_stats = {"time_to_first_token": first_token_time, "total_time": total_time, "num_tokens": num_tokens}
+            # A generator can resume in another context, so its stages are recorded rather than opened as spans
+            if first_token_time is not None:
+                self.tracer.record("llm.time_to_first_token", first_token_time, model=self.llm_model_name)
+            self.tracer.record("llm.stream", total_time, model=self.llm_model_name, tokens=num_tokens)
+            self.logger.info(f"LLM stream finished: time to first token: "
+                             f"{f'{first_token_time:.2f}s' if first_token_time is not None else 'N/A'}, "
+                             f"total: {total_time:.2f}s, tokens: {num_tokens}")
@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Named priorities for callers of submit(); interactive requests overtake queued batch work
+PRIORITIES = {"interactive": 0, "batch": 10}
+
+
+class LLMRequestScheduler:
+    """
+    Scheduling layer in front of an LLMClient.
+
+    Identical prompts that are already queued or running are coalesced, so their callers share one
+    future and the LLM generates the answer once. At most max_concurrency requests run against the
+    backend at a time; waiting requests are served by priority (lower value first), then arrival order.
+    query() has the same signature as LLMClient.query, so the scheduler can be used in its place.
+    """
+
+    def __init__(self, llm_client, max_concurrency: int = 4, wait_time_window: int = 1000):
+        """
+        :param max_concurrency: Number of worker threads, i.e. requests in flight to the LLM.
+        :param wait_time_window: Number of recent queue wait times kept for percentile stats.
+        """
+        self.llm_client = llm_client
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._queue = []  # heap of (priority, sequence, prompt, enqueued_at)
+        self._pending = {}  # prompt -> Future, for queued and running prompts
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._running = 0
+        self._wait_times = deque(maxlen=wait_time_window)
+        self._counters = {"submitted": 0, "coalesced": 0, "completed": 0, "failed": 0}
+
+        self.logger = logging.getLogger(__name__)
+        self._workers = [threading.Thread(target=self._work, name=f"llm-scheduler-{i}", daemon=True)
+                         for i in range(self.max_concurrency)]
+        for worker in self._workers:
+            worker.start()
+        self.logger.info(f"Initialized LLMRequestScheduler: max_concurrency: {self.max_concurrency}")
+
+    def submit(self, prompt: str, priority: int = 0) -> Future:
+        """Queues a prompt, or joins the identical prompt already queued or running. Returns its future."""
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("LLMRequestScheduler has been shut down")
+            self._counters["submitted"] += 1
+            future = self._pending.get(prompt)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return future
+            future = Future()
+            self._pending[prompt] = future
+            heapq.heappush(self._queue, (priority, next(self._sequence), prompt, time.perf_counter()))
+            self._condition.notify()
+            return future
+
+    def query(self, prompt: str, priority: int = 0) -> str:
+        """Blocking drop-in for LLMClient.query."""
+        return self.submit(prompt, priority).result()
+
+    def shutdown(self, wait: bool = True):
+        """Stops the workers after the queued requests have been served."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            wait_times = list(self._wait_times)
+            stats = dict(self._counters)
+            stats["queue_depth"] = len(self._queue)
+            stats["in_flight"] = self._running
+        stats["max_concurrency"] = self.max_concurrency
+        stats["wait_time_p50"] = round(statistics.median(wait_times), 4) if wait_times else 0.0
+        stats["wait_time_p95"] = round(sorted(wait_times)[int(0.95 * (len(wait_times) - 1))], 4) if wait_times else 0.0
+        stats["wait_time_max"] = round(max(wait_times), 4) if wait_times else 0.0
+        if hasattr(self.llm_client, "get_stats"):
+            stats["llm_client"] = self.llm_client.get_stats()
+        return stats
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                if not self._queue:
+                    return  # shut down and drained
+                _, _, prompt, enqueued_at = heapq.heappop(self._queue)
+                self._wait_times.append(time.perf_counter() - enqueued_at)
+                self._running += 1
+
+            try:
+                result, error = self.llm_client.query(prompt), None
+            except Exception as e:
+                result, error = None, e
+
+            with self._condition:
+                self._running -= 1
+                future = self._pending.pop(prompt)
+                self._counters["failed" if error else "completed"] += 1
+            if error:
+                self.logger.error(f"LLM request failed: {error}")
+                future.set_exception(error)
+            else:
+                future.set_result(result)
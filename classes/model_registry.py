@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List, Optional
+
+from .tracer import Tracer
+
+
+class _Entry:
+    __slots__ = ("value", "refs", "pinned", "loaded", "error", "load_seconds", "hits")
+
+    def __init__(self):
+        self.value = None
+        self.refs = 0
+        self.pinned = False  # preloaded and not acquired since, so not evicted yet
+        self.loaded = threading.Event()
+        self.error = None
+        self.load_seconds = None
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models and tokenizers, so components that need the same weights share one copy.
+
+    acquire(kind, name, loader) returns the object cached under (kind, name) and calls loader() only the first
+    time. Callers that ask for a model while it is loading wait for that load. Different models load in
+    parallel. Each acquire() takes a reference and release() drops it. When max_models is set and more models
+    are loaded, the least recently used unreferenced models are evicted. Models still held are never evicted,
+    nor are preloaded models before their first acquire(). warmup() loads models in a background thread, so a
+    step can open its indexes while the weights load.
+    Use ModelRegistry.get() for the registry the pipeline classes share.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_models: int = 0):
+        """
+        :param max_models: Maximum number of loaded models before unreferenced ones are evicted; 0 never evicts.
+        """
+        self.max_models = max(0, int(max_models))
+        self._entries = OrderedDict()  # (kind, name) -> _Entry, least recently used first
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.tracer = Tracer.get()
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def get(cls) -> "ModelRegistry":
+        """Returns the process-wide registry, creating one that never evicts on first use."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def configure(self, max_models: Optional[int] = None):
+        """Changes the settings in place, so classes holding this registry pick them up."""
+        if max_models is not None:
+            with self._lock:
+                self.max_models = max(0, int(max_models))
+                evicted = self._evict_unreferenced()
+            self._close(evicted)
+        self.logger.info(f"ModelRegistry configured: max_models: {self.max_models or 'unlimited'}")
+
+    def acquire(self, kind: str, name: str, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the model cached under (kind, name), loading it with loader() on first use, and takes a reference.
+        :param kind: What is loaded, e.g. "tokenizer", "text_encoder" or "cross_encoder".
+        :param loader: Called without arguments to load the model; its exception is raised to every waiting caller.
+        """
+        key = (kind, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            is_loader = entry is None
+            if is_loader:
+                entry = self._entries[key] = _Entry()
+            else:
+                entry.hits += 1
+                entry.pinned = False
+                self._entries.move_to_end(key)
+            entry.refs += 1
+
+        if is_loader:
+            self._load(key, entry, loader)
+        else:
+            entry.loaded.wait()
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def _load(self, key, entry: _Entry, loader: Callable[[], Any]):
+        start = time.perf_counter()
+        try:
+            with self.tracer.span("model.load", kind=key[0], model=key[1]):
+                entry.value = loader()
+        except Exception as e:
+            entry.error = e
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]  # the next acquire() tries again
+            self.logger.error(f"Failed to load {key[0]} {key[1]}: {e}")
+        finally:
+            entry.load_seconds = time.perf_counter() - start
+            entry.loaded.set()
+        if entry.error is None:
+            self.logger.info(f"Loaded {key[0]} {key[1]} in {entry.load_seconds:.2f}s")
+            with self._lock:
+                evicted = self._evict_unreferenced()
+            self._close(evicted)
+
+    def release(self, kind: str, name: str):
+        """Drops one reference taken by acquire(); unreferenced models become candidates for eviction."""
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            evicted = self._evict_unreferenced()
+        self._close(evicted)
+
+    def preload(self, kind: str, name: str, loader: Callable[[], Any]):
+        """
+        Loads the model into the cache without holding a reference to it.
+        Until the next acquire() it is not evicted, so a warmed-up model is still there when the step asks for it.
+        """
+        self.acquire(kind, name, loader)
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                entry.pinned = entry.hits == 0  # no one else has asked for it yet
+            evicted = self._evict_unreferenced()
+        self._close(evicted)
+
+    def warmup(self, loads: Iterable[Callable[[], Any]], background: bool = True) -> Optional[threading.Thread]:
+        """
+        Runs each load (e.g. a preload() call) in turn; failures are logged, since the step loads the model again when it needs it.
+        :param background: Run the loads in a daemon thread and return it, instead of waiting for them.
+        """
+        loads = list(loads)
+
+        def run():
+            with self.tracer.span("model.warmup", models=len(loads)):
+                for load in loads:
+                    try:
+                        load()
+                    except Exception as e:
+                        self.logger.warning(f"Model warmup failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def evict(self, kind: str, name: str) -> bool:
+        """Drops the model if it is loaded and no one holds a reference to it."""
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is None or entry.refs > 0 or not entry.loaded.is_set():
+                return False
+            del self._entries[(kind, name)]
+            self.evictions += 1
+        self._close([((kind, name), entry)])
+        return True
+
+    def _evict_unreferenced(self) -> List:
+        """Removes least recently used unreferenced models above max_models; call with the lock held."""
+        evicted = []
+        if not self.max_models:
+            return evicted
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_models:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0 and not entry.pinned and entry.loaded.is_set():
+                del self._entries[key]
+                evicted.append((key, entry))
+        self.evictions += len(evicted)
+        return evicted
+
+    def _close(self, evicted: List):
+        # Outside the lock: closing a model may release the models it holds
+        for (kind, name), entry in evicted:
+            self.logger.info(f"Unloaded {kind} {name}")
+            close = getattr(entry.value, "close", None)
+            if callable(close):
+                close()
+
+    def clear(self, kind: Optional[str] = None):
+        """Drops every cached model (of one kind), referenced or not."""
+        with self._lock:
+            keys = [key for key in self._entries if kind is None or key[0] == kind]
+            cleared = [(key, self._entries.pop(key)) for key in keys]
+        self._close([(key, entry) for key, entry in cleared if entry.loaded.is_set()])
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = [{"kind": kind, "name": name, "refs": entry.refs, "hits": entry.hits,
+                       "loaded": entry.loaded.is_set(),
+                       "load_seconds": round(entry.load_seconds, 3) if entry.load_seconds is not None else None}
+                      for (kind, name), entry in self._entries.items()]
+        return {"max_models": self.max_models, "evictions": self.evictions, "models": models}
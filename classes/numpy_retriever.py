@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from .base_retriever import BaseRetriever
+from .embedding_cache import EmbeddingCache
+from .hnsw_index_config import HNSWIndexConfig
+
+
+class NumpyRetriever(BaseRetriever):
+    """
+    Exact-search retriever over an in-process NumPy matrix.
+
+    The index is a float32 matrix of unit-normalized chunk embeddings, memory-mapped from disk, plus a
+    JSON file with the chunk IDs and metadata. Each export writes both into a new version directory
+    and then points current.json at it, so a reader never pairs the matrix of one export with the
+    chunk IDs of another. A query is one matrix-vector product followed by an argpartition top-k.
+    Scores are the same cosine similarities ChromaDBRetriever reports for the same index.
+    """
+    INDEX_DIR_NAME = "numpy_index"
+    CURRENT_FILE = "current.json"
+    MATRIX_FILE = "embeddings.npy"
+    CHUNKS_FILE = "chunks.json"
+
+    def __init__(self, embedding_model_name: str,
+                 collection_name: str,
+                 vectordb_dir: str,
+                 score_threshold: float = 0.5,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 index_config: Optional[HNSWIndexConfig] = None,
+                 relative_cutoff: Optional[float] = None):
+        super().__init__(embedding_model_name, collection_name, vectordb_dir, score_threshold, embedding_cache, index_config, relative_cutoff)
+        self.index_dir = self.vectordb_path / self.INDEX_DIR_NAME
+        self.matrix = None
+        self.ids = []
+        self.metadatas = []
+        self._index_mtime = None
+
+        self.logger = logging.getLogger(__name__)
+        self._load_index()
+        self.logger.info(f"Initialized NumpyRetriever: embedding_model_name: {embedding_model_name}, collection_name: {collection_name}, "
+                         f"score_threshold: {score_threshold}, chunks: {len(self.ids)}")
+
+    @classmethod
+    def write_index(cls, collection, vectordb_dir: str, batch_size: int = 1000) -> Path:
+        """
+        Exports a Chroma collection to the NumPy index in vectordb_dir, normalizing the embeddings.
+        The new version is switched in atomically, so running retrievers pick it up on their next query.
+        """
+        ids, metadatas, rows = [], [], []
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(include=["embeddings", "metadatas"], limit=batch_size, offset=offset)
+            ids.extend(batch["ids"])
+            metadatas.extend(batch["metadatas"])
+            rows.append(np.asarray(batch["embeddings"], dtype=np.float32))
+
+        matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        if matrix.size:
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+
+        index_dir = Path(vectordb_dir) / cls.INDEX_DIR_NAME
+        version = f"v_{uuid.uuid4().hex}"
+        version_dir = index_dir / version
+        version_dir.mkdir(parents=True)
+        with open(version_dir / cls.MATRIX_FILE, "wb") as f:
+            np.save(f, matrix)
+        with open(version_dir / cls.CHUNKS_FILE, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadatas": metadatas}, f)
+
+        # Switching current.json is the one step that publishes the new version
+        tmp_current = index_dir / f"{cls.CURRENT_FILE}.tmp"
+        with open(tmp_current, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "count": len(ids)}, f)
+        os.replace(tmp_current, index_dir / cls.CURRENT_FILE)
+
+        # Retrievers that still map an old matrix keep reading it; new ones only see the current version
+        for old_dir in index_dir.glob("v_*"):
+            if old_dir.name != version:
+                shutil.rmtree(old_dir, ignore_errors=True)
+
+        logging.getLogger(__name__).info(f"Wrote NumPy index with {len(ids)} chunks to {version_dir}")
+        return version_dir
+
+    def _load_index(self):
+        """(Re)loads the index if a new version was written since it was last loaded; keeps the loaded one on errors."""
+        current_file = self.index_dir / self.CURRENT_FILE
+        try:
+            mtime = current_file.stat().st_mtime_ns
+        except OSError:
+            if self._index_mtime is None:
+                self.logger.warning(f"No NumPy index found in {self.index_dir}; run step03 with retriever_backend 'numpy'.")
+                self._index_mtime = 0
+            return
+        if mtime == self._index_mtime:
+            return
+
+        try:
+            with open(current_file, "r", encoding="utf-8") as f:
+                version_dir = self.index_dir / json.load(f)["version"]
+            with open(version_dir / self.CHUNKS_FILE, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            matrix = np.load(version_dir / self.MATRIX_FILE, mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            # e.g. a newer export removed this version between the two reads; try again on the next query
+            self.logger.warning(f"Could not load NumPy index from {self.index_dir}, keeping the loaded one: {e}")
+            return
+        if matrix.shape[0] != len(chunks["ids"]):
+            self.logger.error(f"NumPy index in {version_dir} has {matrix.shape[0]} rows for {len(chunks['ids'])} chunks; keeping the loaded one.")
+            return
+
+        self.matrix = matrix
+        self.ids = chunks["ids"]
+        self.metadatas = chunks["metadatas"]
+        self._index_mtime = mtime
+        self.logger.info(f"Loaded NumPy index with {len(self.ids)} chunks from {version_dir}")
+
+    def query(self, search_phrase: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Searches the NumPy index and returns structured results of relevant chunks.
+        """
+        return self.query_batch([search_phrase], top_k=top_k)[0]
+
+    def query_batch(self, search_phrases: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Searches for several phrases with one matrix product. Returns one result list per phrase, in input order.
+        """
+        if not search_phrases:
+            return []
+        self._load_index()
+        if self.matrix is None or not self.ids:
+            return [[] for _ in search_phrases]
+
+        queries = np.asarray(self.embed_texts(search_phrases), dtype=np.float32)
+        with self.tracer.span("retriever.search", backend="numpy", queries=len(search_phrases)):
+            similarities = queries @ self.matrix.T  # (queries, chunks); rows are unit vectors, so this is cosine
+            k = min(top_k, similarities.shape[1])
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_similarities = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_similarities, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_similarities = np.take_along_axis(top_similarities, order, axis=1)
+
+        return [self._build_results([self.ids[j] for j in row],
+                                    [self.metadatas[j] for j in row],
+                                    row_similarities,
+                                    top_k)
+                for row, row_similarities in zip(top, top_similarities)]
@@ -0,0 +1,193 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from .llm_scheduler import LLMRequestScheduler, PRIORITIES
+from .model_registry import ModelRegistry
+from .rag_query_processor import RAGQueryProcessor
+from .tracer import Tracer
+
+
+class QueryServer:
+    """
+    Long-lived local HTTP service that keeps the retriever, its embedding model, the ChromaDB
+    client and the LLM client loaded, and answers retrieve and generate requests concurrently.
+
+    Endpoints:
+        GET  /health
+        GET  /stats
+        GET  /metrics  (per-stage latency in Prometheus text format)
+        POST /retrieve  {"query": str, "top_k": int}
+        POST /retrieve_batch  {"queries": [str], "top_k": int}
+        POST /generate  {"query": str, "use_rag": bool, "priority": "interactive" | "batch"}
+
+    With an LLMRequestScheduler as the LLM client, queued interactive requests are sent before batch ones.
+    """
+
+    def __init__(self,
+                 retriever,
+                 llm_client,
+                 host: str = "127.0.0.1",
+                 port: int = 8765,
+                 default_top_k: int = 3,
+                 response_cache=None,
+                 context_builder=None,
+                 reranker=None):
+        self.retriever = retriever
+        self.llm_client = llm_client
+        self.default_top_k = default_top_k
+        self.response_cache = response_cache
+        self.reranker = reranker
+        self.tracer = Tracer.get()
+        self.processors = {
+            True: RAGQueryProcessor(llm_client=llm_client, retriever=retriever, use_rag=True,
+                                    response_cache=response_cache, context_builder=context_builder, reranker=reranker),
+            False: RAGQueryProcessor(llm_client=llm_client, retriever=retriever, use_rag=False, context_builder=context_builder),
+        }
+
+        self.logger = logging.getLogger(__name__)
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.logger.info(f"Initialized QueryServer: listening on {self.url}")
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self.logger.info(f"QueryServer ready at {self.url}")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def start_background(self) -> threading.Thread:
+        """Serves requests from a daemon thread and returns it."""
+        thread = threading.Thread(target=self.httpd.serve_forever, name="query-server", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> dict:
+        stats = {}
+        embedding_cache = getattr(self.retriever, "embedding_cache", None)
+        if embedding_cache is not None:
+            stats["embedding_cache"] = embedding_cache.stats()
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if self.reranker is not None:
+            stats["reranker"] = self.reranker.stats()
+        if hasattr(self.llm_client, "get_stats"):
+            stats["llm_client"] = self.llm_client.get_stats()
+        stats["stages"] = self.tracer.stats()
+        stats["models"] = ModelRegistry.get().stats()
+        return stats
+
+    def retrieve(self, payload: dict) -> dict:
+        top_k = int(payload.get("top_k") or self.default_top_k)
+        return {"results": self.retriever.query(payload["query"], top_k=top_k)}
+
+    def retrieve_batch(self, payload: dict) -> dict:
+        top_k = int(payload.get("top_k") or self.default_top_k)
+        return {"results": self.retriever.query_batch(list(payload["queries"]), top_k=top_k)}
+
+    def generate(self, payload: dict) -> dict:
+        processor = self.processors[bool(payload.get("use_rag", False))]
+        priority_name = payload.get("priority") or "interactive"
+        if priority_name not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority_name}', expected one of {sorted(PRIORITIES)}")
+        # Only the scheduler queues requests; a plain LLMClient sends them straight away
+        priority = PRIORITIES[priority_name] if isinstance(self.llm_client, LLMRequestScheduler) else None
+        return {"response": processor.query(payload["query"], priority=priority)}
+
+    def _make_handler(self):
+        server = self
+        # path -> (handler, required payload field)
+        routes = {
+            "/retrieve": (self.retrieve, "query"),
+            "/retrieve_batch": (self.retrieve_batch, "queries"),
+            "/generate": (self.generate, "query"),
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send_json(200, {"status": "ok"})
+                elif self.path == "/stats":
+                    self._send_json(200, server.stats())
+                elif self.path == "/metrics":
+                    self._send(200, server.tracer.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+                else:
+                    self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+            def do_POST(self):
+                if self.path not in routes:
+                    self._send_json(404, {"error": f"Unknown path: {self.path}"})
+                    return
+                route, required_field = routes[self.path]
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    if not payload.get(required_field):
+                        raise ValueError(f"Missing '{required_field}'")
+                except (ValueError, json.JSONDecodeError) as e:
+                    self._send_json(400, {"error": f"Bad request: {e}"})
+                    return
+                try:
+                    self._send_json(200, route(payload))
+                except ValueError as e:
+                    self._send_json(400, {"error": f"Bad request: {e}"})
+                except Exception as e:
+                    server.logger.error(f"Error handling {self.path}: {e}")
+                    self._send_json(500, {"error": str(e)})
+
+            def _send_json(self, status, body):
+                self._send(status, json.dumps(body).encode("utf-8"), "application/json")
+
+            def _send(self, status, data, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                server.logger.debug(f"{self.address_string()} - {format % args}")
+
+        return Handler
+
+
+class QueryServerClient:
+    """Thin client for a running QueryServer."""
+
+    def __init__(self, server_url: str, timeout: float = 300.0):
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def health(self) -> bool:
+        try:
+            return self.session.get(f"{self.server_url}/health", timeout=5).ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def retrieve(self, query: str, top_k: int = 3) -> list:
+        return self._post("/retrieve", {"query": query, "top_k": top_k})["results"]
+
+    def retrieve_batch(self, queries: list, top_k: int = 3) -> list:
+        return self._post("/retrieve_batch", {"queries": queries, "top_k": top_k})["results"]
+
+    def generate(self, query: str, use_rag: bool = False, priority: str = "interactive") -> str:
+        return self._post("/generate", {"query": query, "use_rag": use_rag, "priority": priority})["response"]
+
+    def _post(self, path: str, payload: dict) -> dict:
+        response = self.session.post(f"{self.server_url}{path}", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
@@ -1,6 +1,18 @@
-from .llm_client import LLMClient
-from .chromadb_retriever import ChromaDBRetriever
+from typing import TYPE_CHECKING
+from .context_builder import ContextBuilder
+from .llm_client import LLMErrorToken
+from .tracer import Tracer
+import asyncio
+import contextvars
 import logging
+
+if TYPE_CHECKING:
+    # Annotations only: importing these at runtime would pull in torch and sentence-transformers for a non-RAG query
+    from .llm_client import LLMClient
+    from .base_retriever import BaseRetriever
+    from .response_cache import SemanticResponseCache
+    from .cross_encoder_reranker import CrossEncoderReranker
+
 # from pathlib import Path
 # from typing import List
 # import json
@@ -8,32 +20,153 @@ import logging
 class RAGQueryProcessor:
 
     def __init__(self,
-                 llm_client: LLMClient,
-                 retriever: ChromaDBRetriever,
-                 use_rag: bool = False):
+                 llm_client: "LLMClient",
+                 retriever: "BaseRetriever",
+                 use_rag: bool = False,
+                 response_cache: "SemanticResponseCache" = None,
+                 max_concurrency: int = 32,
+                 executor=None,
+                 context_builder: ContextBuilder = None,
+                 reranker: "CrossEncoderReranker" = None):
+        """
+        :param max_concurrency: Maximum number of aquery() calls processed at once; the rest wait.
+        :param executor: Executor for blocking retrieval/embedding work in aquery(); None uses the loop default.
+        :param context_builder: Packs retrieved chunks under a token budget; None uses ContextBuilder defaults.
+        :param reranker: Optional cross-encoder stage that narrows a wide candidate set before context assembly.
+        """
         self.use_rag = use_rag
         self.llm_client = llm_client
         self.retriever = retriever if use_rag else None
+        self.response_cache = response_cache if use_rag else None
+        self.context_builder = context_builder or ContextBuilder()
+        self.reranker = reranker if use_rag else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.executor = executor
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.tracer = Tracer.get()
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"Initialized RAGQueryProcessor: use_rag: {use_rag}")
 
-    def query(self, query_text: str):
+    def query(self, query_text: str, priority: int = None):
         """
         Processes the query with optional RAG.
+        :param priority: Scheduling priority for an LLMRequestScheduler client (lower is served first); None for a plain LLMClient.
+        """
+        with self.tracer.span("rag.query", use_rag=self.use_rag) as span:
+            final_prompt, cache_key, cached_response = self._prepare_prompt(query_text)
+            if cached_response is not None:
+                if span is not None:
+                    span.set(cached=True)
+                return cached_response
+
+            with self.tracer.span("rag.generate"):
+                if priority is None:
+                    response = self.llm_client.query(final_prompt)
+                else:
+                    response = self.llm_client.query(final_prompt, priority=priority)
+            self.logger.debug(f"{'RAG' if self.use_rag else 'LLM'} Response: {response}")
+            self._cache_response(cache_key, response)
+
+            return response
+
+    async def aquery(self, query_text: str):
+        """
+        asyncio variant of query(). Retrieval and embedding run in the executor; the LLM call uses
+        the client's aquery() when it has one, so many questions can be in flight in one process.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            with self.tracer.span("rag.query", use_rag=self.use_rag) as span:
+                # Executor threads do not inherit the task's context, so copy it to nest their spans under rag.query
+                context = contextvars.copy_context()
+                final_prompt, cache_key, cached_response = await loop.run_in_executor(self.executor, context.run, self._prepare_prompt, query_text)
+                if cached_response is not None:
+                    if span is not None:
+                        span.set(cached=True)
+                    return cached_response
+
+                with self.tracer.span("rag.generate"):
+                    if asyncio.iscoroutinefunction(getattr(self.llm_client, "aquery", None)):
+                        response = await self.llm_client.aquery(final_prompt)
+                    else:
+                        response = await loop.run_in_executor(self.executor, contextvars.copy_context().run, self.llm_client.query, final_prompt)
+
+        self.logger.debug(f"{'RAG' if self.use_rag else 'LLM'} Response: {response}")
+        self._cache_response(cache_key, response)
+        return response
+
+    def stream_query(self, query_text: str):
+        """
+        Processes the query with optional RAG, yielding response tokens as the LLM produces them.
+        """
+        # The spans stay open across yields, so run the generator in its own context: otherwise
+        # whatever the caller traces between tokens would nest under this query's rag.query span
+        context = contextvars.copy_context()
+        tokens = self._stream_query(query_text)
+        try:
+            while True:
+                try:
+                    token = context.run(next, tokens)
+                except StopIteration:
+                    return
+                yield token
+        finally:
+            context.run(tokens.close)
+
+    def _stream_query(self, query_text: str):
+        with self.tracer.span("rag.query", use_rag=self.use_rag, stream=True) as span:
+            final_prompt, cache_key, cached_response = self._prepare_prompt(query_text)
+            if cached_response is not None:
+                if span is not None:
+                    span.set(cached=True)
+                yield cached_response
+                return
+
+            tokens = []
+            failed = False
+            with self.tracer.span("rag.generate") as generate_span:
+                for token in self.llm_client.stream_query(final_prompt):
+                    failed = failed or isinstance(token, LLMErrorToken)  # a broken stream ends with an error after partial content
+                    tokens.append(token)
+                    yield token
+                if generate_span is not None:
+                    generate_span.set(tokens=len(tokens), failed=failed)
+
+            response = "".join(tokens)
+            self.logger.debug(f"{'RAG' if self.use_rag else 'LLM'} Response: {response}")
+            if not failed:
+                self._cache_response(cache_key, response)
+
+    def _cache_response(self, cache_key, response: str):
+        if cache_key is not None and not response.startswith("Error:"):  # never cache LLM failures
+            query_embedding, chunk_ids, index_revision = cache_key
+            self.response_cache.store(query_embedding, chunk_ids, response, index_revision)
+
+    def _prepare_prompt(self, query_text: str):
+        """
+        Retrieves context and builds the LLM prompt.
+        :return: (prompt, response cache key or None, cached response or None)
         """
         self.logger.debug(f"Received query: {query_text}")
 
         # Direct LLM query if RAG is not used
         if not self.use_rag:
-            response = self.llm_client.query(query_text)
-            self.logger.debug(f"LLM Response: {response}")
-            return response
+            self._record_prompt_tokens(query_text)
+            return query_text, None, None
             
-        contexts = []
         if self.use_rag:
             self.logger.info("-" * 80)
             self.logger.info("Using RAG pipeline...")
-            retrieved_docs = self.retriever.query(query_text)
+            with self.tracer.span("rag.retrieve") as span:
+                if self.reranker is not None:
+                    # Retrieve a wide candidate set and let the cross-encoder pick the best chunks
+                    retrieved_docs = self.retriever.query(query_text, top_k=self.reranker.max_candidates)
+                    with self.tracer.span("rag.rerank", candidates=len(retrieved_docs)):
+                        retrieved_docs = self.reranker.rerank(query_text, retrieved_docs) if retrieved_docs else retrieved_docs
+                else:
+                    retrieved_docs = self.retriever.query(query_text)
+                if span is not None:
+                    span.set(chunks=len(retrieved_docs or []))
             if not retrieved_docs:
                 logging.info("*** No relevant documents found.")
             else:
@@ -41,17 +174,28 @@ class RAGQueryProcessor:
                 
                 # Loop through all retrieved documents to build the context
                 for i, result in enumerate(retrieved_docs):
-                    contexts.append(result.get('context', ''))
-                    
                     logging.info(f"--- Chunk {i+1} ---")
                     logging.info(f"ID: {result.get('id', 'N/A')}")
                     logging.info(f"Score: {result.get('score', 'N/A')}")
                     logging.info(f"Source: {result.get('source', 'N/A')}")
                     logging.info(f"Context: {result.get('context', '')}")
             self.logger.info("-" * 80)
+
+        # Reuse the answer to a near-identical earlier question that retrieved the same chunks
+        cache_key = None
+        if self.response_cache is not None:
+            with self.tracer.span("rag.response_cache_lookup"):
+                cache_key = (self.retriever.embed_text(query_text),
+                             [doc.get("id") for doc in retrieved_docs],
+                             self.retriever.index_revision)
+                cached_response = self.response_cache.lookup(*cache_key)
+            if cached_response is not None:
+                self.logger.info("Returning cached response.")
+                return None, cache_key, cached_response
             
-        # Join all contexts with a separator
-        final_context = "\n---\n".join(contexts)
+        # Pack the best chunks into the context token budget
+        with self.tracer.span("rag.build_context"):
+            final_context, _, _ = self.context_builder.build(retrieved_docs or [])
 
         # Construct structured prompt
         final_prompt = f"""
@@ -72,10 +216,16 @@ class RAGQueryProcessor:
         """
 
         self.logger.debug(f"Prompt to LLM: {final_prompt}")
+        self._record_prompt_tokens(final_prompt)
 
-        response = self.llm_client.query(final_prompt)
-        self.logger.debug(f"RAG Response: {response}")
+        return final_prompt, cache_key, None
 
-        return response
+    def _record_prompt_tokens(self, prompt: str):
+        # On the query's span rather than the instance, which concurrent queries share
+        prompt_tokens = self.context_builder.count_tokens(prompt)
+        span = self.tracer.current_span()
+        if span is not None:
+            span.set(prompt_tokens=prompt_tokens)
+        self.logger.info(f"Prompt tokens: {prompt_tokens}")
 
 
@@ -0,0 +1,81 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Caches LLM responses keyed on the query embedding plus the set of retrieved chunk IDs.
+    A new query is answered from the cache when it retrieved exactly the same chunks and its
+    embedding is within similarity_threshold (cosine) of a cached query.
+    The cache is cleared whenever the index revision changes, i.e. after re-indexing.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 256):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max(1, int(max_entries))
+        self.index_revision = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry id -> (chunk_ids, unit embedding, response)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def lookup(self, query_embedding: List[float], chunk_ids: Iterable[str], index_revision=None) -> Optional[str]:
+        """Returns the cached response for a similar query with the same retrieved chunks, or None."""
+        chunk_ids = frozenset(chunk_ids)
+        query_vector = self._unit(query_embedding)
+        with self._lock:
+            self._check_revision(index_revision)
+            candidates = [(entry_id, entry) for entry_id, entry in self._entries.items() if entry[0] == chunk_ids]
+            if candidates:
+                similarities = np.stack([entry[1] for _, entry in candidates]) @ query_vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    self.logger.debug(f"Response cache hit (similarity {similarities[best]:.4f})")
+                    return entry[2]
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding: List[float], chunk_ids: Iterable[str], response: str, index_revision=None):
+        with self._lock:
+            self._check_revision(index_revision)
+            self._entries[self._next_id] = (frozenset(chunk_ids), self._unit(query_embedding), response)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _check_revision(self, index_revision):
+        if index_revision != self.index_revision:
+            if self._entries:
+                self.logger.info(f"Index revision changed ({self.index_revision} -> {index_revision}), clearing response cache.")
+            self._entries.clear()
+            self.index_revision = index_revision
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,106 @@
+import json
+import logging
+import re
+import time
+from typing import Dict, List, Any
+
+import numpy as np
+
+
+class RetrievalEvaluator:
+    """
+    Scores a retriever against labeled questions.
+
+    A label names a source document and a passage from it. Chunk IDs change with the chunk size,
+    so a retrieved chunk counts as relevant to a label if it comes from the same source and shares
+    at least min_match_words consecutive words with the passage, after lowercasing and dropping
+    punctuation (as the ingest tokenizer does). Passages split across two chunks then still match.
+
+    Per question, evaluate() computes:
+        recall  fraction of the question's labels covered by the top_k results
+        mrr     1 / rank of the first relevant result (0 if none)
+        ndcg    binary-gain nDCG over the top_k results; a result only gains for labels no earlier
+                result covered, and the ideal ranking covers one label per rank
+    and averages them over all questions, together with the query latency.
+    """
+
+    def __init__(self, labels: List[Dict[str, Any]], min_match_words: int = 8):
+        """
+        :param labels: [{"question": str, "relevant": [{"source": str, "text": str}, ...]}, ...]
+        :param min_match_words: Consecutive words a chunk must share with a labeled passage.
+        """
+        self.labels = labels
+        self.min_match_words = max(1, int(min_match_words))
+        # (source, n, word n-grams) of every labeled passage, computed once; short passages use n = their length
+        self._passages = [[(passage["source"], *self._ngrams(self.normalize(passage["text"]), self.min_match_words))
+                           for passage in label["relevant"]]
+                          for label in labels]
+        self.logger = logging.getLogger(__name__)
+        self.logger.info(f"Initialized RetrievalEvaluator: questions: {len(labels)}, min_match_words: {self.min_match_words}")
+
+    @classmethod
+    def load(cls, labels_file: str, **kwargs) -> "RetrievalEvaluator":
+        with open(labels_file, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @staticmethod
+    def normalize(text: str) -> List[str]:
+        return re.findall(r"[a-z0-9]+", text.lower())
+
+    @staticmethod
+    def _ngrams(words: List[str], n: int):
+        n = min(n, len(words))
+        return n, ({tuple(words[i:i + n]) for i in range(len(words) - n + 1)} if n else set())
+
+    def matched_labels(self, question_index: int, result: Dict[str, Any]) -> set:
+        """Indices of the question's labeled passages that the retrieved chunk covers."""
+        chunk_words = None
+        chunk_ngrams = {}  # n -> n-grams of the chunk
+        matched = set()
+        for i, (source, n, passage_ngrams) in enumerate(self._passages[question_index]):
+            if result.get("source") != source or not passage_ngrams:
+                continue
+            if chunk_words is None:
+                chunk_words = self.normalize(result.get("context", ""))
+            if n not in chunk_ngrams:
+                chunk_ngrams[n] = self._ngrams(chunk_words, n)[1] if len(chunk_words) >= n else set()
+            if passage_ngrams & chunk_ngrams[n]:
+                matched.add(i)
+        return matched
+
+    def score(self, question_index: int, results: List[Dict[str, Any]], top_k: int) -> Dict[str, float]:
+        """recall, mrr and ndcg of one question's ranked results."""
+        num_labels = len(self._passages[question_index])
+        covered = set()
+        first_relevant_rank = None
+        dcg = 0.0
+        for rank, result in enumerate(results[:top_k], start=1):
+            matched = self.matched_labels(question_index, result)
+            if matched and first_relevant_rank is None:
+                first_relevant_rank = rank
+            if matched - covered:
+                dcg += 1.0 / np.log2(rank + 1)
+            covered |= matched
+        ideal_dcg = sum(1.0 / np.log2(rank + 1) for rank in range(1, min(top_k, num_labels) + 1))
+        return {"recall": len(covered) / num_labels if num_labels else 0.0,
+                "mrr": 1.0 / first_relevant_rank if first_relevant_rank else 0.0,
+                "ndcg": dcg / ideal_dcg if ideal_dcg else 0.0}
+
+    def evaluate(self, retriever, top_k: int = 5) -> Dict[str, Any]:
+        """Queries the retriever with every labeled question and returns the averaged metrics and latency."""
+        scores, latencies = [], []
+        for i, label in enumerate(self.labels):
+            start = time.perf_counter()
+            results = retriever.query(label["question"], top_k=top_k)
+            latencies.append(time.perf_counter() - start)
+            scores.append(self.score(i, results, top_k))
+
+        latencies_ms = np.asarray(latencies) * 1000.0
+        metrics = {name: round(float(np.mean([score[name] for score in scores])), 4) for name in ("recall", "mrr", "ndcg")}
+        metrics.update({"questions": len(self.labels),
+                        "top_k": top_k,
+                        "latency_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+                        "latency_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3)})
+        self.logger.info(f"Evaluated top_k={top_k}: recall {metrics['recall']}, MRR {metrics['mrr']}, nDCG {metrics['ndcg']}, "
+                         f"p50 {metrics['latency_p50_ms']} ms")
+        return metrics
@@ -0,0 +1,121 @@
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+
+from .document_ingestor import DocumentIngestor
+from .embedding_preparer import EmbeddingPreparer
+from .embedding_loader import EmbeddingLoader
+from .utilities import get_peak_rss_mb
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class StreamingPipeline:
+    """
+    Runs ingestion, embedding and vector storage as a single pass.
+    Each stage runs in its own thread and hands chunks to the next one through a bounded queue,
+    so documents are never serialized to disk between steps unless persist_intermediates is set.
+    """
+
+    def __init__(self,
+                 ingestor: DocumentIngestor,
+                 preparer: EmbeddingPreparer,
+                 loader: EmbeddingLoader,
+                 queue_size: int = 4,
+                 persist_intermediates: bool = False):
+        """
+        :param queue_size: Maximum number of documents waiting between two stages.
+        :param persist_intermediates: Also write the *_cleaned_chunks.json and embedding files.
+        """
+        self.ingestor = ingestor
+        self.preparer = preparer
+        self.loader = loader
+        self.queue_size = max(1, int(queue_size))
+        self.persist_intermediates = persist_intermediates
+        self.stage_seconds = {"ingest": 0.0, "embed": 0.0, "store": 0.0}
+        self.num_documents = 0
+        self.num_chunks = 0
+
+        self.logger = logging.getLogger(__name__)
+        self.logger.info(f"Initialized StreamingPipeline: queue_size: {self.queue_size}, persist_intermediates: {persist_intermediates}")
+
+    def run(self, prune_missing_sources: bool = False):
+        """
+        Streams every file in the ingestor's file list into the vector database.
+        :param prune_missing_sources: Remove stored sources that are not part of this run's file list.
+        """
+        start_time = time.perf_counter()
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        embedding_queue = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._ingest_stage, args=(chunk_queue,), name="pipeline-ingest"),
+            threading.Thread(target=self._run_stage, args=("embed", chunk_queue, embedding_queue, self._embed), name="pipeline-embed"),
+            threading.Thread(target=self._run_stage, args=("store", embedding_queue, None, self._store), name="pipeline-store"),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if prune_missing_sources:
+            self.loader.remove_missing_sources(keep_stems={Path(file_name).stem for file_name in self.ingestor.file_list})
+        self.loader.finalize()
+        self.ingestor.save_lexical_index()
+
+        elapsed = time.perf_counter() - start_time
+        peak_rss = get_peak_rss_mb()
+        self.logger.info(f"Pipeline stored {self.num_chunks} chunks from {self.num_documents} documents in {elapsed:.2f}s, "
+                         f"stage busy time: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.stage_seconds.items()) +
+                         f", peak RSS: {f'{peak_rss:.1f} MB' if peak_rss is not None else 'N/A'}")
+        return elapsed
+
+    def _ingest_stage(self, outbox: queue.Queue):
+        try:
+            for file_name, chunks, elapsed in self.ingestor.iter_ingested_files():
+                self.stage_seconds["ingest"] += elapsed
+                if not chunks:
+                    self.logger.warning(f"No chunks produced for {file_name}, skipping.")
+                    continue
+                if self.persist_intermediates:
+                    self.ingestor.save_chunks(file_name, chunks)
+                self.ingestor.index_chunks(file_name, chunks)
+                outbox.put((Path(file_name).stem, chunks))
+        except Exception as e:
+            self.logger.error(f"Ingestion stage failed: {e}")
+        finally:
+            outbox.put(_DONE)
+
+    def _run_stage(self, name: str, inbox: queue.Queue, outbox, work):
+        """Applies work to every item from inbox until the end-of-stream marker arrives."""
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                start_time = time.perf_counter()
+                try:
+                    result = work(*item)
+                except Exception as e:
+                    self.logger.error(f"{name} stage failed for {item[0]}: {e}")
+                    continue
+                finally:
+                    self.stage_seconds[name] += time.perf_counter() - start_time
+                if outbox is not None:
+                    outbox.put(result)
+        finally:
+            if outbox is not None:
+                outbox.put(_DONE)
+
+    def _embed(self, stem, chunks):
+        embeddings = self.preparer.generate_embeddings(chunks)
+        if self.persist_intermediates:
+            self.preparer.save_embeddings(stem, embeddings)
+        return stem, chunks, embeddings
+
+    def _store(self, stem, chunks, embeddings):
+        self.loader.store_chunks(stem, chunks, embeddings)
+        self.num_documents += 1
+        self.num_chunks += len(chunks)
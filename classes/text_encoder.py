@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+from transformers.utils import cached_file
+
+from .model_registry import ModelRegistry
+from .tracer import Tracer
+
+
+class TextEncoder:
+    """
+    Turns text into unit-length embedding vectors for both indexing and querying.
+
+    Token embeddings are mean-pooled over the attention mask (padding is ignored) and L2-normalized,
+    which matches what SentenceTransformer produces for mean-pooling models such as all-MiniLM-L6-v2.
+    Texts are encoded in length-sorted batches bounded by a batch size and a padded-token budget.
+    Use TextEncoder.get() to share one loaded model per process through the ModelRegistry.
+    """
+    DEFAULT_MAX_LENGTH = 512
+    REGISTRY_KIND = "text_encoder"
+
+    def __init__(self, model_name: str,
+                 batch_size: int = 32,
+                 max_tokens_per_batch: int = 8192,
+                 device: Optional[str] = None):
+        """
+        :param batch_size: Default maximum number of texts per forward pass.
+        :param max_tokens_per_batch: Default maximum padded tokens (texts x longest text) per forward pass.
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, int(batch_size))
+        self.max_tokens_per_batch = max(1, int(max_tokens_per_batch))
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.logger = logging.getLogger(__name__)
+        self.tracer = Tracer.get()
+
+        # The tokenizer is shared with DocumentIngestor and ContextBuilder when they use the same model
+        self.tokenizer = ModelRegistry.get().acquire("tokenizer", model_name, lambda: AutoTokenizer.from_pretrained(model_name))
+        try:
+            self.model = AutoModel.from_pretrained(model_name).to(self.device)
+        except Exception:
+            # close() is never called for an encoder that failed to load
+            ModelRegistry.get().release("tokenizer", model_name)
+            raise
+        self.max_length = self._read_max_length()
+        self._lock = threading.Lock()  # one forward pass at a time per model
+        self.logger.info(f"Initialized TextEncoder: model_name: {model_name}, device: {self.device}, max_length: {self.max_length}")
+
+    @classmethod
+    def get(cls, model_name: str, **kwargs) -> "TextEncoder":
+        """
+        Returns the process-wide encoder for model_name, loading it on first use; call release() with the same arguments when done with it.
+        :param kwargs: Constructor arguments; encoders built with different arguments are cached separately.
+        """
+        return ModelRegistry.get().acquire(cls.REGISTRY_KIND, cls._registry_name(model_name, kwargs), lambda: cls(model_name, **kwargs))
+
+    @classmethod
+    def release(cls, model_name: str, **kwargs):
+        ModelRegistry.get().release(cls.REGISTRY_KIND, cls._registry_name(model_name, kwargs))
+
+    @staticmethod
+    def _registry_name(model_name: str, kwargs: dict) -> str:
+        """The model name, followed by the constructor arguments that differ from the shared default encoder."""
+        if not kwargs:
+            return model_name
+        return f"{model_name}?" + "&".join(f"{key}={kwargs[key]}" for key in sorted(kwargs))
+
+    @classmethod
+    def preload(cls, model_name: str):
+        """Loads the shared encoder for model_name without holding it, e.g. from ModelRegistry.warmup()."""
+        ModelRegistry.get().preload(cls.REGISTRY_KIND, model_name, lambda: cls(model_name))
+
+    @classmethod
+    def clear_shared(cls):
+        """Drops the shared encoders and tokenizers, so the next get() loads them again."""
+        ModelRegistry.get().clear(cls.REGISTRY_KIND)
+        ModelRegistry.get().clear("tokenizer")
+
+    def close(self):
+        """Called by the registry when the encoder is evicted; lets go of the shared tokenizer."""
+        ModelRegistry.get().release("tokenizer", self.model_name)
+
+    def _read_max_length(self) -> int:
+        """Uses the sequence length SentenceTransformer would use for this model, if it is published."""
+        try:
+            config_file = cached_file(self.model_name, "sentence_bert_config.json",
+                                      _raise_exceptions_for_missing_entries=False,
+                                      _raise_exceptions_for_connection_errors=False)
+            if config_file:
+                with open(config_file, "r", encoding="utf-8") as f:
+                    return int(json.load(f)["max_seq_length"])
+        except Exception as e:
+            self.logger.debug(f"No sentence-transformers config for {self.model_name}: {e}")
+        model_max_length = getattr(self.tokenizer, "model_max_length", self.DEFAULT_MAX_LENGTH)
+        return min(int(model_max_length), self.DEFAULT_MAX_LENGTH) if isinstance(model_max_length, int) else self.DEFAULT_MAX_LENGTH
+
+    def make_batches(self, lengths: List[int], batch_size: Optional[int] = None, max_tokens_per_batch: Optional[int] = None) -> List[List[int]]:
+        """
+        Groups text indices into batches ordered by token length.
+        A batch is closed when it reaches batch_size or when padding every text in it
+        to the longest one would exceed max_tokens_per_batch.
+        """
+        batch_size = batch_size or self.batch_size
+        max_tokens_per_batch = max_tokens_per_batch or self.max_tokens_per_batch
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        current = []
+        for idx in order:
+            # lengths are ascending, so the newest text is the longest in the batch
+            padded_tokens = (len(current) + 1) * lengths[idx]
+            if current and (len(current) >= batch_size or padded_tokens > max_tokens_per_batch):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None, max_tokens_per_batch: Optional[int] = None) -> np.ndarray:
+        """Returns a float32 (len(texts), dim) matrix of normalized embeddings, in input order."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        with self._lock, self.tracer.span("embed.encode", texts=len(texts)):
+            if len(texts) == 1:
+                batches = [[0]]
+            else:
+                lengths = [len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]]
+                batches = self.make_batches(lengths, batch_size, max_tokens_per_batch)
+
+            embeddings = None
+            for batch in batches:
+                inputs = self.tokenizer([texts[i] for i in batch], return_tensors="pt", truncation=True, padding=True,
+                                        max_length=self.max_length).to(self.device)
+                with torch.no_grad():
+                    outputs = self.model(**inputs)
+                batch_embeddings = self._pool(outputs.last_hidden_state, inputs["attention_mask"]).cpu().numpy()
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+                # Put results back in the original text order
+                embeddings[batch] = batch_embeddings
+        return embeddings
+
+    @staticmethod
+    def _pool(token_embeddings: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Attention-masked mean pooling followed by L2 normalization."""
+        mask = attention_mask.unsqueeze(-1).to(token_embeddings.dtype)
+        summed = (token_embeddings * mask).sum(dim=1)
+        counts = mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(summed / counts, p=2, dim=1)
+
+    def verify(self, texts: List[str], stored_embeddings, tolerance: float = 1e-3) -> dict:
+        """
+        Re-encodes texts and compares them with stored embeddings.
+        :return: dict with checked, mismatches and max_deviation (largest of 1 - cosine and |1 - norm|).
+        """
+        stored = np.asarray(stored_embeddings, dtype=np.float32)
+        fresh = self.encode(texts)
+        if stored.shape != fresh.shape:
+            return {"checked": len(texts), "mismatches": len(texts), "max_deviation": float("inf")}
+        norms = np.linalg.norm(stored, axis=1)
+        cosine = (stored * fresh).sum(axis=1) / np.clip(norms, 1e-12, None)
+        deviation = np.maximum(1.0 - cosine, np.abs(1.0 - norms))
+        return {"checked": len(texts),
+                "mismatches": int((deviation > tolerance).sum()),
+                "max_deviation": round(float(deviation.max()), 6)}
@@ -0,0 +1,270 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Innermost open span of the current thread or asyncio task
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage. Attributes can be added while the span is open with set()."""
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "attributes", "start_time", "duration", "error")
+
+    def __init__(self, name: str, span_id: int, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else span_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_record(self) -> dict:
+        return {"trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": round(self.start_time, 6),
+                "duration_ms": round(self.duration * 1000.0, 3),
+                "error": self.error,
+                "attributes": self.attributes}
+
+
+class Tracer:
+    """
+    Lightweight per-stage latency tracing.
+
+    tracer.span("stage") times a block; spans opened inside it (in the same thread or asyncio task)
+    become its children and share its trace_id, so the stages of one query can be told apart in the
+    JSON-lines export. The export is written by a background thread, so traced requests never wait
+    on disk I/O, and the file is rotated once it reaches jsonl_max_bytes. Durations are also aggregated
+    per span name into a window of recent samples, reported as p50/p95/p99 by stats() and in Prometheus
+    text format by to_prometheus().
+    Use Tracer.get() for the process-wide tracer the pipeline classes report to.
+    """
+    PERCENTILES = (50, 95, 99)
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = True, jsonl_path: Optional[str] = None, histogram_window: int = 2048,
+                 jsonl_max_bytes: int = 50 * 1024 * 1024, jsonl_backups: int = 3):
+        """
+        :param enabled: When False, span() and record() only run the traced code.
+        :param jsonl_path: Optional file every finished span is appended to as one JSON line.
+        :param histogram_window: Number of recent durations kept per span name for percentiles.
+        :param jsonl_max_bytes: Size at which the export file is renamed to <path>.1 and a new one started; 0 never rotates.
+        :param jsonl_backups: Number of rotated files kept (<path>.1 is the newest).
+        """
+        self.enabled = enabled
+        self.jsonl_path = None
+        self.histogram_window = max(1, int(histogram_window))
+        self.jsonl_max_bytes = max(0, int(jsonl_max_bytes))
+        self.jsonl_backups = max(0, int(jsonl_backups))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._durations = {}  # span name -> deque of recent durations in seconds
+        self._totals = {}  # span name -> [count, sum of durations, errors]
+        self._records = queue.SimpleQueue()  # JSON lines, flush events and the stop marker for the writer thread
+        self._writer = None
+        self._writer_lock = threading.Lock()  # serializes starting and stopping the writer
+        self.logger = logging.getLogger(__name__)
+        self.set_jsonl_path(jsonl_path)
+
+    @classmethod
+    def get(cls) -> "Tracer":
+        """Returns the process-wide tracer, creating an enabled one without export on first use."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def configure(self, enabled: Optional[bool] = None, jsonl_path: Optional[str] = None, histogram_window: Optional[int] = None,
+                  jsonl_max_bytes: Optional[int] = None):
+        """Changes the settings in place, so classes holding this tracer pick them up."""
+        if enabled is not None:
+            self.enabled = enabled
+        if jsonl_max_bytes is not None:
+            self.jsonl_max_bytes = max(0, int(jsonl_max_bytes))
+        if histogram_window is not None:
+            with self._lock:
+                self.histogram_window = max(1, int(histogram_window))
+                self._durations = {name: deque(values, maxlen=self.histogram_window) for name, values in self._durations.items()}
+        if jsonl_path is not None:
+            self.set_jsonl_path(jsonl_path)
+        self.logger.info(f"Tracer configured: enabled: {self.enabled}, jsonl_path: {self.jsonl_path}, histogram_window: {self.histogram_window}, "
+                         f"jsonl_max_bytes: {self.jsonl_max_bytes or 'unlimited'}")
+
+    def set_jsonl_path(self, jsonl_path: Optional[str]):
+        """Writes the spans already finished to the current file, then exports to jsonl_path (None stops exporting)."""
+        with self._writer_lock:
+            if self._writer is not None:
+                self.jsonl_path = None  # spans finishing from now on are not queued for the old file
+                self._records.put(None)
+                self._writer.join()
+                self._writer = None
+            if jsonl_path:
+                path = Path(jsonl_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                jsonl_file = open(path, "a", encoding="utf-8")
+                self._writer = threading.Thread(target=self._write_records, args=(path, jsonl_file), name="tracer-writer", daemon=True)
+                self._writer.start()
+                self.jsonl_path = path
+            else:
+                self.jsonl_path = None
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until the spans finished so far are written to the export file."""
+        writer = self._writer
+        if writer is None:
+            return True
+        written = threading.Event()
+        self._records.put(written)
+        return written.wait(timeout)
+
+    def close(self):
+        self.set_jsonl_path(None)
+
+    def _write_records(self, path: Path, jsonl_file):
+        """Writer thread: appends queued lines in batches, flushing when the queue runs empty."""
+        stopped = False
+        while not stopped:
+            items = [self._records.get()]
+            while True:
+                try:
+                    items.append(self._records.get_nowait())
+                except queue.Empty:
+                    break
+            for item in items:
+                if item is None:
+                    stopped = True
+                    break
+                if isinstance(item, threading.Event):
+                    jsonl_file.flush()
+                    item.set()
+                    continue
+                jsonl_file.write(item)
+            try:
+                jsonl_file.flush()
+                if self.jsonl_max_bytes and jsonl_file.tell() >= self.jsonl_max_bytes:
+                    jsonl_file.close()
+                    self._rotate(path)
+                    jsonl_file = open(path, "a", encoding="utf-8")
+            except OSError as e:
+                self.logger.error(f"Could not write traces to {path}: {e}")
+        jsonl_file.close()
+
+    def _rotate(self, path: Path):
+        """Shifts <path>.1 .. <path>.N-1 up by one and renames path to <path>.1; the oldest file is dropped."""
+        if self.jsonl_backups == 0:
+            os.remove(path)
+            return
+        for i in range(self.jsonl_backups - 1, 0, -1):
+            older = path.with_name(f"{path.name}.{i}")
+            if older.exists():
+                os.replace(older, path.with_name(f"{path.name}.{i + 1}"))
+        os.replace(path, path.with_name(f"{path.name}.1"))
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Times the enclosed block as a span named name. Yields the Span, or None when tracing is disabled."""
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, next(self._ids), _current_span.get(), attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(span)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        """The innermost open span of the calling thread or asyncio task, or None."""
+        return _current_span.get()
+
+    def record(self, name: str, seconds: float, **attributes):
+        """Records a duration measured elsewhere (e.g. in a worker process) as a finished span."""
+        if not self.enabled:
+            return
+        span = Span(name, next(self._ids), _current_span.get(), attributes)
+        span.start_time -= seconds
+        span.duration = seconds
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            durations = self._durations.get(span.name)
+            if durations is None:
+                durations = self._durations[span.name] = deque(maxlen=self.histogram_window)
+                self._totals[span.name] = [0, 0.0, 0]
+            durations.append(span.duration)
+            totals = self._totals[span.name]
+            totals[0] += 1
+            totals[1] += span.duration
+            totals[2] += span.error is not None
+        if self.jsonl_path is not None:
+            # Serialized here, written by the writer thread, so no request thread waits on disk I/O
+            self._records.put(json.dumps(span.to_record(), default=str) + "\n")
+
+    def _snapshot(self):
+        with self._lock:
+            return {name: (np.array(self._durations[name]), list(self._totals[name])) for name in self._durations}
+
+    def stats(self) -> dict:
+        """Per span name: count, errors, mean and p50/p95/p99/max of the recent durations, in milliseconds."""
+        stats = {}
+        for name, (durations, (count, total, errors)) in sorted(self._snapshot().items()):
+            percentiles = np.percentile(durations, self.PERCENTILES) * 1000.0
+            stats[name] = {"count": count,
+                           "errors": errors,
+                           "mean_ms": round(total / count * 1000.0, 3),
+                           **{f"p{p}_ms": round(float(value), 3) for p, value in zip(self.PERCENTILES, percentiles)},
+                           "max_ms": round(float(durations.max()) * 1000.0, 3)}
+        return stats
+
+    def to_prometheus(self, metric_name: str = "rag_stage_duration_seconds") -> str:
+        """Renders the span durations as a Prometheus summary, plus an error counter, in the text exposition format."""
+        snapshot = sorted(self._snapshot().items())
+        lines = [f"# HELP {metric_name} Duration of RAG pipeline stages.", f"# TYPE {metric_name} summary"]
+        for name, (durations, (count, total, _)) in snapshot:
+            label = _escape_label(name)
+            for p, value in zip(self.PERCENTILES, np.percentile(durations, self.PERCENTILES)):
+                lines.append(f'{metric_name}{{stage="{label}",quantile="{p / 100}"}} {value:.6f}')
+            lines.append(f'{metric_name}_sum{{stage="{label}"}} {total:.6f}')
+            lines.append(f'{metric_name}_count{{stage="{label}"}} {count}')
+        lines += ["# HELP rag_stage_errors_total Stages that raised an exception.", "# TYPE rag_stage_errors_total counter"]
+        for name, (_, (_, _, errors)) in snapshot:
+            lines.append(f'rag_stage_errors_total{{stage="{_escape_label(name)}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drops the aggregated durations."""
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
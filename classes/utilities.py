@@ -1,5 +1,6 @@
 import shutil
 import logging
+import sys
 
 logger = logging.getLogger(__name__)
 
@@ -17,3 +18,12 @@ def delete_directory(directory_path):
         logger.error(f"An error occurred while deleting '{directory_path}': {e}")
         raise e
 
+def get_peak_rss_mb():
+    """Returns the peak resident set size of the current process in MB, or None if it cannot be determined."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
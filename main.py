@@ -2,15 +2,21 @@ import os
 # import json
 import logging
 import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import importlib
+import re
+import subprocess
+import sys
 from classes.config_manager import ConfigManager
-from classes.document_ingestor import DocumentIngestor
-from classes.embedding_preparer import EmbeddingPreparer
-from classes.embedding_loader import EmbeddingLoader
-from classes.llm_client import LLMClient
-from classes.chromadb_retriever import ChromaDBRetriever
-from classes.rag_query_processor import RAGQueryProcessor
+from classes.hnsw_index_config import HNSWIndexConfig
+from classes.tracer import Tracer
 from classes.utilities import delete_directory
+# Everything else under classes/ is imported inside the step that needs it: the ingest, embedding, retriever
+# and reranker modules pull in torch, transformers, langchain, pdfplumber, chromadb or sentence-transformers,
+# which would make every invocation (even --help or a non-RAG step05) pay seconds of import time.
+# Run with --profile_imports to see what a step imports and how long it takes.
 
 from datetime import datetime
 import time
@@ -19,7 +25,23 @@ CONFIG_FILE = "config.json"
 SCRIPT_DIR = Path(__file__).parent
 CONFIG_FILE_NAME = "config.json"
 CONFIG_FULL_PATH = SCRIPT_DIR / CONFIG_FILE_NAME
-config = ConfigManager(CONFIG_FULL_PATH)  # Use ConfigManager for configuration loading
+
+# Modules whose import at startup is a regression for steps that do not use them
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "langchain", "pdfplumber", "chromadb")
+
+
+def get_config():
+    """Loads config.json on first use; `main.config` stays assignable (tests patch it) and importable."""
+    if "config" not in globals():
+        globals()["config"] = ConfigManager(CONFIG_FULL_PATH)  # Use ConfigManager for configuration loading
+    return globals()["config"]
+
+
+def __getattr__(name):
+    # `from main import config` / `main.config` before the first get_config() call
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def setup_logging(log_level):
@@ -42,6 +64,55 @@ def setup_logging(log_level):
     logging.getLogger("urllib3").setLevel(logging.WARNING)  # Reduce excessive API logs
 
 
+def setup_tracing():
+    """Configures the process-wide tracer that times the pipeline stages."""
+    config = get_config()
+    Tracer.get().configure(enabled=bool(config.get("tracing_enabled", True)),
+                           jsonl_path=config.get("tracing_jsonl_path") or None,
+                           histogram_window=int(config.get("tracing_histogram_window", 2048)),
+                           jsonl_max_bytes=int(float(config.get("tracing_jsonl_max_mb", 50)) * 1024 * 1024))
+
+
+def log_stage_timings():
+    """Logs the latency percentiles of every traced stage."""
+    stats = Tracer.get().stats()
+    if not stats:
+        return
+    logging.info("------ Stage timings (ms) -------")
+    for name, stage in stats.items():
+        logging.info(f"{name:<50}: count {stage['count']}, p50 {stage['p50_ms']}, p95 {stage['p95_ms']}, "
+                     f"p99 {stage['p99_ms']}, max {stage['max_ms']}")
+
+
+def setup_model_registry(args):
+    """Sets the model eviction limit and, if enabled, starts loading the models a query step needs in the background."""
+    from classes.model_registry import ModelRegistry
+    config = get_config()
+    registry = ModelRegistry.get()
+    registry.configure(max_models=int(config.get("model_registry_max_models", 0)))
+
+    # Query steps open the vector db, BM25 index and LLM client while the weights load; the indexing steps
+    # load their model first thing (and may fork ingest workers, which must not happen mid-load)
+    query_step = args.step == "serve_queries" or (args.step == "step04_retrieve_chunks" and not args.use_server) or \
+        (args.step in ("step05_generate_response", "batch_generate_responses") and args.use_rag and not args.use_server)
+    if not config.get("model_warmup", False) or not query_step:
+        return None
+
+    def load_embedding_model():
+        from classes.text_encoder import TextEncoder
+        TextEncoder.preload(config.get("embedding_model_name"))
+
+    def load_reranker_model():
+        from classes.cross_encoder_reranker import CrossEncoderReranker
+        CrossEncoderReranker.preload(config.get("reranker_model_name", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+
+    loads = [load_embedding_model]
+    if config.get("reranker_enabled", False) and args.step != "step04_retrieve_chunks":
+        loads.append(load_reranker_model)
+    logging.info(f"Warming up {len(loads)} model(s) in the background.")
+    return registry.warmup(loads)
+
+
 def ensure_directories_exist(config):
     """Ensures necessary directories exist, creating them if needed."""
     for key in config.get_directory_names():
@@ -52,19 +123,30 @@ def ensure_directories_exist(config):
 
 def step01_ingest_documents(args):
     """ Step 01: Reads and preprocesses documents."""
+    from classes.document_ingestor import DocumentIngestor
+    config = get_config()
     logging.info("[Step 01] Document ingestion started.")
 
     file_list = [args.input_filename] if args.input_filename != "all" else os.listdir(config.get("raw_input_directory"))
     ingestor = DocumentIngestor(file_list=file_list,
                                 input_dir=config.get("raw_input_directory"),
                                 output_dir=config.get("cleaned_text_directory"),
-                                embedding_model_name=config.get("embedding_model_name"))
-    ingestor.process_files()
+                                embedding_model_name=config.get("embedding_model_name"),
+                                num_workers=int(config.get("ingest_num_workers", 1)),
+                                lexical_index=create_lexical_index(file_list, process_all=args.input_filename == "all"),
+                                chunk_size=int(config.get("chunk_size", 1000)),
+                                chunk_overlap=int(config.get("chunk_overlap", 150)))
+    try:
+        ingestor.process_files()
+    finally:
+        ingestor.close()
 
     logging.info("[Step 01] Document ingestion completed.")
     
 def step02_generate_embeddings(args):
     """ Step 02: Generates vector embeddings from text chunks."""
+    from classes.embedding_preparer import EmbeddingPreparer
+    config = get_config()
     logging.info("[Step 02] Embedding generation started.")
 
     all_files = os.listdir(config.get("cleaned_text_directory"))
@@ -79,22 +161,39 @@ def step02_generate_embeddings(args):
     preparer = EmbeddingPreparer(file_list=file_list,
                                  input_dir=config.get("cleaned_text_directory"),
                                  output_dir=config.get("embeddings_directory"),
-                                 embedding_model_name=config.get("embedding_model_name"))
-    preparer.process_files()
+                                 embedding_model_name=config.get("embedding_model_name"),
+                                 batch_size=int(config.get("embedding_batch_size", 32)),
+                                 max_tokens_per_batch=int(config.get("embedding_max_tokens_per_batch", 8192)),
+                                 storage_format=config.get("embedding_storage_format", "npy"))
+    try:
+        if getattr(args, "verify_embeddings", False):
+            # Only check that stored vectors match what the shared encoder produces now
+            if preparer.verify_embeddings(sample_size=int(config.get("embedding_verify_sample_size", 8))):
+                logging.info("[Step 02] Stored embeddings match the current encoder.")
+            else:
+                logging.error("[Step 02] Stored embeddings do not match the current encoder; re-run step02 without --verify_embeddings.")
+            return
+        preparer.process_files()
+    finally:
+        preparer.close()
 
     logging.info("[Step 02] Embedding generation completed.")
     
 def step03_store_vectors(args):
     """ Step 03: Stores embeddings in a vector database."""
+    from classes.embedding_loader import EmbeddingLoader
+    config = get_config()
     logging.info("[Step 03] Vector storage started.")
 
-    # delete existing vectordb
-    if Path(config.get("vectordb_directory")).exists():
+    # In incremental mode the existing vectordb is kept and only changed chunks are written
+    incremental = bool(config.get("incremental_indexing", False))
+    if not incremental and Path(config.get("vectordb_directory")).exists():
         logging.info("deleting existing vectordb")
         delete_directory(config.get("vectordb_directory"))
 
     all_files = os.listdir(config.get("cleaned_text_directory"))
-    if args.input_filename and args.input_filename != "all":
+    process_all = not args.input_filename or args.input_filename == "all"
+    if not process_all:
         # Find chunk file corresponding to original file name
         target_stem = Path(args.input_filename).stem
         file_list = [f for f in all_files if f.startswith(target_stem) and f.endswith("_cleaned_chunks.json")]
@@ -106,24 +205,189 @@ def step03_store_vectors(args):
                              cleaned_text_dir=config.get("cleaned_text_directory"),
                              embeddings_dir=config.get("embeddings_directory"),
                              vectordb_dir=config.get("vectordb_directory"),
-                             collection_name=config.get("collection_name"))
+                             collection_name=config.get("collection_name"),
+                             incremental=incremental,
+                             prune_missing_sources=incremental and process_all,
+                             index_config=HNSWIndexConfig.from_config(config),
+                             # The raw documents, not the chunk files: pipeline_all may not have written any
+                             source_stems=list_source_stems() if incremental and process_all else None)
     loader.process_files()
+    write_retriever_index(loader)
 
     logging.info("[Step 03] Vector storage completed.")
 
 
+def list_source_stems():
+    """Stems of the documents in the raw input directory, or None if it cannot be listed."""
+    config = get_config()
+    try:
+        return {Path(file_name).stem for file_name in os.listdir(config.get("raw_input_directory"))}
+    except OSError as e:
+        logging.warning(f"Could not list the raw input directory, pruning against the cleaned chunk files: {e}")
+        return None
+
+
+def pipeline_all(args):
+    """ Runs steps 01-03 as one streaming pass, without intermediate files unless requested."""
+    from classes.document_ingestor import DocumentIngestor
+    from classes.embedding_preparer import EmbeddingPreparer
+    from classes.embedding_loader import EmbeddingLoader
+    from classes.streaming_pipeline import StreamingPipeline
+    config = get_config()
+    logging.info("[Pipeline] Streaming ingest -> embed -> store started.")
+
+    incremental = bool(config.get("incremental_indexing", False))
+    if not incremental and Path(config.get("vectordb_directory")).exists():
+        logging.info("deleting existing vectordb")
+        delete_directory(config.get("vectordb_directory"))
+
+    process_all = not args.input_filename or args.input_filename == "all"
+    file_list = os.listdir(config.get("raw_input_directory")) if process_all else [args.input_filename]
+    persist_intermediates = bool(getattr(args, "persist_intermediates", False) or config.get("pipeline_persist_intermediates", False))
+
+    ingestor = DocumentIngestor(file_list=file_list,
+                                input_dir=config.get("raw_input_directory"),
+                                output_dir=config.get("cleaned_text_directory"),
+                                embedding_model_name=config.get("embedding_model_name"),
+                                num_workers=int(config.get("ingest_num_workers", 1)),
+                                lexical_index=create_lexical_index(file_list, process_all),
+                                chunk_size=int(config.get("chunk_size", 1000)),
+                                chunk_overlap=int(config.get("chunk_overlap", 150)))
+    preparer = EmbeddingPreparer(file_list=[],
+                                 input_dir=config.get("cleaned_text_directory"),
+                                 output_dir=config.get("embeddings_directory"),
+                                 embedding_model_name=config.get("embedding_model_name"),
+                                 batch_size=int(config.get("embedding_batch_size", 32)),
+                                 max_tokens_per_batch=int(config.get("embedding_max_tokens_per_batch", 8192)),
+                                 storage_format=config.get("embedding_storage_format", "npy"))
+    loader = EmbeddingLoader(cleaned_text_file_list=[],
+                             cleaned_text_dir=config.get("cleaned_text_directory"),
+                             embeddings_dir=config.get("embeddings_directory"),
+                             vectordb_dir=config.get("vectordb_directory"),
+                             collection_name=config.get("collection_name"),
+                             incremental=incremental,
+                             index_config=HNSWIndexConfig.from_config(config))
+
+    pipeline = StreamingPipeline(ingestor=ingestor,
+                                 preparer=preparer,
+                                 loader=loader,
+                                 queue_size=int(config.get("pipeline_queue_size", 4)),
+                                 persist_intermediates=persist_intermediates)
+    try:
+        pipeline.run(prune_missing_sources=incremental and process_all)
+    finally:
+        close_all(ingestor, preparer)
+    write_retriever_index(loader)
+
+    logging.info("[Pipeline] Streaming ingest -> embed -> store completed.")
+
+
+def create_llm_client(async_client=False):
+    """Builds the (optionally asyncio) LLM client with the connection pool, timeout, retry and circuit breaker settings from config."""
+    config = get_config()
+    extra_args = {"max_concurrency": int(config.get("async_max_concurrency", 32))} if async_client else {}
+    if async_client:
+        from classes.async_llm_client import AsyncLLMClient as client_class
+    else:
+        from classes.llm_client import LLMClient as client_class
+    return client_class(llm_api_url=config.get("llm_api_url"),
+                        llm_model_name=config.get("llm_model_name"),
+                        **extra_args,
+                        connect_timeout=float(config.get("llm_connect_timeout_seconds", 5.0)),
+                        read_timeout=float(config.get("llm_read_timeout_seconds", 120.0)),
+                        max_retries=int(config.get("llm_max_retries", 3)),
+                        backoff_base=float(config.get("llm_backoff_base_seconds", 0.5)),
+                        backoff_max=float(config.get("llm_backoff_max_seconds", 8.0)),
+                        pool_size=int(config.get("llm_pool_size", 10)),
+                        circuit_failure_threshold=int(config.get("llm_circuit_failure_threshold", 5)),
+                        circuit_reset_seconds=float(config.get("llm_circuit_reset_seconds", 30.0)))
+
+
+# Backend name -> (module, class); the class is imported by load_retriever_backend() only when it is used
+RETRIEVER_BACKENDS = {"chroma": ("classes.chromadb_retriever", "ChromaDBRetriever"),
+                      "numpy": ("classes.numpy_retriever", "NumpyRetriever")}
+
+
+def load_retriever_backend(name):
+    """Imports and returns the retriever class registered under name in RETRIEVER_BACKENDS."""
+    module_name, class_name = RETRIEVER_BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_retriever():
+    """Builds the retriever used by the query steps, with the query embedding cache if enabled."""
+    from classes.embedding_cache import EmbeddingCache
+    config = get_config()
+    embedding_cache = None
+    if int(config.get("query_embedding_cache_size", 0)) > 0:
+        ttl_seconds = config.get("query_embedding_cache_ttl_seconds")
+        embedding_cache = EmbeddingCache(model_name=config.get("embedding_model_name"),
+                                         max_size=int(config.get("query_embedding_cache_size")),
+                                         ttl_seconds=float(ttl_seconds) if ttl_seconds else None,
+                                         cache_dir=config.get("query_cache_directory"),
+                                         max_disk_entries=int(config.get("query_cache_max_disk_entries", 65536)))
+
+    retriever_class = load_retriever_backend(config.get("retriever_backend", "chroma"))
+    relative_cutoff = config.get("retriever_relative_cutoff")
+    retriever = retriever_class(vectordb_dir=config.get("vectordb_directory"),
+                                embedding_model_name=config.get("embedding_model_name"),
+                                collection_name=config.get("collection_name"),
+                                score_threshold=float(config.get("retriever_min_score_threshold", 0.5)),
+                                embedding_cache=embedding_cache,
+                                index_config=HNSWIndexConfig.from_config(config),
+                                relative_cutoff=float(relative_cutoff) if relative_cutoff else None)
+    if config.get("hybrid_retrieval", False):
+        from classes.bm25_index import BM25Index
+        from classes.hybrid_retriever import HybridRetriever
+        retriever = HybridRetriever(dense_retriever=retriever,
+                                    lexical_index=BM25Index(config.get("lexical_index_directory")),
+                                    candidate_k=int(config.get("hybrid_candidate_k", 20)),
+                                    rrf_k=int(config.get("hybrid_rrf_k", 60)),
+                                    min_lexical_score=float(config.get("hybrid_min_bm25_score", 2.0)))
+    return retriever
+
+
+def close_all(*resources):
+    """Closes the pipeline objects a step created, so the shared models they hold can be evicted; None is skipped."""
+    for resource in resources:
+        if resource is not None:
+            resource.close()
+
+
+def create_lexical_index(file_list, process_all):
+    """Opens the BM25 index updated at ingest time; a full ingest drops sources that are no longer in the input."""
+    from classes.bm25_index import BM25Index
+    config = get_config()
+    if not config.get("lexical_index_directory"):
+        return None
+    lexical_index = BM25Index(config.get("lexical_index_directory"))
+    if process_all:
+        lexical_index.retain_sources(Path(file_name).stem for file_name in file_list)
+    return lexical_index
+
+
+def write_retriever_index(loader):
+    """Exports the stored vectors for retriever backends that keep their own index."""
+    config = get_config()
+    if config.get("retriever_backend", "chroma") == "numpy":
+        load_retriever_backend("numpy").write_index(loader.collection, config.get("vectordb_directory"))
+
+
 def step04_retrieve_relevant_chunks(args):
     """ Step 04: Retrieves relevant text chunks based on a query."""
+    from classes.query_server import QueryServerClient
     logging.info("[Step 04] Retrieval started.")
 
     logging.info( f"Query arguments: {args.query_args}")
 
-    retriever = ChromaDBRetriever(vectordb_dir=config.get("vectordb_directory"),
-                                 embedding_model_name=config.get("embedding_model_name"),
-                                 collection_name=config.get("collection_name"),
-                                 score_threshold=float(config.get("retriever_min_score_threshold")))
-
-    search_results = retriever.query(args.query_args, top_k=3)
+    if getattr(args, "use_server", False):
+        search_results = QueryServerClient(get_query_server_url()).retrieve(args.query_args, top_k=3)
+    else:
+        retriever = create_retriever()
+        try:
+            search_results = retriever.query(args.query_args, top_k=3)
+        finally:
+            retriever.close()
 
     if not search_results:
         logging.info("*** No relevant documents found.")
@@ -147,28 +411,202 @@ def step04_retrieve_relevant_chunks(args):
 
 def step05_generate_response(args):
     """ Step 05: Uses LLM to generate an augmented response."""
+    from classes.query_server import QueryServerClient
+    from classes.rag_query_processor import RAGQueryProcessor
     logging.info("[Step 05] Response generation started.")
 
-    llm_client = LLMClient(llm_api_url=config.get("llm_api_url"),
-                           llm_model_name=config.get("llm_model_name"))
+    if getattr(args, "use_server", False):
+        response = QueryServerClient(get_query_server_url()).generate(args.query_args, use_rag=args.use_rag)
+        print("\nResponse:\n", response)
+        logging.info("[Step 05] Response generation completed.")
+        return
+
+    llm_client = create_llm_client()
 
     # llm_response = llm_client.query(args.query_args)
     # logging.info("\nLLM Response:\n", llm_response)
     # print("\nLLM Response:\n", llm_response)
 
-    retriever = ChromaDBRetriever(vectordb_dir=config.get("vectordb_directory"),
-                             embedding_model_name=config.get("embedding_model_name"),
-                             collection_name=config.get("collection_name"))
+    retriever = create_retriever() if args.use_rag else None  # a non-RAG query never loads the embedding model
 
     processor = RAGQueryProcessor(llm_client=llm_client,
                                   retriever=retriever,
-                                  use_rag=args.use_rag)
-    response = processor.query(args.query_args)
-    print("\nResponse:\n", response)
+                                  use_rag=args.use_rag,
+                                  context_builder=create_context_builder(),
+                                  reranker=create_reranker() if args.use_rag else None)
+    try:
+        if getattr(args, "stream", False):
+            print("\nResponse:\n", end=" ", flush=True)
+            start_time = time.perf_counter()
+            time_to_first_token = None
+            for token in processor.stream_query(args.query_args):
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                print(token, end="", flush=True)
+            print()
+            logging.info(f"Time to first token: {f'{time_to_first_token:.2f}s' if time_to_first_token is not None else 'N/A'}, "
+                         f"total response time: {time.perf_counter() - start_time:.2f}s")
+        else:
+            response = processor.query(args.query_args)
+            print("\nResponse:\n", response)
+    finally:
+        close_all(retriever, processor.reranker, processor.context_builder)
 
     logging.info("[Step 05] Response generation completed.")
 
 
+def batch_generate_responses(args):
+    """ Answers every question in a text file (one per line) concurrently using asyncio."""
+    config = get_config()
+    logging.info("[Batch] Concurrent response generation started.")
+
+    with open(args.queries_file, "r", encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    logging.info(f"Answering {len(questions)} questions with up to {config.get('async_max_concurrency', 32)} in flight.")
+
+    responses = asyncio.run(_generate_responses_async(questions, args.use_rag))
+    for question, response in zip(questions, responses):
+        print(f"\nQuestion:\n {question}\nResponse:\n {response}")
+
+    logging.info("[Batch] Concurrent response generation completed.")
+
+
+async def _generate_responses_async(questions, use_rag):
+    from classes.rag_query_processor import RAGQueryProcessor
+    config = get_config()
+    retriever = create_retriever() if use_rag else None
+    context_builder = create_context_builder()
+    reranker = create_reranker() if use_rag else None
+    try:
+        async with create_llm_client(async_client=True) as llm_client:
+            with ThreadPoolExecutor(max_workers=int(config.get("async_executor_workers", 4))) as executor:
+                processor = RAGQueryProcessor(llm_client=llm_client,
+                                              retriever=retriever,
+                                              use_rag=use_rag,
+                                              max_concurrency=int(config.get("async_max_concurrency", 32)),
+                                              executor=executor,
+                                              context_builder=context_builder,
+                                              reranker=reranker)
+                return await asyncio.gather(*(processor.aquery(question) for question in questions))
+    finally:
+        close_all(retriever, reranker, context_builder)
+
+
+def create_context_builder():
+    """
+    Builds the context packer. Its overlap trimming follows the splitter's chunk_overlap.
+    Token counts use context_tokenizer_name, which should be the Hugging Face tokenizer of the LLM. The default
+    Ollama model has none locally, so when it is empty they are estimated as characters / context_chars_per_token.
+    """
+    from classes.context_builder import ContextBuilder
+    config = get_config()
+    return ContextBuilder(max_context_tokens=int(config.get("context_max_tokens", 2048)),
+                          tokenizer_name=config.get("context_tokenizer_name") or None,
+                          overlap_chars=int(config.get("chunk_overlap", 150)),
+                          chars_per_token=float(config.get("context_chars_per_token", 4.0)))
+
+
+def create_reranker():
+    """Builds the cross-encoder re-ranking stage, or returns None when it is disabled."""
+    config = get_config()
+    if not config.get("reranker_enabled", False):
+        return None
+    from classes.cross_encoder_reranker import CrossEncoderReranker
+    max_latency_ms = config.get("reranker_max_latency_ms")
+    return CrossEncoderReranker(model_name=config.get("reranker_model_name", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+                                top_n=int(config.get("reranker_top_n", 3)),
+                                max_candidates=int(config.get("reranker_max_candidates", 20)),
+                                batch_size=int(config.get("reranker_batch_size", 16)),
+                                max_latency_ms=float(max_latency_ms) if max_latency_ms else None,
+                                cache_size=int(config.get("reranker_cache_size", 4096)))
+
+
+def get_query_server_url():
+    config = get_config()
+    return f"http://{config.get('query_server_host', '127.0.0.1')}:{int(config.get('query_server_port', 8765))}"
+
+
+def serve_queries(args):
+    """ Starts a long-lived query server holding the retriever and LLM client warm."""
+    from classes.llm_scheduler import LLMRequestScheduler
+    from classes.response_cache import SemanticResponseCache
+    from classes.query_server import QueryServer
+    config = get_config()
+    logging.info("[Server] Query server starting.")
+
+    llm_client = create_llm_client()
+    if int(config.get("llm_scheduler_max_concurrency", 0)) > 0:
+        # Coalesce identical prompts and cap concurrent requests to the local LLM
+        llm_client = LLMRequestScheduler(llm_client, max_concurrency=int(config.get("llm_scheduler_max_concurrency")))
+    retriever = create_retriever()
+    response_cache = None
+    if int(config.get("response_cache_size", 0)) > 0:
+        response_cache = SemanticResponseCache(similarity_threshold=float(config.get("response_cache_similarity_threshold", 0.95)),
+                                               max_entries=int(config.get("response_cache_size")))
+    context_builder = create_context_builder()
+    reranker = create_reranker()
+    server = QueryServer(retriever=retriever,
+                         llm_client=llm_client,
+                         response_cache=response_cache,
+                         context_builder=context_builder,
+                         reranker=reranker,
+                         host=config.get("query_server_host", "127.0.0.1"),
+                         port=int(config.get("query_server_port", 8765)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("[Server] Query server interrupted.")
+    finally:
+        close_all(retriever, reranker, context_builder)
+
+    logging.info("[Server] Query server stopped.")
+
+
+def summarize_import_profile(lines, top_n=15):
+    """
+    Aggregates `python -X importtime` output by top-level package.
+
+    :param lines: stderr lines of the profiled process; lines that are not import timings are ignored.
+    :param top_n: Number of packages to report, slowest first.
+    :return: {"total_ms", "modules", "packages": [(package, ms), ...], "heavy_modules": [...]}
+    """
+    package_us = {}
+    modules = set()
+    for line in lines:
+        match = re.match(r"import time:\s*(\d+) \|\s*\d+ \|\s*(\S+)", line)
+        if not match:
+            continue
+        module = match.group(2)
+        modules.add(module)
+        package = module.split(".")[0]
+        package_us[package] = package_us.get(package, 0) + int(match.group(1))  # self time, so nothing is counted twice
+    slowest = sorted(package_us.items(), key=lambda item: -item[1])[:top_n]
+    return {"total_ms": round(sum(package_us.values()) / 1000.0, 1),
+            "modules": len(modules),
+            "packages": [(package, round(us / 1000.0, 1)) for package, us in slowest],
+            "heavy_modules": sorted(name for name in HEAVY_MODULES if name in modules)}
+
+
+def profile_imports(argv):
+    """Re-runs this command under `python -X importtime`, passes its output through and prints the import profile."""
+    process = subprocess.Popen([sys.executable, "-X", "importtime", str(Path(__file__).resolve()), *argv],
+                               stderr=subprocess.PIPE, text=True)
+    import_lines = []
+    for line in process.stderr:
+        if line.startswith("import time:"):
+            import_lines.append(line)
+        else:
+            sys.stderr.write(line)
+    process.wait()
+
+    profile = summarize_import_profile(import_lines)
+    print(f"\n------ Import profile: {profile['total_ms']} ms, {profile['modules']} modules -------")
+    for package, ms in profile["packages"]:
+        print(f"{package:<50}: {ms} ms")
+    print(f"{'heavy modules imported':<50}: {', '.join(profile['heavy_modules']) or 'none'}")
+    return process.returncode
+
+
 def main():
 
     print("rag_pipeline starting...")
@@ -179,7 +617,10 @@ def main():
                                  "step02_generate_embeddings",
                                  "step03_store_vectors",
                                  "step04_retrieve_chunks",
-                                 "step05_generate_response"],
+                                 "step05_generate_response",
+                                 "pipeline_all",
+                                 "serve_queries",
+                                 "batch_generate_responses"],
                         help="Specify the pipeline step.")
 
     parser.add_argument("--input_filename",
@@ -196,16 +637,50 @@ def main():
                         action="store_true",
                         help="Call vectordb for RAG before sending to LLM (Optional, required for step05_generate_response)")
 
+    parser.add_argument("--persist_intermediates",
+                        action="store_true",
+                        help="Also write cleaned chunk and embedding files when running pipeline_all. (Optional)")
+
+    parser.add_argument("--queries_file",
+                        nargs="?",
+                        default=None,
+                        help="Text file with one question per line. (Optional, required for batch_generate_responses)")
+
+    parser.add_argument("--stream",
+                        action="store_true",
+                        help="Print the step05 response token by token as the LLM generates it. (Optional)")
+
+    parser.add_argument("--use_server",
+                        action="store_true",
+                        help="Send step04/step05 queries to a running serve_queries process instead of loading models. (Optional)")
+
+    parser.add_argument("--verify_embeddings",
+                        action="store_true",
+                        help="With step02, re-encode a sample of chunks and check the stored embeddings match instead of regenerating them. (Optional)")
+
+    parser.add_argument("--profile_imports",
+                        action="store_true",
+                        help="Run the step under `python -X importtime` and print the slowest imported packages. (Optional)")
+
     args = parser.parse_args()
 
     # Ensure that query_args is required only when using step04_retrieve_chunks
     if args.step in ["step04_retrieve_chunks", "step05_generate_response"] and args.query_args is None:
         parser.error("The 'query_args' parameter is required when using step04_retrieve_chunks or step05_generate_response.")
 
+    if args.step == "batch_generate_responses" and args.queries_file is None:
+        parser.error("The 'queries_file' parameter is required when using batch_generate_responses.")
+
     if args.step == "step05_generate_response" and args.use_rag is None:
         parser.error("The 'use_rag' parameter is required when using step05_generate_response.")
 
-    #
+    if args.stream and args.use_server:
+        parser.error("The 'stream' parameter cannot be combined with 'use_server'; the query server returns complete responses.")
+
+    if args.profile_imports and "importtime" not in sys._xoptions:
+        sys.exit(profile_imports(sys.argv[1:]))
+
+    config = get_config()
     setup_logging(config.get("log_level", "DEBUG"))
 
     logging.info("------ Command line arguments -------")
@@ -213,26 +688,42 @@ def main():
     logging.info(f"{'input_filename':<50}: {args.input_filename}")
     logging.info(f"{'query_args':<50}: {args.query_args}")
     logging.info(f"{'use_rag':<50}: {args.use_rag}")
+    logging.info(f"{'persist_intermediates':<50}: {args.persist_intermediates}")
+    logging.info(f"{'use_server':<50}: {args.use_server}")
+    logging.info(f"{'stream':<50}: {args.stream}")
+    logging.info(f"{'queries_file':<50}: {args.queries_file}")
+    logging.info(f"{'verify_embeddings':<50}: {args.verify_embeddings}")
+    logging.info(f"{'profile_imports':<50}: {args.profile_imports}")
     logging.info("------ Config Settings -------")
     for key in sorted(config.to_dict().keys()):
         logging.info(f"{key:<50}: {config.get(key)}")
     logging.info("------------------------------")
     ensure_directories_exist(config)
+    setup_tracing()
+    setup_model_registry(args)
 
     steps = {
         "step01_ingest": step01_ingest_documents,
         "step02_generate_embeddings": step02_generate_embeddings,
         "step03_store_vectors": step03_store_vectors,
         "step04_retrieve_chunks": step04_retrieve_relevant_chunks,
-        "step05_generate_response": step05_generate_response
+        "step05_generate_response": step05_generate_response,
+        "pipeline_all": pipeline_all,
+        "serve_queries": serve_queries,
+        "batch_generate_responses": batch_generate_responses
     }
 
     start_time = time.time() # benchmarking
-    steps[args.step](args)
+    with Tracer.get().span(f"step.{args.step}"):
+        steps[args.step](args)
     elapsed_time = time.time() - start_time
+    log_stage_timings()
+    Tracer.get().close()  # writes the spans still queued for the JSON-lines export
     logging.info(f"{args.step} completed in {elapsed_time:.2f} seconds.")
 
 def check_things():
+    from classes.chromadb_retriever import ChromaDBRetriever
+    config = get_config()
     print("checking things")
     print("1. creating ChromaDBRetriever")
     retriever = ChromaDBRetriever(vectordb_dir=config.get("vectordb_directory"),
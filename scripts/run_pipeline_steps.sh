@@ -15,6 +15,7 @@ python "$BASEDIR/main.py" step01_ingest --input_filename all
 # ----------------------------------
 # python "$BASEDIR/main.py" step02_generate_embeddings --input_filename Zhang_et_al_2024_LLMs_cleaned.txt
 python "$BASEDIR/main.py" step02_generate_embeddings --input_filename all
+# python "$BASEDIR/main.py" step02_generate_embeddings --input_filename all --verify_embeddings
 
 # ----------------------------------
 #  Step 03: Store the cleaned text and embeddings in a vector db
@@ -22,6 +23,12 @@ python "$BASEDIR/main.py" step02_generate_embeddings --input_filename all
 # python "$BASEDIR/main.py" step03_store_vectors  --input_filename Zhang_et_al_2024_LLMs_cleaned.txt
 python "$BASEDIR/main.py" step03_store_vectors --input_filename  all
 
+# ----------------------------------
+#  Alternative to steps 01-03: one streaming pass without intermediate files
+#  	Add "--persist_intermediates" to also write the cleaned text and embedding files
+# ----------------------------------
+# python "$BASEDIR/main.py" pipeline_all --input_filename all
+
 # ----------------------------------
 #  Step 04: Retrieve chunks of text and similarity scores
 # ----------------------------------
@@ -34,3 +41,10 @@ python "$BASEDIR/main.py" step04_retrieve_chunks --query_args "Tell me about pea
 QUERY="Tell me about peanut allergies"
 # python "$BASEDIR/main.py" step05_generate_response  --query_args "$QUERY"
 python "$BASEDIR/main.py" step05_generate_response  --query_args "$QUERY"  --use_rag
+
+# ----------------------------------
+#  Optional: keep models loaded in a long-lived query server
+#  	Steps 04 and 05 then take "--use_server" to send queries to it
+# ----------------------------------
+# python "$BASEDIR/main.py" serve_queries &
+# python "$BASEDIR/main.py" step05_generate_response  --query_args "$QUERY"  --use_rag --use_server
@@ -0,0 +1,329 @@
+"""
+Stage-level benchmarks of the RAG pipeline.
+
+Each stage is timed on its own, in a scratch workspace, so the numbers do not mix cold imports,
+model downloads, indexing and generation. The real data directories are left untouched.
+    ingest    DocumentIngestor over the corpus: files/s, chunks/s, MB/s
+    embed     EmbeddingPreparer: model load time and chunks/s
+    index     EmbeddingLoader into a fresh collection: chunks/s
+    retrieve  first (cold) query, single-query latency percentiles and query_batch throughput
+    generate  RAG answers against a local mock LLM with fixed latency: latency percentiles,
+              time to first token and throughput at a given concurrency
+    startup   cold start (fresh interpreter running startup_probe.py: imports, model load, first query)
+              vs warm start (new retriever in a process that already holds the model)
+Results, the per-stage tracer percentiles and the git commit are written as JSON, so runs can be
+compared across commits.
+
+Example:
+    python tests/benchmark/benchmark_suite.py --max_files 3 --num_queries 50 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(script_dir))
+
+from classes.document_ingestor import DocumentIngestor
+from classes.embedding_preparer import EmbeddingPreparer
+from classes.embedding_loader import EmbeddingLoader
+from classes.hnsw_index_config import HNSWIndexConfig
+from classes.llm_client import LLMClient
+from classes.rag_query_processor import RAGQueryProcessor
+from classes.text_encoder import TextEncoder
+from classes.tracer import Tracer
+from main import config, RETRIEVER_BACKENDS, create_context_builder, load_retriever_backend
+from mock_llm_server import MockLLMServer
+
+PIPELINE_STAGES = ["ingest", "embed", "index", "retrieve", "generate"]
+STAGES = PIPELINE_STAGES + ["startup"]
+COLLECTION_NAME = "benchmark"
+
+QUERIES = [
+    "What is peanut allergy?",
+    "How is anaphylaxis treated in the emergency department?",
+    "When should epinephrine be administered?",
+    "What are the first-line treatments for atopic dermatitis?",
+    "How is drug allergy diagnosed?",
+    "What is allergen immunotherapy and who benefits from it?",
+    "How should asthma be managed in children?",
+    "Which diagnostic tests are recommended for food allergy?",
+    "What are the symptoms of chronic rhinosinusitis?",
+    "How can pet allergy exposure be reduced at home?",
+]
+
+
+def latency_summary(seconds) -> dict:
+    values = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {"count": int(values.size),
+            "mean_ms": round(float(values.mean()), 3),
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3),
+            "max_ms": round(float(values.max()), 3)}
+
+
+def queries_for(num_queries: int) -> list:
+    return [QUERIES[i % len(QUERIES)] for i in range(num_queries)]
+
+
+def chunk_files(cleaned_dir: Path) -> list:
+    return sorted(path.name for path in cleaned_dir.glob("*_cleaned_chunks.json"))
+
+
+def bench_ingest(args, workspace: Path) -> dict:
+    files = sorted(name for name in os.listdir(args.corpus_dir) if Path(name).suffix.lower() in (".txt", ".pdf"))
+    if args.max_files:
+        files = files[:args.max_files]
+    input_bytes = sum((Path(args.corpus_dir) / name).stat().st_size for name in files)
+    ingestor = DocumentIngestor(file_list=files,
+                                input_dir=args.corpus_dir,
+                                output_dir=workspace / "cleaned_text",
+                                embedding_model_name=config.get("embedding_model_name"),
+                                num_workers=args.ingest_workers,
+                                chunk_size=int(config.get("chunk_size", 1000)),
+                                chunk_overlap=int(config.get("chunk_overlap", 150)))
+    start = time.perf_counter()
+    ingestor.process_files()
+    seconds = time.perf_counter() - start
+
+    num_chunks = sum(len(json.loads((workspace / "cleaned_text" / name).read_text(encoding="utf-8")))
+                     for name in chunk_files(workspace / "cleaned_text"))
+    return {"files": len(files), "chunks": num_chunks, "workers": args.ingest_workers, "seconds": round(seconds, 3),
+            "files_per_second": round(len(files) / seconds, 3),
+            "chunks_per_second": round(num_chunks / seconds, 3),
+            "mb_per_second": round(input_bytes / (1024 * 1024) / seconds, 3)}
+
+
+def bench_embed(args, workspace: Path) -> dict:
+    files = chunk_files(workspace / "cleaned_text")
+    start = time.perf_counter()
+    preparer = EmbeddingPreparer(file_list=files,
+                                 input_dir=workspace / "cleaned_text",
+                                 output_dir=workspace / "embeddings",
+                                 embedding_model_name=config.get("embedding_model_name"),
+                                 batch_size=int(config.get("embedding_batch_size", 32)),
+                                 max_tokens_per_batch=int(config.get("embedding_max_tokens_per_batch", 8192)),
+                                 storage_format=config.get("embedding_storage_format", "npy"))
+    model_load_seconds = time.perf_counter() - start
+
+    num_chunks = sum(len(json.loads((workspace / "cleaned_text" / name).read_text(encoding="utf-8"))) for name in files)
+    start = time.perf_counter()
+    preparer.process_files()
+    seconds = time.perf_counter() - start
+    return {"chunks": num_chunks, "model_load_seconds": round(model_load_seconds, 3), "seconds": round(seconds, 3),
+            "chunks_per_second": round(num_chunks / seconds, 3)}
+
+
+def bench_index(args, workspace: Path) -> dict:
+    files = chunk_files(workspace / "cleaned_text")
+    loader = EmbeddingLoader(cleaned_text_file_list=files,
+                             cleaned_text_dir=workspace / "cleaned_text",
+                             embeddings_dir=workspace / "embeddings",
+                             vectordb_dir=workspace / "vectordb",
+                             collection_name=COLLECTION_NAME,
+                             index_config=HNSWIndexConfig.from_config(config))
+    start = time.perf_counter()
+    loader.process_files()
+    if args.retriever_backend == "numpy":
+        load_retriever_backend("numpy").write_index(loader.collection, workspace / "vectordb")
+    seconds = time.perf_counter() - start
+    num_chunks = loader.collection.count()
+    return {"chunks": num_chunks, "seconds": round(seconds, 3), "chunks_per_second": round(num_chunks / seconds, 3)}
+
+
+def create_retriever(args, workspace: Path):
+    # No query embedding cache, so repeated queries are embedded every time
+    retriever_class = load_retriever_backend(args.retriever_backend)
+    return retriever_class(embedding_model_name=config.get("embedding_model_name"),
+                           collection_name=COLLECTION_NAME,
+                           vectordb_dir=str(workspace / "vectordb"),
+                           score_threshold=float(config.get("retriever_min_score_threshold", 0.5)),
+                           index_config=HNSWIndexConfig.from_config(config))
+
+
+def bench_retrieve(args, workspace: Path) -> dict:
+    retriever = create_retriever(args, workspace)
+    try:
+        return _bench_retrieve(args, retriever)
+    finally:
+        retriever.close()
+
+
+def _bench_retrieve(args, retriever) -> dict:
+    queries = queries_for(args.num_queries)
+
+    start = time.perf_counter()
+    retriever.query(queries[0], top_k=args.top_k)
+    first_query_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.query(query, top_k=args.top_k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.batch_size):
+        retriever.query_batch(queries[i:i + args.batch_size], top_k=args.top_k)
+    batch_seconds = time.perf_counter() - start
+    return {"backend": args.retriever_backend, "top_k": args.top_k,
+            "first_query_ms": round(first_query_seconds * 1000.0, 3),
+            "single": {**latency_summary(latencies), "queries_per_second": round(len(latencies) / sum(latencies), 3)},
+            "batch": {"batch_size": args.batch_size, "queries_per_second": round(len(queries) / batch_seconds, 3)}}
+
+
+def bench_generate(args, workspace: Path) -> dict:
+    retriever = create_retriever(args, workspace)
+    try:
+        return _bench_generate(args, retriever)
+    finally:
+        retriever.close()
+
+
+def _bench_generate(args, retriever) -> dict:
+    queries = queries_for(args.num_queries)
+    with MockLLMServer(latency_ms=args.llm_latency_ms, token_latency_ms=args.llm_token_latency_ms,
+                       response_tokens=args.llm_response_tokens) as llm_server:
+        llm_client = LLMClient(llm_server.url, config.get("llm_model_name"), pool_size=max(args.concurrency, 1))
+        processor = RAGQueryProcessor(llm_client=llm_client, retriever=retriever, use_rag=True,
+                                      context_builder=create_context_builder())
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            processor.query(query)
+            latencies.append(time.perf_counter() - start)
+
+        time_to_first_token = []
+        for query in queries[:min(len(queries), 10)]:
+            for _ in processor.stream_query(query):
+                pass
+            time_to_first_token.append(llm_client.last_stream_stats["time_to_first_token"])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(processor.query, queries))
+        concurrent_seconds = time.perf_counter() - start
+
+    # Time spent outside the LLM call is what our code adds to every answer
+    overhead = np.asarray(latencies) - (args.llm_latency_ms + args.llm_token_latency_ms * args.llm_response_tokens) / 1000.0
+    return {"llm_latency_ms": args.llm_latency_ms, "llm_token_latency_ms": args.llm_token_latency_ms,
+            "llm_response_tokens": args.llm_response_tokens,
+            "sequential": latency_summary(latencies),
+            "pipeline_overhead_p50_ms": round(float(np.percentile(overhead, 50)) * 1000.0, 3),
+            "time_to_first_token": latency_summary(time_to_first_token),
+            "concurrent": {"concurrency": args.concurrency,
+                           "queries_per_second": round(len(queries) / concurrent_seconds, 3)}}
+
+
+def bench_startup(args, workspace: Path) -> dict:
+    cold = []
+    for _ in range(args.startup_runs):
+        start = time.perf_counter()
+        # A separate script: this one has already imported main and the heavy classes
+        result = subprocess.run([sys.executable, str(script_dir / "startup_probe.py"), str(workspace),
+                                 args.retriever_backend, COLLECTION_NAME, str(args.top_k)],
+                                capture_output=True, text=True, cwd=project_root)
+        wall_seconds = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(f"Startup probe failed:\n{result.stderr}")
+        cold.append({**json.loads(result.stdout.strip().splitlines()[-1]), "wall_seconds": round(wall_seconds, 3)})
+
+    # Warm: the model is already loaded in this process, only the retriever is new
+    TextEncoder.get(config.get("embedding_model_name"))
+    warm = []
+    try:
+        for _ in range(args.startup_runs):
+            start = time.perf_counter()
+            retriever = create_retriever(args, workspace)
+            retriever.query(QUERIES[0], top_k=args.top_k)
+            warm.append(time.perf_counter() - start)
+            retriever.close()
+    finally:
+        TextEncoder.release(config.get("embedding_model_name"))
+    return {"cold": {key: round(float(np.median([run[key] for run in cold])), 3) for key in cold[0]},
+            "warm_first_query_seconds": round(float(np.median(warm)), 3),
+            "runs": args.startup_runs}
+
+
+def run_metadata(args) -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, cwd=project_root).stdout.strip()
+        except OSError:
+            return None
+    return {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git("rev-parse", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_model_name": config.get("embedding_model_name"),
+            "args": vars(args)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG pipeline stage by stage.")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES,
+                        help="Stages to report; pipeline stages that later ones depend on are run too.")
+    parser.add_argument("--corpus_dir", default=config.get("raw_input_directory"))
+    parser.add_argument("--max_files", type=int, default=0, help="Only ingest the first n files (0 = all).")
+    parser.add_argument("--ingest_workers", type=int, default=int(config.get("ingest_num_workers", 1)))
+    parser.add_argument("--retriever_backend", default=config.get("retriever_backend", "chroma"), choices=sorted(RETRIEVER_BACKENDS))
+    parser.add_argument("--num_queries", type=int, default=50)
+    parser.add_argument("--top_k", type=int, default=3)
+    parser.add_argument("--batch_size", type=int, default=16, help="Queries per query_batch call.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent RAG queries in the generate stage.")
+    parser.add_argument("--llm_latency_ms", type=float, default=200.0, help="Mock LLM delay before the first token.")
+    parser.add_argument("--llm_token_latency_ms", type=float, default=2.0, help="Mock LLM delay per token.")
+    parser.add_argument("--llm_response_tokens", type=int, default=64)
+    parser.add_argument("--startup_runs", type=int, default=3)
+    parser.add_argument("--workspace", help="Scratch directory to use and keep; a temporary one is removed by default.")
+    parser.add_argument("--output", help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    workspace = Path(args.workspace or tempfile.mkdtemp(prefix="rag_benchmark_"))
+    workspace.mkdir(parents=True, exist_ok=True)
+    last_pipeline_stage = max((PIPELINE_STAGES.index(stage) for stage in args.stages if stage in PIPELINE_STAGES), default=-1)
+    to_run = PIPELINE_STAGES[:last_pipeline_stage + 1] + (["startup"] if "startup" in args.stages else [])
+    if "startup" in to_run and last_pipeline_stage < PIPELINE_STAGES.index("index"):
+        to_run = PIPELINE_STAGES[:3] + ["startup"]  # startup queries the index
+
+    benchmarks = {"ingest": bench_ingest, "embed": bench_embed, "index": bench_index,
+                  "retrieve": bench_retrieve, "generate": bench_generate, "startup": bench_startup}
+    results = {}
+    tracer = Tracer.get()
+    try:
+        for stage in to_run:
+            print(f"--- {stage} ---")
+            tracer.reset()
+            results[stage] = benchmarks[stage](args, workspace)
+            results[stage]["traced_stages"] = tracer.stats()
+            print(json.dumps({key: value for key, value in results[stage].items() if key != "traced_stages"}, indent=2))
+    finally:
+        if not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {"metadata": run_metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Sweeps the Chroma HNSW parameters over the embeddings of our corpus.
+
+For every combination of distance space, M, construction ef and search ef, the stored document
+embeddings are loaded into a throwaway in-memory collection and queried. Each result list is
+compared with an exact (brute force) search under the same metric. The tool reports recall@k,
+p50/p99 query latency and build time.
+
+Example:
+    python tests/benchmark/hnsw_sweep.py --spaces l2 cosine --m 8 16 32 --search_ef 10 50 100 --top_k 5
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent
+sys.path.insert(0, str(project_root))
+
+import chromadb
+from classes.embedding_store import EmbeddingStore
+from classes.hnsw_index_config import HNSWIndexConfig
+from main import config
+
+
+def load_corpus(embeddings_dir: str) -> np.ndarray:
+    """Stacks every stored embedding matrix in the embeddings directory into one float32 matrix."""
+    store = EmbeddingStore(embeddings_dir)
+    stems = sorted({path.name.rsplit("_embeddings", 1)[0] for path in Path(embeddings_dir).glob("*_embeddings.*")
+                    if not path.name.endswith(".manifest.json")})
+    matrices = [np.asarray(store.load(stem, mmap=False), dtype=np.float32) for stem in stems]
+    matrices = [matrix for matrix in matrices if matrix.size]
+    if not matrices:
+        raise RuntimeError(f"No embeddings found in {embeddings_dir}; run step02 first.")
+    return np.vstack(matrices)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, space: str, top_k: int) -> np.ndarray:
+    """Indices of the true top_k neighbours of each query under the given Chroma distance space."""
+    if space == "l2":
+        distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1)[None, :]
+    elif space == "cosine":
+        corpus_unit = corpus / np.linalg.norm(corpus, axis=1, keepdims=True).clip(min=1e-12)
+        queries_unit = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+        distances = 1.0 - queries_unit @ corpus_unit.T
+    else:
+        distances = 1.0 - queries @ corpus.T
+    return np.argsort(distances, axis=1)[:, :top_k]
+
+
+def run_config(client, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+               index_config: HNSWIndexConfig, top_k: int, batch_size: int = 5000) -> dict:
+    collection = index_config.get_or_create_collection(client, f"sweep-{uuid.uuid4().hex[:12]}")
+    ids = [str(i) for i in range(len(corpus))]
+
+    build_start = time.perf_counter()
+    for start in range(0, len(corpus), batch_size):
+        collection.add(ids=ids[start:start + batch_size], embeddings=corpus[start:start + batch_size])
+    build_seconds = time.perf_counter() - build_start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        query_start = time.perf_counter()
+        results = collection.query(query_embeddings=[query], n_results=top_k, include=[])
+        latencies.append(time.perf_counter() - query_start)
+        hits += len({int(i) for i in results["ids"][0]} & set(expected.tolist()))
+    client.delete_collection(collection.name)
+
+    latencies.sort()
+    return {
+        "space": index_config.space,
+        "m": index_config.m,
+        "construction_ef": index_config.construction_ef,
+        "search_ef": index_config.search_ef,
+        f"recall@{top_k}": round(hits / truth.size, 4),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000, 3),
+        "build_seconds": round(build_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters and report recall@k and query latency.")
+    parser.add_argument("--embeddings_dir", default=config.get("embeddings_directory"), help="Directory with stored embeddings.")
+    parser.add_argument("--spaces", nargs="+", default=[config.get("vector_distance_space", "l2")], choices=HNSWIndexConfig.SPACES)
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--construction_ef", nargs="+", type=int, default=[100, 200])
+    parser.add_argument("--search_ef", nargs="+", type=int, default=[10, 50, 100])
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--num_queries", type=int, default=200, help="Number of corpus vectors used as queries.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.embeddings_dir)
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(corpus), size=min(args.num_queries, len(corpus)), replace=False)
+    # Perturb the sampled vectors slightly so queries are not exact copies of indexed points
+    queries = corpus[query_rows] + rng.normal(scale=0.01, size=(len(query_rows), corpus.shape[1])).astype(np.float32)
+    top_k = min(args.top_k, len(corpus))
+    print(f"Corpus: {len(corpus)} vectors of dimension {corpus.shape[1]}, {len(queries)} queries, top_k={top_k}")
+
+    client = chromadb.EphemeralClient()
+    results = []
+    for space in args.spaces:
+        truth = exact_top_k(corpus, queries, space, top_k)
+        for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+            index_config = HNSWIndexConfig(space=space, m=m, construction_ef=construction_ef, search_ef=search_ef)
+            result = run_config(client, corpus, queries, truth, index_config, top_k)
+            results.append(result)
+            print(f"space={space:<6} M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                  f"recall@{top_k}={result[f'recall@{top_k}']:.4f} p50={result['p50_ms']:.3f}ms "
+                  f"p99={result['p99_ms']:.3f}ms build={result['build_seconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Deterministic local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+
+The answer to a prompt depends only on the prompt, and the server waits a fixed time before the
+first token plus a fixed time per token. So benchmarks measure our pipeline, not the model, and
+runs can be compared across commits without Ollama. Both plain and "stream": true (SSE) requests
+are supported.
+
+Example:
+    python tests/benchmark/mock_llm_server.py --port 11435 --latency_ms 200 --token_latency_ms 5
+    # then set "llm_api_url": "http://127.0.0.1:11435/v1/chat/completions" in config.json
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("allergen", "exposure", "guideline", "symptom", "treatment", "dose", "patient", "reaction",
+         "diagnosis", "management", "risk", "evidence")
+
+
+class MockLLMServer:
+    """
+    Serves /v1/chat/completions with canned, prompt-dependent answers and configurable latency.
+
+    :param latency_ms: Delay before the first token (or before a non-streamed response is sent).
+    :param token_latency_ms: Additional delay per generated token.
+    :param response_tokens: Number of words in every answer.
+    :param fail_every: If > 0, every n-th request gets a 503, to exercise retries.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 token_latency_ms: float = 0.0, response_tokens: int = 64, fail_every: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.token_latency = token_latency_ms / 1000.0
+        self.response_tokens = max(1, int(response_tokens))
+        self.fail_every = max(0, int(fail_every))
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.httpd.serve_forever, name="mock-llm-server", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start_background()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def answer_tokens(self, prompt: str) -> list:
+        """The words of the answer to prompt; the same prompt always gets the same answer."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return [WORDS[digest[i % len(digest)] % len(WORDS)] + " " for i in range(self.response_tokens)]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a real inference server
+            disable_nagle_algorithm = True  # headers and body are separate writes; avoid delayed-ACK stalls
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    pass  # the client dropped a kept-alive connection
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    prompt = payload["messages"][-1]["content"]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    self._send(400, "application/json", json.dumps({"error": "bad request"}).encode("utf-8"))
+                    return
+                with server._lock:
+                    server.requests += 1
+                    request_number = server.requests
+                if server.fail_every and request_number % server.fail_every == 0:
+                    self._send(503, "application/json", json.dumps({"error": "overloaded"}).encode("utf-8"))
+                    return
+
+                tokens = server.answer_tokens(prompt)
+                time.sleep(server.latency)
+                if payload.get("stream"):
+                    self._stream(payload.get("model"), tokens)
+                else:
+                    time.sleep(server.token_latency * len(tokens))
+                    body = {"id": f"mock-{request_number}",
+                            "object": "chat.completion",
+                            "model": payload.get("model"),
+                            "choices": [{"index": 0,
+                                         "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                                         "finish_reason": "stop"}],
+                            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens)}}
+                    self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+
+            def _stream(self, model, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(server.token_latency)
+                    chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": token}}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send(self, status, content_type, data):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep benchmark output clean
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a deterministic mock of the LLM chat completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency_ms", type=float, default=200.0, help="Delay before the first token.")
+    parser.add_argument("--token_latency_ms", type=float, default=5.0, help="Delay per generated token.")
+    parser.add_argument("--response_tokens", type=int, default=64)
+    parser.add_argument("--fail_every", type=int, default=0, help="Answer every n-th request with a 503.")
+    args = parser.parse_args()
+
+    server = MockLLMServer(host=args.host, port=args.port, latency_ms=args.latency_ms,
+                           token_latency_ms=args.token_latency_ms, response_tokens=args.response_tokens,
+                           fail_every=args.fail_every)
+    print(f"Mock LLM server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Retrieval quality vs. latency and index size, over a sweep of configurations.
+
+For every combination of embedding model, chunk size and chunk overlap, the corpus is ingested,
+embedded and stored in a fresh ChromaDB index in a scratch directory. A ChromaDBRetriever is then
+evaluated against the labeled questions for every top_k and score threshold. Each row reports
+recall@k, MRR, nDCG, query latency p50/p95, chunk count and index size on disk.
+
+Index configurations are built and evaluated in parallel worker processes. Latencies are measured
+while other workers run; use --workers 1 for clean latency numbers. The cheapest configuration
+whose nDCG is within --quality_tolerance of the best is printed at the end.
+
+Example:
+    python tests/benchmark/retrieval_eval.py --chunk_sizes 500 1000 1500 --top_k 3 5 10 \\
+        --score_thresholds 0.0 0.3 0.5 --workers 3 --output retrieval_eval.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent
+sys.path.insert(0, str(project_root))
+
+from classes.chromadb_retriever import ChromaDBRetriever
+from classes.document_ingestor import DocumentIngestor
+from classes.embedding_loader import EmbeddingLoader
+from classes.embedding_preparer import EmbeddingPreparer
+from classes.hnsw_index_config import HNSWIndexConfig
+from classes.retrieval_evaluator import RetrievalEvaluator
+from main import config
+
+COLLECTION_NAME = "retrieval_eval"
+DEFAULT_LABELS_FILE = project_root / "data" / "eval" / "retrieval_labels.json"
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def init_worker(num_threads: int):
+    import torch
+    torch.set_num_threads(num_threads)  # share the cores between the parallel workers
+
+
+def build_and_evaluate(index_config: dict, query_configs: list, args) -> list:
+    """Builds one index in a scratch directory and evaluates it for every (top_k, score_threshold)."""
+    with tempfile.TemporaryDirectory(prefix="retrieval_eval_") as workspace:
+        workspace = Path(workspace)
+        files = sorted(name for name in os.listdir(args.corpus_dir) if Path(name).suffix.lower() in (".txt", ".pdf"))
+
+        start = time.perf_counter()
+        DocumentIngestor(file_list=files,
+                         input_dir=args.corpus_dir,
+                         output_dir=workspace / "cleaned_text",
+                         embedding_model_name=index_config["embedding_model_name"],
+                         chunk_size=index_config["chunk_size"],
+                         chunk_overlap=index_config["chunk_overlap"]).process_files()
+        chunk_files = sorted(path.name for path in (workspace / "cleaned_text").glob("*_cleaned_chunks.json"))
+        EmbeddingPreparer(file_list=chunk_files,
+                          input_dir=workspace / "cleaned_text",
+                          output_dir=workspace / "embeddings",
+                          embedding_model_name=index_config["embedding_model_name"]).process_files()
+        hnsw_config = HNSWIndexConfig(space=args.space)
+        loader = EmbeddingLoader(cleaned_text_file_list=chunk_files,
+                                 cleaned_text_dir=workspace / "cleaned_text",
+                                 embeddings_dir=workspace / "embeddings",
+                                 vectordb_dir=workspace / "vectordb",
+                                 collection_name=COLLECTION_NAME,
+                                 index_config=hnsw_config)
+        loader.process_files()
+        build_seconds = time.perf_counter() - start
+        num_chunks = loader.collection.count()
+
+        retriever = ChromaDBRetriever(embedding_model_name=index_config["embedding_model_name"],
+                                      collection_name=COLLECTION_NAME,
+                                      vectordb_dir=str(workspace / "vectordb"),
+                                      index_config=hnsw_config)
+        index_bytes = directory_size(workspace / "vectordb")
+        evaluator = RetrievalEvaluator.load(args.labels, min_match_words=args.min_match_words)
+        retriever.query(evaluator.labels[0]["question"])  # warm up, so the first question's latency is not a cold start
+
+        rows = []
+        for top_k, score_threshold in query_configs:
+            retriever.score_threshold = score_threshold
+            metrics = evaluator.evaluate(retriever, top_k=top_k)
+            rows.append({**index_config, "score_threshold": score_threshold, **metrics,
+                         "chunks": num_chunks, "index_bytes": index_bytes, "build_seconds": round(build_seconds, 3)})
+        return rows
+
+
+def pick_cheapest(rows: list, tolerance: float) -> dict:
+    """Smallest index, then fewest chunks per answer, then lowest latency, among rows whose nDCG is within tolerance of the best."""
+    best_ndcg = max(row["ndcg"] for row in rows)
+    good = [row for row in rows if row["ndcg"] >= best_ndcg - tolerance]
+    return min(good, key=lambda row: (row["index_bytes"], row["top_k"], row["latency_p50_ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep retrieval configurations and report quality, latency and index size.")
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS_FILE), help="JSON file of labeled questions.")
+    parser.add_argument("--corpus_dir", default=config.get("raw_input_directory"))
+    parser.add_argument("--embedding_models", nargs="+", default=[config.get("embedding_model_name")])
+    parser.add_argument("--chunk_sizes", nargs="+", type=int, default=[int(config.get("chunk_size", 1000))])
+    parser.add_argument("--chunk_overlaps", nargs="+", type=int, default=[int(config.get("chunk_overlap", 150))])
+    parser.add_argument("--top_k", nargs="+", type=int, default=[3, 5, 10])
+    parser.add_argument("--score_thresholds", nargs="+", type=float,
+                        default=[float(config.get("retriever_min_score_threshold", 0.5))])
+    parser.add_argument("--space", default=config.get("vector_distance_space", "l2"), choices=HNSWIndexConfig.SPACES)
+    parser.add_argument("--min_match_words", type=int, default=8, help="Words a chunk must share with a labeled passage.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Index configurations built in parallel.")
+    parser.add_argument("--quality_tolerance", type=float, default=0.02, help="nDCG a cheaper configuration may lose.")
+    parser.add_argument("--output", help="Optional JSON file for the results.")
+    args = parser.parse_args()
+
+    index_configs = [{"embedding_model_name": model, "chunk_size": size, "chunk_overlap": overlap}
+                     for model, size, overlap in itertools.product(args.embedding_models, args.chunk_sizes, args.chunk_overlaps)
+                     if overlap < size]
+    query_configs = list(itertools.product(args.top_k, args.score_thresholds))
+    workers = max(1, min(args.workers, len(index_configs)))
+    print(f"{len(index_configs)} index configurations x {len(query_configs)} query configurations, {workers} workers")
+
+    rows = []
+    # spawn: torch and chromadb threads do not survive fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(max(1, (os.cpu_count() or 1) // workers),)) as executor:
+        futures = [executor.submit(build_and_evaluate, index_config, query_configs, args) for index_config in index_configs]
+        for index_config, future in zip(index_configs, futures):
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Configuration {index_config} failed: {e}")
+
+    for row in sorted(rows, key=lambda row: -row["ndcg"]):
+        print(f"model={row['embedding_model_name']} chunk={row['chunk_size']}/{row['chunk_overlap']} "
+              f"top_k={row['top_k']:<3} threshold={row['score_threshold']:<4} recall={row['recall']:.3f} "
+              f"mrr={row['mrr']:.3f} ndcg={row['ndcg']:.3f} p50={row['latency_p50_ms']:.1f}ms p95={row['latency_p95_ms']:.1f}ms "
+              f"chunks={row['chunks']} index={row['index_bytes'] / 1024:.0f}KiB")
+    if rows:
+        cheapest = pick_cheapest(rows, args.quality_tolerance)
+        print(f"Cheapest configuration within {args.quality_tolerance} nDCG of the best: {json.dumps(cheapest)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Cold-start probe for benchmark_suite.py's startup stage.
+
+Runs in a fresh interpreter and imports nothing from the project before the timer starts, so
+import_seconds is what every CLI invocation pays for `import main`, and backend_import_seconds the
+heavy imports (torch, transformers, chromadb) the first retrieval pulls in. Prints one JSON line.
+
+Usage:
+    python tests/benchmark/startup_probe.py <workspace> <retriever_backend> <collection_name> [top_k]
+"""
+import time
+
+start = time.perf_counter()
+
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def run(workspace: Path, backend: str, collection_name: str, top_k: int):
+    import main
+    imported = time.perf_counter()
+    from classes.hnsw_index_config import HNSWIndexConfig
+    retriever_class = main.load_retriever_backend(backend)
+    backend_imported = time.perf_counter()
+    config = main.get_config()
+    retriever = retriever_class(embedding_model_name=config.get("embedding_model_name"),
+                                collection_name=collection_name,
+                                vectordb_dir=str(workspace / "vectordb"),
+                                score_threshold=float(config.get("retriever_min_score_threshold", 0.5)),
+                                index_config=HNSWIndexConfig.from_config(config))
+    loaded = time.perf_counter()
+    retriever.query("What is peanut allergy?", top_k=top_k)
+    done = time.perf_counter()
+    retriever.close()
+    print(json.dumps({"import_seconds": imported - start,
+                      "backend_import_seconds": backend_imported - imported,
+                      "retriever_load_seconds": loaded - backend_imported,
+                      "first_query_seconds": done - loaded,
+                      "total_seconds": done - start}))
+
+
+if __name__ == "__main__":
+    run(Path(sys.argv[1]), sys.argv[2], sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 3)
@@ -0,0 +1,41 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from main import HEAVY_MODULES, summarize_import_profile
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+def test_importing_main_defers_heavy_modules_and_config():
+    """
+    Tests that importing main in a fresh interpreter loads no heavy dependency and does not read config.json yet.
+    """
+    # WHEN main is imported the way every CLI invocation imports it
+    probe = ("import json, sys, main; "
+             "print(json.dumps({'heavy': [m for m in main.HEAVY_MODULES if m in sys.modules], "
+             "'config_loaded': 'config' in vars(main)}))")
+    result = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+
+    # THEN torch, transformers, chromadb and friends are left for the steps that need them
+    assert json.loads(result.stdout) == {"heavy": [], "config_loaded": False}
+
+def test_summarize_import_profile_groups_self_time_by_package():
+    """
+    Tests that `-X importtime` lines are summed per top-level package and heavy modules are reported.
+    """
+    # GIVEN importtime output with nested modules and unrelated log lines
+    lines = ["import time: self [us] | cumulative | imported package",
+             "import time:      1500 |       1500 |     torch._C",
+             "import time:      2500 |       4000 |   torch",
+             "import time:       300 |        300 | classes.tracer",
+             "[2026-01-01 00:00:00] INFO main:1 - not an import line"]
+
+    # WHEN the profile is summarized
+    profile = summarize_import_profile(lines, top_n=1)
+
+    # THEN the slowest package is torch with its submodules included
+    assert profile["total_ms"] == 4.3
+    assert profile["modules"] == 3
+    assert profile["packages"] == [("torch", 4.0)]
+    assert profile["heavy_modules"] == ["torch"]
+    assert set(profile["heavy_modules"]) <= set(HEAVY_MODULES)
@@ -1,5 +1,6 @@
 import pytest
 import json
+import numpy as np
 from pathlib import Path
 from typing import Any
 from main import (
@@ -79,11 +80,10 @@ def test_full_pipeline(pipeline_environment: dict[str, Any], mocker):
 
     # Step 2: Generate embeddings
     step02_generate_embeddings(Args(input_filename=env["input_filename"]))
-    embeddings_file = Path(env["config"]["embeddings_directory"]) / "sample_embeddings.json"
+    embeddings_file = Path(env["config"]["embeddings_directory"]) / "sample_embeddings.npy"
     assert embeddings_file.exists(), "Embeddings file was not created"
-    with open(embeddings_file, "r", encoding="utf-8") as f:
-        embeddings = json.load(f)
-    assert isinstance(embeddings, list) and len(embeddings) == len(chunks), "Embeddings count mismatch."
+    embeddings = np.load(embeddings_file)
+    assert embeddings.ndim == 2 and len(embeddings) == len(chunks), "Embeddings count mismatch."
 
     # Step 3: Store vectors in vector database
     step03_store_vectors(Args(input_filename=env["input_filename"]))
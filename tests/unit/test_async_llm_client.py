@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+import json
+import httpx
+from classes.async_llm_client import AsyncLLMClient
+
+def make_client(handler, **kwargs):
+    """Returns an AsyncLLMClient whose requests are answered by handler instead of the network."""
+    return AsyncLLMClient(llm_api_url="http://fake-url/v1/chat/completions", llm_model_name="test-llm",
+                          transport=httpx.MockTransport(handler), backoff_base=0.0, **kwargs)
+
+def test_async_client_runs_queries_concurrently_within_limit():
+    """
+    Tests that many aquery calls share one client and never exceed max_concurrency requests in flight.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        prompt = json.loads(request.content)["messages"][0]["content"]
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"Answer to {prompt}"}}]})
+
+    async def run():
+        async with make_client(handler, max_concurrency=4) as client:
+            return await asyncio.gather(*(client.aquery(f"question {i}") for i in range(20)))
+
+    # WHEN 20 questions are asked at once
+    responses = asyncio.run(run())
+
+    # THEN all are answered in order, with at most 4 requests in flight
+    assert responses == [f"Answer to question {i}" for i in range(20)]
+    assert 1 < max_in_flight <= 4
+
+def test_async_client_retries_then_reports_error():
+    """
+    Tests that transient 503s are retried and a backend that stays down yields the usual error message.
+    """
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    async def run():
+        async with make_client(handler, max_retries=2) as client:
+            return await client.aquery("This will fail"), client.get_stats()
+
+    response, stats = asyncio.run(run())
+
+    assert response == "Error: Could not connect to the LLM."
+    assert len(calls) == 3
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+
+def test_async_client_pool_fits_concurrency_and_pool_waits_are_not_backend_failures():
+    """
+    Tests that the connection pool is at least max_concurrency and a PoolTimeout does not trip the circuit breaker.
+    """
+    # GIVEN a pool smaller than the concurrency limit and a pool that is exhausted
+    def handler(request):
+        raise httpx.PoolTimeout("no free connection")
+    client = make_client(handler, max_concurrency=32, pool_size=10, circuit_failure_threshold=1)
+
+    # WHEN a question is asked
+    response = asyncio.run(client.aquery("question"))
+
+    # THEN the pool is sized for every admitted request
+    assert client._pool_limits().max_connections == 32
+    # AND the wait is reported to the caller without being counted as a backend failure or retried
+    assert response == "Error: Could not connect to the LLM."
+    assert client.get_stats()["failures"] == 0 and client.get_stats()["retries"] == 0
+    assert client.circuit_breaker.allow_request()
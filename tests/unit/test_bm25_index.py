@@ -0,0 +1,47 @@
+from classes.bm25_index import BM25Index
+
+CHUNKS = [
+    "Omalizumab is an anti-IgE antibody for severe allergic asthma.",
+    "Inhaled corticosteroids are the preferred controller therapy for persistent asthma.",
+    "Peanut allergy can cause anaphylaxis; epinephrine is the first-line treatment.",
+]
+
+def test_bm25_index_ranks_exact_terms_and_survives_reload(tmp_path):
+    """
+    Tests that exact drug names are found and the saved index returns the same results after loading.
+    """
+    # GIVEN an index built from one source's chunks
+    index = BM25Index(tmp_path)
+    index.add_source("guideline", CHUNKS)
+    index.save()
+
+    # WHEN searching for a drug name and a broader term
+    results = index.search("What is omalizumab?", top_k=3)
+    asthma_results = index.search("asthma therapy", top_k=3)
+
+    # THEN the chunk naming the drug comes back with the loader's chunk ID and metadata
+    assert [r["id"] for r in results] == ["guideline::chunk_0"]
+    assert results[0]["context"] == CHUNKS[0]
+    assert results[0]["source"] == "guideline" and results[0]["chunk_index"] == 0
+    assert asthma_results[0]["id"] == "guideline::chunk_1"
+
+    # AND a freshly loaded index gives identical results
+    reloaded = BM25Index(tmp_path)
+    assert reloaded.revision == index.revision
+    assert reloaded.search("asthma therapy", top_k=3) == asthma_results
+
+def test_bm25_index_replaces_and_removes_sources(tmp_path):
+    """
+    Tests that re-ingesting a source replaces its chunks and missing sources are dropped.
+    """
+    index = BM25Index(tmp_path)
+    index.add_source("old", ["Epinephrine auto-injector instructions."])
+    index.add_source("guideline", CHUNKS)
+    index.add_source("guideline", ["Updated text about montelukast."])
+    index.retain_sources(["guideline"])
+    index.save()
+
+    reloaded = BM25Index(tmp_path)
+    assert len(reloaded) == 1
+    assert reloaded.search("epinephrine") == []
+    assert reloaded.search("montelukast")[0]["id"] == "guideline::chunk_0"
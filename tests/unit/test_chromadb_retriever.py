@@ -1,5 +1,8 @@
 import pytest
+import numpy as np
 from classes.chromadb_retriever import ChromaDBRetriever
+from classes.embedding_cache import EmbeddingCache
+from classes.hnsw_index_config import HNSWIndexConfig
 
 @pytest.fixture
 def mocked_retriever(mocker):
@@ -9,6 +12,7 @@ def mocked_retriever(mocker):
     # Mock the ChromaDB client and collection
     mock_collection = mocker.Mock()
     mocker.patch("chromadb.PersistentClient").return_value.get_or_create_collection.return_value = mock_collection
+    mocker.patch("classes.base_retriever.TextEncoder.get")
     
     # Instantiate the retriever (it will now use the mocks)
     retriever = ChromaDBRetriever(
@@ -31,16 +35,97 @@ def test_retriever_query(mocked_retriever):
             {"text": "This is context one.", "source": "source1"},
             {"text": "This is context two.", "source": "source2"}
         ]],
-        "distances": [[0.25, 0.8]] # one above, one below threshold
+        "distances": [[0.25, 0.8]] # cosine similarity 0.75 (above threshold) and 0.2 (below)
     }
     mocked_retriever.collection.query.return_value = mock_db_results
-    mocked_retriever.score_threshold = 0.5 # Set threshold for the test
+    mocked_retriever.index_config = HNSWIndexConfig(space="cosine")
+    mocked_retriever.score_threshold = 0.5 # Minimum similarity for the test
     
     # WHEN a query is performed
     results = mocked_retriever.query("some search phrase", top_k=2)
     
-    # THEN only the result passing the threshold should be returned
+    # THEN only the closer result, which passes the similarity threshold, should be returned
     assert len(results) == 1
-    assert results[0]["id"] == "doc2"
-    assert results[0]["score"] == 0.8
-    assert results[0]["context"] == "This is context two."
\ No newline at end of file
+    assert results[0]["id"] == "doc1"
+    assert results[0]["score"] == 0.75
+    assert results[0]["context"] == "This is context one."
+
+def test_retriever_scores_follow_metric_and_relative_cutoff(mocked_retriever):
+    """
+    Tests that squared-L2 distances become similarities and the relative cutoff drops results far below the best one.
+    """
+    # GIVEN squared L2 distances between unit vectors, ranked best first by the database
+    mocked_retriever.collection.query.return_value = {
+        "ids": [["a", "b", "c"]],
+        "metadatas": [[{"text": "A"}, {"text": "B"}, {"text": "C"}]],
+        "distances": [[0.4, 0.6, 1.0]]  # similarities 0.8, 0.7 and 0.5
+    }
+    mocked_retriever.score_threshold = 0.3
+
+    # WHEN only the absolute threshold applies, every result is kept in database order
+    assert [r["score"] for r in mocked_retriever.query("question", top_k=3)] == [0.8, 0.7, 0.5]
+
+    # WHEN results must reach 80% of the best similarity
+    mocked_retriever.relative_cutoff = 0.8
+    results = mocked_retriever.query("question", top_k=3)
+
+    # THEN the weak third match is dropped
+    assert [r["id"] for r in results] == ["a", "b"]
+
+def test_embed_text_uses_query_cache(mocker):
+    """
+    Tests that repeated queries are served from the embedding cache instead of the model.
+    """
+    # GIVEN a retriever with mocked ChromaDB, a mocked model and an embedding cache
+    mocker.patch("chromadb.PersistentClient")
+    mock_model = mocker.patch("classes.base_retriever.TextEncoder.get").return_value
+    mock_model.encode.return_value = np.array([[0.6, 0.8]], dtype=np.float32)
+    cache = EmbeddingCache(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    retriever = ChromaDBRetriever(
+        embedding_model_name="sentence-transformers/all-MiniLM-L6-v2",
+        collection_name="fake-collection",
+        vectordb_dir="/fake/dir",
+        embedding_cache=cache
+    )
+
+    # WHEN the same question is embedded twice with different spacing
+    first = retriever.embed_text("What is asthma?")
+    second = retriever.embed_text("what is  asthma?")
+
+    # THEN the model runs once and both calls return the same vector
+    mock_model.encode.assert_called_once()
+    assert first == second == pytest.approx([0.6, 0.8])
+    assert cache.stats()["hits"] == 1
+
+def test_query_batch_issues_single_model_and_collection_call(mocker):
+    """
+    Tests that query_batch embeds all phrases at once and sends one vectorized collection query.
+    """
+    # GIVEN a retriever with mocked ChromaDB and a mocked model
+    mock_collection = mocker.patch("chromadb.PersistentClient").return_value.get_or_create_collection.return_value
+    mock_model = mocker.patch("classes.base_retriever.TextEncoder.get").return_value
+    mock_model.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    mock_collection.query.return_value = {
+        "ids": [["doc1"], ["doc2"]],
+        "metadatas": [[{"text": "Context one.", "source": "source1", "chunk_index": 0}],
+                      [{"text": "Context two.", "source": "source2", "chunk_index": 3}]],
+        "distances": [[0.7], [0.9]]  # squared L2, i.e. similarities 0.65 and 0.55
+    }
+    retriever = ChromaDBRetriever(
+        embedding_model_name="sentence-transformers/all-MiniLM-L6-v2",
+        collection_name="fake-collection",
+        vectordb_dir="/fake/dir"
+    )
+
+    # WHEN two phrases are queried as a batch
+    results = retriever.query_batch(["first question", "second question"], top_k=1)
+
+    # THEN the model and the collection are each called once with both queries
+    mock_model.encode.assert_called_once()
+    assert mock_model.encode.call_args[0][0] == ["first question", "second question"]
+    mock_collection.query.assert_called_once()
+    assert mock_collection.query.call_args.kwargs["query_embeddings"] == [[1.0, 0.0], [0.0, 1.0]]
+
+    # AND each query gets its own result list with the usual dict shape
+    assert [r[0]["id"] for r in results] == ["doc1", "doc2"]
+    assert results[1][0] == {"id": "doc2", "score": 0.55, "context": "Context two.", "source": "source2", "chunk_index": 3}
@@ -0,0 +1,44 @@
+from classes.context_builder import ContextBuilder
+
+def test_builder_packs_ranked_chunks_within_token_budget():
+    """
+    Tests that chunks are packed in ranked order and chunks that do not fit the budget are skipped.
+    """
+    # GIVEN a builder estimating 4 characters per token with a 30-token budget
+    builder = ContextBuilder(max_context_tokens=30)
+    docs = [
+        {"id": "a", "source": "x", "context": "A" * 40},   # 10 tokens
+        {"id": "b", "source": "y", "context": "B" * 80},   # 20 tokens, does not fit after a
+        {"id": "c", "source": "z", "context": "C" * 40},   # 10 tokens + separator
+    ]
+
+    # WHEN the context is built
+    context, packed, tokens = builder.build(docs)
+
+    # THEN the chunks that fit are packed in order and the budget is respected
+    assert [doc["id"] for doc in packed] == ["a", "c"]
+    assert context == "A" * 40 + ContextBuilder.SEPARATOR + "C" * 40
+    assert tokens <= 30
+
+def test_builder_drops_duplicates_and_trims_overlap():
+    """
+    Tests that near-duplicate chunks are dropped and splitter overlap between neighbours is removed.
+    """
+    # GIVEN two neighbouring chunks sharing 40 characters of overlap, and a duplicate of the first
+    overlap = "shared sentence that the splitter repeats"
+    first = "Asthma is a chronic disease of the airways. " + overlap
+    second = overlap + " Inhaled corticosteroids are the first-line controller."
+    docs = [
+        {"id": "1", "source": "guide", "context": first},
+        {"id": "1-copy", "source": "other", "context": first + " "},
+        {"id": "2", "source": "guide", "context": second},
+    ]
+    builder = ContextBuilder(max_context_tokens=1000)
+
+    # WHEN the context is built
+    context, packed, _ = builder.build(docs)
+
+    # THEN the duplicate is dropped and the overlap appears only once
+    assert [doc["id"] for doc in packed] == ["1", "2"]
+    assert context.count(overlap) == 1
+    assert context.endswith("Inhaled corticosteroids are the first-line controller.")
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from classes.cross_encoder_reranker import CrossEncoderReranker
+from classes.model_registry import ModelRegistry
+
+@pytest.fixture
+def mock_cross_encoder(mocker):
+    """Provides a mocked CrossEncoder that scores a pair by the number in its chunk text."""
+    model = mocker.patch("classes.cross_encoder_reranker.CrossEncoder").return_value
+    model.predict.side_effect = lambda pairs, **kwargs: np.array([float(text.split()[-1]) for _, text in pairs])
+    ModelRegistry.get().clear("cross_encoder")  # the registry would hand out another test's mock
+    yield model
+    ModelRegistry.get().clear("cross_encoder")
+
+def make_docs(scores):
+    return [{"id": f"doc{i}", "score": 0.5, "context": f"Chunk with relevance {score}", "source": "guideline", "chunk_index": i}
+            for i, score in enumerate(scores)]
+
+def test_reranker_keeps_best_chunks_and_caches_scores(mock_cross_encoder):
+    """
+    Tests that candidates are capped, scored in batches, re-ordered by score and cached per (query, chunk).
+    """
+    # GIVEN a reranker keeping 2 of at most 4 candidates, scoring 2 pairs per batch
+    reranker = CrossEncoderReranker(top_n=2, max_candidates=4, batch_size=2)
+    docs = make_docs([0.1, 0.9, 0.3, 0.7, 5.0])  # the last one is beyond the candidate cap
+
+    # WHEN re-ranking
+    results = reranker.rerank("What treats asthma?", docs)
+
+    # THEN only the capped candidates were scored, in two batches, and the best two are returned
+    assert mock_cross_encoder.predict.call_count == 2
+    assert [r["id"] for r in results] == ["doc1", "doc3"]
+    assert results[0]["rerank_score"] == 0.9
+
+    # WHEN the same question is asked again with different spacing
+    reranker.rerank("what treats  asthma?", docs)
+
+    # THEN every score comes from the cache
+    assert mock_cross_encoder.predict.call_count == 2
+    assert reranker.stats()["hits"] == 4
+
+def test_reranker_latency_cap_keeps_unscored_candidates_in_retrieval_order(mock_cross_encoder):
+    """
+    Tests that when the latency budget is spent, remaining candidates follow the scored ones unscored.
+    """
+    reranker = CrossEncoderReranker(top_n=3, max_candidates=4, batch_size=2, max_latency_ms=0)
+    results = reranker.rerank("What treats asthma?", make_docs([0.1, 0.9, 0.3, 0.7]))
+
+    # The first batch is always scored; the cap stops the second
+    assert mock_cross_encoder.predict.call_count == 1
+    assert [r["id"] for r in results] == ["doc1", "doc0", "doc2"]
+    assert results[2]["rerank_score"] is None
+    assert reranker.stats()["timeouts"] == 1
+
+def test_reranker_close_releases_shared_model(mock_cross_encoder):
+    """
+    Tests that close() drops the reranker's registry reference once, so the model can be evicted.
+    """
+    # GIVEN two rerankers sharing one cross-encoder
+    first = CrossEncoderReranker()
+    second = CrossEncoderReranker()
+    assert ModelRegistry.get().stats()["models"][-1]["refs"] == 2
+
+    # WHEN one of them is closed twice
+    first.close()
+    first.close()
+
+    # THEN only its reference is released
+    assert ModelRegistry.get().stats()["models"][-1]["refs"] == 1
+    second.close()
+    assert ModelRegistry.get().evict("cross_encoder", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
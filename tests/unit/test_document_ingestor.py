@@ -69,4 +69,48 @@ def test_process_files_chunks_and_saves_correctly(ingestor_environment):
     
     assert isinstance(data, list), "Output should be a list of chunks"
     assert len(data) > 1, "Expected the text to be split into multiple chunks"
-    assert data[0].startswith("this is a sentence."), "Chunk content is incorrect"
\ No newline at end of file
+    assert data[0].startswith("this is a sentence."), "Chunk content is incorrect"
+
+class FakeTokenizer:
+    """Whitespace tokenizer that lowercases text, standing in for the Hugging Face tokenizer."""
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def tokenize(self, text):
+        return text.lower().split()
+
+    def convert_tokens_to_string(self, tokens):
+        return " ".join(tokens)
+
+def test_parallel_process_files_isolates_failures(tmp_path):
+    """
+    Tests that the worker pool writes the same chunk files and a bad file does not stop the others.
+    """
+    # GIVEN a tokenizer that does not need to be downloaded, passed to the workers whatever their start method
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    input_dir.mkdir()
+
+    # AND two good files, a corrupt PDF and a missing file
+    (input_dir / "first.txt").write_text("This is a sentence. " * 100)
+    (input_dir / "second.txt").write_text("Another sentence here. " * 100)
+    (input_dir / "broken.pdf").write_text("not really a pdf")
+
+    ingestor = DocumentIngestor(
+        file_list=["first.txt", "broken.pdf", "missing.txt", "second.txt"],
+        input_dir=str(input_dir),
+        output_dir=str(output_dir),
+        embedding_model_name="sentence-transformers/all-MiniLM-L6-v2",
+        num_workers=2,
+        tokenizer_factory=FakeTokenizer
+    )
+
+    # WHEN the files are processed in parallel
+    ingestor.process_files()
+
+    # THEN the good files are chunked and saved, and nothing is written for the bad ones
+    assert sorted(p.name for p in output_dir.iterdir()) == ["first_cleaned_chunks.json", "second_cleaned_chunks.json"]
+    with open(output_dir / "first_cleaned_chunks.json", 'r') as f:
+        data = json.load(f)
+    assert len(data) > 1
+    assert data[0].startswith("this is a sentence.")
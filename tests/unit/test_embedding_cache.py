@@ -0,0 +1,77 @@
+import os
+import pytest
+from classes.embedding_cache import EmbeddingCache
+
+def test_cache_normalizes_queries_and_evicts_least_recently_used():
+    """
+    Tests hit/miss counting, query normalization and LRU eviction.
+    """
+    cache = EmbeddingCache(model_name="model-a", max_size=2)
+
+    # GIVEN two cached queries
+    cache.put("What is peanut allergy?", [0.1, 0.2])
+    cache.put("asthma triggers", [0.3, 0.4])
+
+    # WHEN the first is looked up with different case and spacing, then a third query is added
+    assert cache.get("  what IS peanut   allergy? ") == [0.1, 0.2]
+    cache.put("drug allergy", [0.5, 0.6])
+
+    # THEN the least recently used entry is evicted
+    assert cache.get("asthma triggers") is None
+    assert cache.get("drug allergy") == [0.5, 0.6]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_cache_expires_entries_after_ttl(mocker):
+    """
+    Tests that entries older than the TTL are treated as misses.
+    """
+    clock = mocker.patch("classes.embedding_cache.time.time", return_value=1000.0)
+    cache = EmbeddingCache(model_name="model-a", ttl_seconds=60)
+    cache.put("peanut allergy", [0.25, 0.5])
+
+    # WHEN the TTL has not elapsed yet, the entry is served
+    clock.return_value = 1059.0
+    assert cache.get("peanut allergy") == [0.25, 0.5]
+
+    # WHEN the TTL elapses, the entry expires
+    clock.return_value = 1061.0
+    assert cache.get("peanut allergy") is None
+
+def test_disk_cache_survives_restart_and_is_invalidated_on_model_change(tmp_path):
+    """
+    Tests the on-disk layer and invalidation when the embedding model changes.
+    """
+    # GIVEN an entry cached on disk by an earlier process
+    EmbeddingCache(model_name="model-a", cache_dir=tmp_path).put("peanut allergy", [0.25, 0.5])
+
+    # WHEN a new cache instance is created over the same directory
+    restarted = EmbeddingCache(model_name="model-a", cache_dir=tmp_path)
+
+    # THEN the entry is served from disk
+    assert restarted.get("peanut allergy") == [0.25, 0.5]
+    assert restarted.stats()["disk_hits"] == 1
+
+    # WHEN the embedding model changes, vectors from the old model are dropped from memory and disk
+    restarted.set_model("model-b")
+    assert restarted.get("peanut allergy") is None
+    assert list(tmp_path.glob("*.npy")) == []
+
+def test_disk_cache_is_pruned_to_max_disk_entries(tmp_path):
+    """
+    Tests that the on-disk layer deletes its oldest files once it holds more than max_disk_entries.
+    """
+    # GIVEN a disk layer at its limit of 10 files, written one second apart
+    cache = EmbeddingCache(model_name="model-a", cache_dir=tmp_path, max_disk_entries=10)
+    for i in range(10):
+        cache.put(f"question {i}", [float(i)])
+        os.utime(cache._disk_file(f"question {i}"), (1000 + i, 1000 + i))
+
+    # WHEN one more entry is written
+    cache.put("question 10", [10.0])
+
+    # THEN the oldest files are deleted down to 90% of the limit
+    assert len(list(tmp_path.glob("*.npy"))) == 9
+    restarted = EmbeddingCache(model_name="model-a", cache_dir=tmp_path, max_disk_entries=10)
+    assert restarted.get("question 0") is None and restarted.get("question 1") is None
+    assert restarted.get("question 2") == [2.0] and restarted.get("question 10") == [10.0]
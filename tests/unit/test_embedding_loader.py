@@ -1,6 +1,8 @@
 import pytest
 import json
+import numpy as np
 from classes.embedding_loader import EmbeddingLoader
+from classes.embedding_store import EmbeddingStore
 
 @pytest.fixture
 def loader_environment(tmp_path):
@@ -63,4 +65,113 @@ def test_loader_processes_files_and_adds_to_db(mocker, loader_environment):
     
     assert call_args['ids'] == expected_ids
     assert call_args['embeddings'] == expected_embeddings
-    assert call_args['metadatas'] == expected_metadatas
\ No newline at end of file
+    assert call_args['metadatas'] == expected_metadatas
+
+def test_loader_streams_binary_embeddings_in_batches(mocker, loader_environment):
+    """
+    Tests that binary embeddings are read from the .npy store and added to the DB in batch slices.
+    """
+    env = loader_environment
+
+    # GIVEN binary embeddings for the same chunks (taking precedence over the legacy JSON file)
+    EmbeddingStore(env["embeddings_dir"]).save("stem", np.array([[0.5, 0.6], [0.7, 0.8]]))
+
+    mock_collection = mocker.Mock()
+    mocker.patch('chromadb.PersistentClient').return_value.get_or_create_collection.return_value = mock_collection
+
+    loader = EmbeddingLoader(
+        cleaned_text_file_list=env["file_list"],
+        cleaned_text_dir=env["cleaned_dir"],
+        embeddings_dir=env["embeddings_dir"],
+        vectordb_dir=env["vectordb_dir"],
+        collection_name="test_collection",
+        batch_size=1
+    )
+
+    # WHEN process_files is called
+    loader.process_files()
+
+    # THEN each batch should be a float32 slice of the stored matrix
+    assert mock_collection.add.call_count == 2
+    first_batch = mock_collection.add.call_args_list[0].kwargs['embeddings']
+    assert isinstance(first_batch, np.ndarray) and first_batch.dtype == np.float32
+    assert np.allclose(first_batch, [[0.5, 0.6]])
+    assert mock_collection.add.call_args_list[1].kwargs['ids'] == ["stem::chunk_1"]
+
+def test_incremental_loader_upserts_only_changed_chunks(mocker, loader_environment):
+    """
+    Tests that an incremental re-index upserts changed chunks, deletes dropped ones and skips unchanged sources.
+    """
+    env = loader_environment
+    mock_collection = mocker.Mock()
+    mocker.patch('chromadb.PersistentClient').return_value.get_or_create_collection.return_value = mock_collection
+
+    def run_loader():
+        loader = EmbeddingLoader(
+            cleaned_text_file_list=env["file_list"],
+            cleaned_text_dir=env["cleaned_dir"],
+            embeddings_dir=env["embeddings_dir"],
+            vectordb_dir=env["vectordb_dir"],
+            collection_name="test_collection",
+            incremental=True
+        )
+        loader.process_files()
+        return loader
+
+    # GIVEN a source that has already been indexed, with upsert even though the manifest was empty
+    first_version = run_loader().manifest.version
+    mock_collection.add.assert_not_called()
+    assert mock_collection.upsert.call_args.kwargs['ids'] == ["stem::chunk_0", "stem::chunk_1"]
+    mock_collection.reset_mock()
+
+    # WHEN the loader runs again without changes
+    loader = run_loader()
+
+    # THEN nothing should be written and the manifest version should stay the same
+    mock_collection.add.assert_not_called()
+    mock_collection.upsert.assert_not_called()
+    assert loader.manifest.version == first_version
+
+    # GIVEN the second chunk changes and a third chunk disappears from a longer previous version
+    (env["cleaned_dir"] / "stem_cleaned_chunks.json").write_text(json.dumps(["This is chunk one.", "Chunk two changed."]))
+    loader.manifest.data["sources"]["stem"]["chunks"]["stem::chunk_2"] = "old-hash"
+    loader.manifest.save()
+
+    # WHEN the loader runs again
+    loader = run_loader()
+
+    # THEN only the changed chunk is upserted and the dropped chunk is deleted
+    mock_collection.upsert.assert_called_once()
+    assert mock_collection.upsert.call_args.kwargs['ids'] == ["stem::chunk_1"]
+    assert mock_collection.upsert.call_args.kwargs['metadatas'][0]['text'] == "Chunk two changed."
+    mock_collection.delete.assert_called_once_with(ids=["stem::chunk_2"])
+    assert loader.manifest.version == first_version + 1
+
+def test_loader_prunes_against_source_list_not_chunk_files(mocker, loader_environment):
+    """
+    Tests that pruning keeps sources that still exist even when they have no cleaned chunk file.
+    """
+    env = loader_environment
+    mocker.patch('chromadb.PersistentClient').return_value.get_or_create_collection.return_value = mocker.Mock()
+
+    def run_loader(**kwargs):
+        loader = EmbeddingLoader(cleaned_text_file_list=env["file_list"], cleaned_text_dir=env["cleaned_dir"],
+                                 embeddings_dir=env["embeddings_dir"], vectordb_dir=env["vectordb_dir"],
+                                 collection_name="test_collection", incremental=True, **kwargs)
+        loader.process_files()
+        return loader
+
+    # GIVEN a source indexed by the streaming pipeline, which wrote no chunk file for it
+    loader = run_loader()
+    loader.manifest.set_source("streamed", {"streamed::chunk_0": "hash"})
+    loader.manifest.save()
+
+    # WHEN an incremental full run prunes with the list of source documents
+    loader = run_loader(prune_missing_sources=True, source_stems=["stem", "streamed"])
+
+    # THEN the streamed source is kept
+    assert sorted(loader.manifest.sources()) == ["stem", "streamed"]
+
+    # AND it is pruned once its document is gone
+    loader = run_loader(prune_missing_sources=True, source_stems=["stem"])
+    assert loader.manifest.sources() == ["stem"]
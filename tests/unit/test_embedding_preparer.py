@@ -1,6 +1,11 @@
 import pytest
 import json
+import numpy as np
+import torch
+from types import SimpleNamespace
+from transformers import BatchEncoding
 from classes.embedding_preparer import EmbeddingPreparer
+from classes.text_encoder import TextEncoder
 
 @pytest.fixture
 def preparer_environment(tmp_path):
@@ -39,12 +44,110 @@ def test_preparer_generates_and_saves_embeddings(preparer_environment):
     # WHEN process_files is called
     preparer.process_files()
     
-    # THEN an embeddings file should be created
-    expected_output = preparer_environment["output_dir"] / "doc1_embeddings.json"
+    # THEN a binary embeddings file and its manifest should be created
+    expected_output = preparer_environment["output_dir"] / "doc1_embeddings.npy"
     assert expected_output.exists(), "Embeddings file was not created"
+    assert (preparer_environment["output_dir"] / "doc1_embeddings.manifest.json").exists(), "Manifest was not created"
     
-    with open(expected_output, 'r') as f:
-        saved_embeddings = json.load(f)
+    saved_embeddings = np.load(expected_output)
+    assert saved_embeddings.dtype == np.float32
         
     assert len(saved_embeddings) == len(preparer_environment["sample_chunks"]), "Incorrect number of embeddings saved"
-    assert len(saved_embeddings[0]) == 384, "Embedding dimension is incorrect"
\ No newline at end of file
+    assert len(saved_embeddings[0]) == 384, "Embedding dimension is incorrect"
+
+class FakeTokenizer:
+    """Whitespace tokenizer returning one token id per word."""
+    def __call__(self, texts, return_tensors=None, padding=False, **kwargs):
+        input_ids = [[len(text.split())] * len(text.split()) for text in texts]
+        if return_tensors != "pt":
+            return {"input_ids": input_ids}
+        max_len = max(len(ids) for ids in input_ids)
+        attention_mask = [[1] * len(ids) + [0] * (max_len - len(ids)) for ids in input_ids]
+        # Pad with id 0, so an unmasked mean would pull short chunks towards [0, 1]
+        input_ids = [ids + [0] * (max_len - len(ids)) for ids in input_ids]
+        return BatchEncoding({"input_ids": torch.tensor(input_ids), "attention_mask": torch.tensor(attention_mask)})
+
+def fake_model(input_ids, attention_mask):
+    """Hidden state of every token is [word_count, 1], so each chunk gets a distinct embedding."""
+    hidden = torch.stack([input_ids.float(), torch.ones_like(input_ids, dtype=torch.float)], dim=-1)
+    return SimpleNamespace(last_hidden_state=hidden)
+
+@pytest.fixture
+def mocked_preparer(mocker, tmp_path):
+    """Provides an EmbeddingPreparer whose shared TextEncoder has the tokenizer and model mocked."""
+    mocker.patch("classes.text_encoder.AutoTokenizer.from_pretrained", return_value=FakeTokenizer())
+    mocker.patch("classes.text_encoder.AutoModel.from_pretrained").return_value.to.return_value = fake_model
+    mocker.patch("classes.text_encoder.cached_file", return_value=None)
+    TextEncoder.clear_shared()
+    yield EmbeddingPreparer(
+        file_list=[],
+        input_dir=tmp_path,
+        output_dir=tmp_path,
+        embedding_model_name="fake-model",
+        batch_size=2,
+        max_tokens_per_batch=6
+    )
+    TextEncoder.clear_shared()
+
+def test_make_batches_respects_batch_size_and_token_budget(mocked_preparer):
+    """
+    Tests that batches are sorted by length and bounded by both batch size and padded token count.
+    """
+    # GIVEN chunk token lengths in arbitrary order
+    lengths = [5, 1, 3, 1, 2]
+
+    # WHEN the chunks are grouped into batches
+    batches = mocked_preparer.encoder.make_batches(lengths, batch_size=2, max_tokens_per_batch=6)
+
+    # THEN every chunk appears exactly once, in ascending length order
+    assert [idx for batch in batches for idx in batch] == [1, 3, 4, 2, 0]
+    # AND no batch exceeds the batch size or the padded token budget (unless it holds a single chunk)
+    for batch in batches:
+        assert len(batch) <= 2
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 6
+
+def test_batched_embeddings_keep_original_order(mocked_preparer):
+    """
+    Tests that embeddings produced from length-sorted batches are returned in the original chunk order.
+    """
+    # GIVEN chunks of different lengths
+    chunks = ["one two three four five", "one", "one two three", "one two"]
+
+    # WHEN embeddings are generated in batches
+    embeddings = mocked_preparer.generate_embeddings(chunks)
+
+    # THEN each embedding matches the one produced for that chunk on its own
+    assert len(embeddings) == len(chunks)
+    for chunk, embedding in zip(chunks, embeddings):
+        assert embedding == pytest.approx(mocked_preparer.generate_embeddings([chunk])[0])
+
+def test_embeddings_use_masked_pooling_and_are_normalized(mocked_preparer):
+    """
+    Tests that padded positions do not change a chunk's embedding and every embedding has unit length.
+    """
+    # GIVEN a short chunk batched with a long one, so the short chunk is padded
+    embeddings = mocked_preparer.generate_embeddings(["one", "one two three four"])
+
+    # THEN each embedding is the normalized [word_count, 1] vector of its own tokens only
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0)
+    assert np.allclose(embeddings[0], np.array([1.0, 1.0]) / np.sqrt(2))
+    assert np.allclose(embeddings[1], np.array([4.0, 1.0]) / np.sqrt(17))
+
+def test_verify_embeddings_detects_stale_vectors(mocked_preparer, tmp_path):
+    """
+    Tests that verification passes for freshly generated embeddings and fails for unnormalized legacy ones.
+    """
+    # GIVEN a chunk file with embeddings generated by the shared encoder
+    chunks = ["one two", "one two three"]
+    (tmp_path / "doc1_cleaned_chunks.json").write_text(json.dumps(chunks))
+    mocked_preparer.file_list = ["doc1_cleaned_chunks.json"]
+    mocked_preparer.process_files()
+
+    # THEN verification passes
+    assert mocked_preparer.verify_embeddings() is True
+
+    # WHEN the stored vectors are replaced by unnormalized means
+    mocked_preparer.save_embeddings("doc1", np.array([[2.0, 1.0], [3.0, 1.0]], dtype=np.float32))
+
+    # THEN verification fails
+    assert mocked_preparer.verify_embeddings() is False
@@ -0,0 +1,64 @@
+import pytest
+import json
+import numpy as np
+from classes.embedding_store import EmbeddingStore
+
+def test_store_round_trips_float32_matrix(tmp_path):
+    """
+    Tests that saved embeddings are written as float32 .npy with a manifest and read back memory-mapped.
+    """
+    store = EmbeddingStore(tmp_path)
+
+    # GIVEN embeddings as lists of Python floats
+    embeddings = [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
+
+    # WHEN they are saved and loaded back
+    store.save("doc", embeddings, model_name="test-model")
+    loaded = store.load("doc")
+
+    # THEN the matrix should be memory-mapped float32 with the same values
+    assert isinstance(loaded, np.memmap)
+    assert loaded.dtype == np.float32
+    assert loaded.shape == (2, 3)
+    assert np.allclose(loaded, embeddings)
+
+    # AND the manifest should describe the matrix
+    manifest = store.load_manifest("doc")
+    assert manifest["count"] == 2
+    assert manifest["dim"] == 3
+    assert manifest["model_name"] == "test-model"
+
+def test_store_reads_legacy_json(tmp_path):
+    """
+    Tests that embeddings written in the old JSON format are still readable.
+    """
+    # GIVEN a legacy JSON embeddings file
+    (tmp_path / "old_embeddings.json").write_text(json.dumps([[0.1, 0.2]]))
+    store = EmbeddingStore(tmp_path)
+
+    # WHEN it is loaded
+    loaded = store.load("old")
+
+    # THEN the lists of floats should be returned unchanged
+    assert store.exists("old")
+    assert loaded == [[0.1, 0.2]]
+    assert store.load("missing") is None
+
+def test_store_switching_format_replaces_earlier_embeddings(tmp_path):
+    """
+    Tests that embeddings saved in one format are not hidden by a file left over in the other format.
+    """
+    # GIVEN embeddings saved as .npy by an earlier run
+    EmbeddingStore(tmp_path, storage_format="npy").save("doc", np.ones((2, 3)))
+
+    # WHEN new embeddings are saved as JSON
+    json_store = EmbeddingStore(tmp_path, storage_format="json")
+    json_store.save("doc", np.zeros((2, 3)))
+
+    # THEN the new embeddings are loaded and the old binary file and manifest are gone
+    assert json_store.load("doc") == [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["doc_embeddings.json"]
+
+    # AND switching back to .npy removes the JSON file
+    EmbeddingStore(tmp_path).save("doc", np.ones((1, 3)))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["doc_embeddings.manifest.json", "doc_embeddings.npy"]
@@ -0,0 +1,36 @@
+import pytest
+import chromadb
+from classes.hnsw_index_config import HNSWIndexConfig
+
+def test_index_config_creates_collection_with_hnsw_metadata():
+    """
+    Tests that a new collection is created with the configured metric and HNSW parameters.
+    """
+    # GIVEN an index config from config.json-style settings
+    config = {"vector_distance_space": "cosine", "hnsw_m": 32, "hnsw_construction_ef": 200, "hnsw_search_ef": 64}
+    index_config = HNSWIndexConfig.from_config(config)
+
+    # WHEN the collection is opened
+    collection = index_config.get_or_create_collection(chromadb.EphemeralClient(), "hnsw-config-test")
+
+    # THEN Chroma records the settings
+    assert collection.metadata == {"hnsw:space": "cosine", "hnsw:M": 32, "hnsw:construction_ef": 200, "hnsw:search_ef": 64}
+
+def test_index_config_warns_when_existing_collection_differs(caplog):
+    """
+    Tests that opening a collection created with other settings keeps it and logs a warning.
+    """
+    # GIVEN a collection created with the default l2 metric
+    client = chromadb.EphemeralClient()
+    HNSWIndexConfig().get_or_create_collection(client, "hnsw-mismatch-test")
+
+    # WHEN it is opened with a cosine config
+    collection = HNSWIndexConfig(space="cosine").get_or_create_collection(client, "hnsw-mismatch-test")
+
+    # THEN the existing settings are kept and a rebuild is suggested
+    assert collection.metadata["hnsw:space"] == "l2"
+    assert "rebuild the index" in caplog.text
+
+def test_index_config_rejects_unknown_space():
+    with pytest.raises(ValueError):
+        HNSWIndexConfig(space="manhattan")
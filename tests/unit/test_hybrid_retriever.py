@@ -0,0 +1,74 @@
+from classes.bm25_index import BM25Index
+from classes.hybrid_retriever import HybridRetriever
+
+def make_doc(doc_id, score):
+    return {"id": doc_id, "score": score, "context": f"Context {doc_id}", "source": "guideline", "chunk_index": 0}
+
+def test_hybrid_retriever_fuses_dense_and_bm25_ranks(mocker, tmp_path):
+    """
+    Tests that a chunk ranked by both backends beats chunks found by only one, using reciprocal rank fusion.
+    """
+    # GIVEN a dense retriever and a lexical index that disagree on the best chunk
+    dense = mocker.Mock(collection_name="collections", score_threshold=0.5)
+    dense.query.return_value = [make_doc("guideline::chunk_2", 0.9), make_doc("guideline::chunk_1", 0.8)]
+    lexical_index = BM25Index(tmp_path)
+    lexical_index.add_source("guideline", ["Omalizumab dosing.", "Omalizumab for asthma.", "Asthma overview."])
+    retriever = HybridRetriever(dense_retriever=dense, lexical_index=lexical_index, candidate_k=10, rrf_k=60)
+
+    # WHEN querying for a drug name
+    results = retriever.query("omalizumab asthma", top_k=2)
+
+    # THEN dense candidates are widened to candidate_k and chunk_1 (ranked by both) comes first
+    dense.query.assert_called_once_with("omalizumab asthma", top_k=10)
+    assert [r["id"] for r in results] == ["guideline::chunk_1", "guideline::chunk_2"]
+    assert results[0]["rrf_score"] > results[1]["rrf_score"]
+    assert set(results[0]) == {"id", "score", "rrf_score", "context", "source", "chunk_index"}
+    # AND "score" is still the dense similarity
+    assert [r["score"] for r in results] == [0.8, 0.9]
+
+def test_hybrid_retriever_without_lexical_matches_returns_dense_results(mocker, tmp_path):
+    dense = mocker.Mock(collection_name="collections", score_threshold=0.5)
+    dense.query.return_value = [make_doc("a", 0.9), make_doc("b", 0.8)]
+    retriever = HybridRetriever(dense_retriever=dense, lexical_index=BM25Index(tmp_path))
+    assert retriever.query("anything", top_k=1) == [make_doc("a", 0.9)]
+
+def test_hybrid_retriever_drops_weak_lexical_only_hits(mocker, tmp_path):
+    """
+    Tests that a chunk only BM25 found is kept only if its BM25 score reaches min_lexical_score.
+    """
+    # GIVEN a dense search that returns nothing above its threshold and two keyword matches of different strength
+    dense = mocker.Mock(collection_name="collections", score_threshold=0.5)
+    dense.query.return_value = []
+    lexical_index = BM25Index(tmp_path)
+    lexical_index.add_source("guideline", ["Omalizumab omalizumab omalizumab anti-IgE.", "Asthma overview.", "Rhinitis overview."])
+    strong, weak = (lexical_index.search("omalizumab overview")[i]["score"] for i in range(2))
+    retriever = HybridRetriever(dense_retriever=dense, lexical_index=lexical_index, min_lexical_score=(strong + weak) / 2)
+
+    # WHEN querying
+    results = retriever.query("omalizumab overview", top_k=3)
+
+    # THEN only the strong keyword match is returned, without a similarity score
+    assert [(r["id"], r["score"]) for r in results] == [("guideline::chunk_0", None)]
+
+def test_hybrid_retriever_reloads_lexical_index_after_reindexing(mocker, tmp_path):
+    """
+    Tests that a long-lived retriever picks up a rebuilt BM25 index once the dense index revision changes.
+    """
+    # GIVEN a retriever opened on an index without the new chunk
+    dense = mocker.Mock(collection_name="collections", score_threshold=0.5, index_revision="rev1")
+    dense.query.return_value = []
+    old_index = BM25Index(tmp_path)
+    old_index.add_source("guideline", ["Asthma overview."])
+    old_index.save()
+    retriever = HybridRetriever(dense_retriever=dense, lexical_index=BM25Index(tmp_path), min_lexical_score=0.0)
+    assert retriever.query("omalizumab", top_k=1) == []
+
+    # WHEN the documents are re-indexed
+    new_index = BM25Index(tmp_path)
+    new_index.add_source("omalizumab", ["Omalizumab dosing."])
+    new_index.save()
+    dense.index_revision = "rev2"
+
+    # THEN the next query searches the rebuilt lexical index
+    assert [r["id"] for r in retriever.query("omalizumab", top_k=1)] == ["omalizumab::chunk_0"]
+
@@ -1,12 +1,13 @@
 import pytest
 import requests
+import io
 import json
-from classes.llm_client import LLMClient
+from classes.llm_client import LLMClient, LLMErrorToken
 
 @pytest.fixture
 def llm_client():
     """Returns an instance of LLMClient for testing."""
-    return LLMClient(llm_api_url="http://fake-url/v1/chat/completions", llm_model_name="test-llm")
+    return LLMClient(llm_api_url="http://fake-url/v1/chat/completions", llm_model_name="test-llm", backoff_base=0.0)
 
 def test_llm_client_query_success(mocker, llm_client):
     """
@@ -24,7 +25,7 @@ def test_llm_client_query_success(mocker, llm_client):
         }]
     }
     mock_response.json.return_value = api_json_response
-    mocker.patch("requests.post", return_value=mock_response)
+    mocker.patch("requests.Session.post", return_value=mock_response)
     
     # WHEN the query method is called
     prompt = "What is RAG?"
@@ -32,9 +33,9 @@ def test_llm_client_query_success(mocker, llm_client):
     
     # THEN the response should be the content from the mocked API call
     assert response == expected_content
-    # AND requests.post should have been called with the correct data
-    requests.post.assert_called_once()
-    call_args = requests.post.call_args
+    # AND the session's post should have been called with the correct data
+    requests.Session.post.assert_called_once()
+    call_args = requests.Session.post.call_args
     sent_payload = json.loads(call_args.kwargs['data'])
     assert sent_payload['messages'][0]['content'] == prompt
 
@@ -42,11 +43,128 @@ def test_llm_client_query_api_error(mocker, llm_client):
     """
     Tests how the client handles a network error from the requests library.
     """
-    # GIVEN that the requests.post call will raise an exception
-    mocker.patch("requests.post", side_effect=requests.exceptions.RequestException("Network Error"))
+    # GIVEN that the session's post call will raise an exception
+    mocker.patch("requests.Session.post", side_effect=requests.exceptions.RequestException("Network Error"))
     
     # WHEN the query method is called
     response = llm_client.query("This will fail")
     
     # THEN a user-friendly error message should be returned
-    assert response == "Error: Could not connect to the LLM."
\ No newline at end of file
+    assert response == "Error: Could not connect to the LLM."
+
+def test_llm_client_stream_query_yields_tokens(mocker, llm_client):
+    """
+    Tests that stream_query parses server-sent events and yields content tokens in order.
+    """
+    # GIVEN a mocked streaming response in the OpenAI-compatible SSE format
+    sse_lines = [
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        '',
+        'data: {"choices": [{"delta": {"content": "Peanut"}}]}',
+        'data: {"choices": [{"delta": {"content": " allergy"}}]}',
+        ': keep-alive',
+        'data: [DONE]',
+    ]
+    mock_response = mocker.MagicMock()
+    mock_response.__enter__.return_value = mock_response
+    mock_response.iter_lines.return_value = iter(sse_lines)
+    mocker.patch("requests.Session.post", return_value=mock_response)
+
+    # WHEN the response is streamed
+    tokens = list(llm_client.stream_query("What is RAG?"))
+
+    # THEN the content tokens are yielded as they arrive
+    assert tokens == ["Peanut", " allergy"]
+    sent_payload = json.loads(requests.Session.post.call_args.kwargs['data'])
+    assert sent_payload['stream'] is True
+    assert requests.Session.post.call_args.kwargs['stream'] is True
+    # AND time to first token is recorded separately from total time
+    assert llm_client.last_stream_stats["num_tokens"] == 2
+    assert llm_client.last_stream_stats["time_to_first_token"] <= llm_client.last_stream_stats["total_time"]
+
+def test_llm_client_stream_query_marks_error_after_partial_content(mocker, llm_client):
+    """
+    Tests that a stream broken after some tokens ends with an LLMErrorToken the caller can detect.
+    """
+    # GIVEN a stream whose connection drops after the first token
+    def broken_lines(**kwargs):
+        yield 'data: {"choices": [{"delta": {"content": "Epinephrine is"}}]}'
+        raise requests.exceptions.ChunkedEncodingError("Connection broken")
+    mock_response = mocker.MagicMock()
+    mock_response.__enter__.return_value = mock_response
+    mock_response.iter_lines.side_effect = broken_lines
+    mocker.patch("requests.Session.post", return_value=mock_response)
+
+    # WHEN the response is streamed
+    tokens = list(llm_client.stream_query("What treats anaphylaxis?"))
+
+    # THEN the content already sent is followed by an error token
+    assert tokens == ["Epinephrine is", "Error: Could not connect to the LLM."]
+    assert not isinstance(tokens[0], LLMErrorToken)
+    assert isinstance(tokens[1], LLMErrorToken)
+    # AND the broken stream counts as a failure on the circuit breaker
+    stats = llm_client.get_stats()
+    assert stats["failures"] == 1
+    assert stats["circuit_breaker"]["consecutive_failures"] == 1
+
+def test_llm_client_retries_transient_errors(mocker, llm_client):
+    """
+    Tests that a transient 503 is retried over the pooled session with timeouts set.
+    """
+    # GIVEN a backend that answers 503 once and then succeeds
+    unavailable = requests.Response()
+    unavailable.status_code = 503
+    unavailable.raw = io.BytesIO(b"")  # a real response always has a body to close
+    ok = mocker.Mock()
+    ok.json.return_value = {"choices": [{"message": {"content": "Recovered answer."}}]}
+    mocker.patch("requests.Session.post", side_effect=[unavailable, ok])
+
+    # WHEN the query method is called
+    response = llm_client.query("What is RAG?")
+
+    # THEN the retry succeeds and is counted
+    assert response == "Recovered answer."
+    assert requests.Session.post.call_count == 2
+    assert requests.Session.post.call_args.kwargs['timeout'] == (llm_client.connect_timeout, llm_client.read_timeout)
+    stats = llm_client.get_stats()
+    assert stats["requests"] == 2
+    assert stats["retries"] == 1
+    assert stats["circuit_breaker"]["state"] == "closed"
+
+def test_llm_client_closes_failed_responses(mocker, llm_client):
+    """
+    Tests that retried and rejected responses are closed, so streamed connections go back to the pool.
+    """
+    # GIVEN a backend that answers 503 and then 400
+    unavailable = mocker.Mock(status_code=503)
+    unavailable.raise_for_status.side_effect = requests.exceptions.HTTPError(response=unavailable)
+    rejected = mocker.Mock(status_code=400)
+    rejected.raise_for_status.side_effect = requests.exceptions.HTTPError(response=rejected)
+    mocker.patch("requests.Session.post", side_effect=[unavailable, rejected])
+
+    # WHEN a streamed query is made
+    tokens = list(llm_client.stream_query("What is RAG?"))
+
+    # THEN the request fails after one retry and both responses were closed
+    assert tokens == ["Error: Could not connect to the LLM."]
+    unavailable.close.assert_called_once()
+    rejected.close.assert_called_once()
+
+def test_llm_client_circuit_breaker_fails_fast(mocker):
+    """
+    Tests that once the backend keeps failing, the circuit opens and requests are rejected without a network call.
+    """
+    # GIVEN a client that opens its circuit after two failed queries and a backend that is down
+    client = LLMClient(llm_api_url="http://fake-url/v1/chat/completions", llm_model_name="test-llm",
+                       max_retries=0, circuit_failure_threshold=2, circuit_reset_seconds=60)
+    mocker.patch("requests.Session.post", side_effect=requests.exceptions.ConnectionError("Connection refused"))
+
+    # WHEN three queries are made
+    responses = [client.query("This will fail") for _ in range(3)]
+
+    # THEN all fail, but the third never reaches the network
+    assert responses == ["Error: Could not connect to the LLM."] * 3
+    assert requests.Session.post.call_count == 2
+    stats = client.get_stats()
+    assert stats["circuit_rejections"] == 1
+    assert stats["circuit_breaker"]["state"] == "open"
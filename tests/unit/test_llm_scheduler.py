@@ -0,0 +1,64 @@
+import threading
+from classes.llm_scheduler import LLMRequestScheduler
+
+class BlockingLLMClient:
+    """LLM client stand-in whose calls block until released, recording prompts in call order."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def query(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        self.started.set()
+        self.release.wait(timeout=5)
+        return f"Answer to {prompt}"
+
+def test_scheduler_coalesces_identical_in_flight_prompts():
+    """
+    Tests that concurrent callers with the same prompt share one LLM call.
+    """
+    llm_client = BlockingLLMClient()
+    scheduler = LLMRequestScheduler(llm_client, max_concurrency=2)
+
+    # WHEN the same prompt is submitted several times while the first is still running
+    futures = [scheduler.submit("What is asthma?") for _ in range(5)]
+    llm_client.release.set()
+
+    # THEN every caller gets the answer, but the LLM is only called once
+    assert [f.result(timeout=5) for f in futures] == ["Answer to What is asthma?"] * 5
+    assert llm_client.prompts == ["What is asthma?"]
+    stats = scheduler.get_stats()
+    assert stats["coalesced"] == 4
+    assert stats["completed"] == 1
+    scheduler.shutdown()
+
+def test_scheduler_limits_concurrency_and_serves_by_priority():
+    """
+    Tests that only max_concurrency requests run at once and queued requests are served by priority.
+    """
+    llm_client = BlockingLLMClient()
+    scheduler = LLMRequestScheduler(llm_client, max_concurrency=1)
+
+    # GIVEN one running request and three queued with different priorities
+    running = scheduler.submit("first")
+    assert llm_client.started.wait(timeout=5)  # the single worker has picked up the first prompt
+    low = scheduler.submit("low priority", priority=10)
+    high = scheduler.submit("high priority", priority=0)
+    normal = scheduler.submit("normal priority", priority=5)
+
+    # THEN the other requests wait in the queue
+    assert scheduler.get_stats()["queue_depth"] == 3
+    assert scheduler.get_stats()["in_flight"] == 1
+
+    # WHEN the backend answers
+    llm_client.release.set()
+    for future in (running, low, high, normal):
+        future.result(timeout=5)
+
+    # THEN queued prompts were sent in priority order
+    assert llm_client.prompts == ["first", "high priority", "normal priority", "low priority"]
+    assert scheduler.query("direct call") == "Answer to direct call"
+    scheduler.shutdown()
@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+from classes.model_registry import ModelRegistry
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_concurrent_acquires_share_one_load():
+    """
+    Tests that callers asking for a model while it loads wait for that load instead of loading it again.
+    """
+    # GIVEN a slow loader
+    registry = ModelRegistry()
+    loads = []
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return FakeModel("encoder")
+
+    # WHEN four threads acquire the same model at once
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.acquire("text_encoder", "mini", loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # THEN it is loaded once, every caller gets the same object and holds a reference
+    assert len(loads) == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    model_stats = registry.stats()["models"][0]
+    assert model_stats["refs"] == 4 and model_stats["hits"] == 3 and model_stats["loaded"]
+
+def test_eviction_drops_least_recently_used_unreferenced_models():
+    """
+    Tests that above max_models only models no one holds are evicted, oldest first, and are closed.
+    """
+    # GIVEN a registry that keeps two models, one of them still held
+    registry = ModelRegistry(max_models=2)
+    held = registry.acquire("tokenizer", "held", lambda: FakeModel("held"))
+    registry.preload("tokenizer", "old", lambda: FakeModel("old"))
+    old = registry.acquire("tokenizer", "old", lambda: FakeModel("unused"))
+    registry.release("tokenizer", "old")
+
+    # WHEN a third model is loaded
+    registry.preload("cross_encoder", "new", lambda: FakeModel("new"))
+
+    # THEN the unreferenced older model is evicted and closed, and the held one stays
+    assert [model["name"] for model in registry.stats()["models"]] == ["held", "new"]
+    assert old.closed and not held.closed
+    assert registry.evictions == 1
+    # AND an explicit eviction of a held model is refused
+    assert registry.evict("tokenizer", "held") is False
+    assert registry.evict("cross_encoder", "new") is True
+
+def test_failed_load_raises_and_is_retried():
+    """
+    Tests that a loader error reaches the caller and the next acquire() loads again.
+    """
+    # GIVEN a loader that fails once
+    registry = ModelRegistry()
+    attempts = []
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("model not found")
+        return FakeModel("mini")
+
+    # WHEN the model is acquired twice
+    with pytest.raises(OSError):
+        registry.acquire("text_encoder", "mini", loader)
+    model = registry.acquire("text_encoder", "mini", loader)
+
+    # THEN the second call loaded it
+    assert model.name == "mini" and len(attempts) == 2
+
+def test_warmup_loads_in_background_and_logs_failures():
+    """
+    Tests that warmup() preloads models in a thread and a failing load does not stop the others.
+    """
+    # GIVEN a failing load followed by a working one
+    registry = ModelRegistry()
+    def fail():
+        raise OSError("offline")
+
+    # WHEN warmup runs in the background
+    thread = registry.warmup([fail, lambda: registry.preload("text_encoder", "mini", lambda: FakeModel("mini"))])
+    thread.join(timeout=5)
+
+    # THEN the working model is cached without a reference held
+    assert registry.stats()["models"] == [{"kind": "text_encoder", "name": "mini", "refs": 0, "hits": 0, "loaded": True,
+                                           "load_seconds": registry.stats()["models"][0]["load_seconds"]}]
+
+def test_preloaded_model_is_not_evicted_before_first_acquire():
+    """
+    Tests that a warmed-up model stays cached until the step takes it, and becomes evictable once released.
+    """
+    # GIVEN a registry that keeps one model and a preloaded encoder no step has acquired yet
+    registry = ModelRegistry(max_models=1)
+    registry.preload("text_encoder", "mini", lambda: FakeModel("mini"))
+
+    # WHEN another model is loaded and released before the step asks for the encoder
+    registry.acquire("tokenizer", "mini", lambda: FakeModel("tokenizer"))
+    registry.release("tokenizer", "mini")
+
+    # THEN the preloaded encoder is still there and is not loaded again
+    encoder = registry.acquire("text_encoder", "mini", lambda: FakeModel("reloaded"))
+    assert encoder.name == "mini" and not encoder.closed
+    assert [model["name"] for model in registry.stats()["models"]] == ["mini"]
+
+    # AND once released it is evicted like any other model
+    registry.release("text_encoder", "mini")
+    registry.preload("cross_encoder", "new", lambda: FakeModel("new"))
+    assert encoder.closed
+
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+import chromadb
+from classes.hnsw_index_config import HNSWIndexConfig
+from classes.numpy_retriever import NumpyRetriever
+
+def test_numpy_retriever_matches_exact_cosine_search(mocker, tmp_path):
+    """
+    Tests that the NumPy index exported from a collection returns the exact nearest chunks as result dicts.
+    """
+    # GIVEN a collection with three chunks, exported to a NumPy index
+    index_config = HNSWIndexConfig(space="cosine")
+    collection = index_config.get_or_create_collection(chromadb.EphemeralClient(), "numpy-retriever-test")
+    collection.add(ids=["doc::chunk_0", "doc::chunk_1", "doc::chunk_2"],
+                   embeddings=[[2.0, 0.0], [0.6, 0.8], [0.0, 3.0]],
+                   metadatas=[{"text": f"Context {i}.", "source": "doc", "chunk_index": i} for i in range(3)])
+    NumpyRetriever.write_index(collection, tmp_path)
+    mock_model = mocker.patch("classes.base_retriever.TextEncoder.get").return_value
+    mock_model.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    retriever = NumpyRetriever(embedding_model_name="fake-model", collection_name="numpy-retriever-test",
+                               vectordb_dir=tmp_path, score_threshold=0.0, index_config=index_config)
+
+    # WHEN two phrases are queried as a batch
+    results = retriever.query_batch(["first question", "second question"], top_k=2)
+
+    # THEN each gets its exact top-2 chunks, best first, scored by cosine similarity
+    assert [r["id"] for r in results[0]] == ["doc::chunk_0", "doc::chunk_1"]
+    assert [r["id"] for r in results[1]] == ["doc::chunk_2", "doc::chunk_1"]
+    assert results[0][1] == {"id": "doc::chunk_1", "score": 0.6, "context": "Context 1.", "source": "doc", "chunk_index": 1}
+    assert results[1][1]["score"] == 0.8
+    # AND the scores agree with the Chroma collection's cosine distances
+    chroma_distances = collection.query(query_embeddings=[[1.0, 0.0]], n_results=2)["distances"][0]
+    assert np.allclose([1.0 - r["score"] for r in results[0]], chroma_distances, atol=1e-4)
+
+def test_numpy_retriever_without_index_returns_no_results(mocker, tmp_path):
+    mocker.patch("classes.base_retriever.TextEncoder.get")
+    retriever = NumpyRetriever(embedding_model_name="fake-model", collection_name="missing", vectordb_dir=tmp_path)
+    assert retriever.query("anything") == []
+
+def test_numpy_retriever_close_releases_encoder(mocker, tmp_path):
+    """
+    Tests that the shared encoder is acquired on first use, not at construction, and close() releases it once.
+    """
+    # GIVEN a retriever that has used the shared encoder
+    get = mocker.patch("classes.base_retriever.TextEncoder.get")
+    release = mocker.patch("classes.base_retriever.TextEncoder.release")
+    retriever = NumpyRetriever(embedding_model_name="fake-model", collection_name="missing", vectordb_dir=tmp_path)
+    get.assert_not_called()
+    assert retriever.embedding_model is get.return_value
+
+    # WHEN it is closed twice
+    retriever.close()
+    retriever.close()
+
+    # THEN the encoder reference is released once
+    release.assert_called_once_with("fake-model")
+
+
+def test_numpy_retriever_keeps_loaded_index_when_new_version_is_inconsistent(mocker, tmp_path):
+    """
+    Tests that an index version whose matrix and chunk list disagree is not loaded, and a later valid one is.
+    """
+    # GIVEN a retriever that loaded a one-chunk index
+    index_config = HNSWIndexConfig(space="cosine")
+    collection = index_config.get_or_create_collection(chromadb.EphemeralClient(), "numpy-retriever-swap-test")
+    collection.add(ids=["doc::chunk_0"], embeddings=[[1.0, 0.0]], metadatas=[{"text": "Old.", "source": "doc", "chunk_index": 0}])
+    NumpyRetriever.write_index(collection, tmp_path)
+    mocker.patch("classes.base_retriever.TextEncoder.get").return_value.encode.return_value = np.array([[1.0, 0.0]], dtype=np.float32)
+    retriever = NumpyRetriever(embedding_model_name="fake-model", collection_name="numpy-retriever-swap-test",
+                               vectordb_dir=tmp_path, score_threshold=0.0, index_config=index_config)
+
+    # WHEN current.json points at a version with two matrix rows but one chunk ID
+    index_dir = tmp_path / NumpyRetriever.INDEX_DIR_NAME
+    (index_dir / "v_bad").mkdir()
+    np.save(index_dir / "v_bad" / NumpyRetriever.MATRIX_FILE, np.eye(2, dtype=np.float32))
+    (index_dir / "v_bad" / NumpyRetriever.CHUNKS_FILE).write_text(json.dumps({"ids": ["new::chunk_0"], "metadatas": [{}]}))
+    (index_dir / NumpyRetriever.CURRENT_FILE).write_text(json.dumps({"version": "v_bad"}))
+
+    # THEN the previously loaded index keeps answering
+    assert [r["id"] for r in retriever.query("question", top_k=2)] == ["doc::chunk_0"]
+
+    # AND the next valid export is picked up, with the older versions removed
+    collection.add(ids=["doc::chunk_1"], embeddings=[[0.6, 0.8]], metadatas=[{"text": "New.", "source": "doc", "chunk_index": 1}])
+    NumpyRetriever.write_index(collection, tmp_path)
+    assert [r["id"] for r in retriever.query("question", top_k=2)] == ["doc::chunk_0", "doc::chunk_1"]
+    assert len(list(index_dir.glob("v_*"))) == 1
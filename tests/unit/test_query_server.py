@@ -0,0 +1,97 @@
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from classes.llm_scheduler import LLMRequestScheduler, PRIORITIES
+from classes.query_server import QueryServer, QueryServerClient
+
+@pytest.fixture
+def running_server(mocker):
+    """Starts a QueryServer on a free port with mocked retriever and LLM client."""
+    retriever = mocker.Mock()
+    retriever.query.return_value = [{"id": "doc1", "score": 0.9, "context": "Peanut allergy is serious."}]
+    llm_client = mocker.Mock()
+    llm_client.query.return_value = "This is the final answer."
+
+    server = QueryServer(retriever=retriever, llm_client=llm_client, port=0)
+    server.start_background()
+    yield server, retriever, llm_client
+    server.shutdown()
+
+def test_client_retrieves_and_generates_through_server(running_server):
+    """
+    Tests that the thin client reaches the warm retriever and LLM client held by the server.
+    """
+    server, retriever, llm_client = running_server
+    client = QueryServerClient(server.url)
+
+    # WHEN the client checks health, retrieves and generates
+    assert client.health()
+    results = client.retrieve("What is peanut allergy?", top_k=2)
+    response = client.generate("What is peanut allergy?", use_rag=True)
+
+    # THEN the server should use its resident components
+    assert results[0]["id"] == "doc1"
+    retriever.query.assert_any_call("What is peanut allergy?", top_k=2)
+    assert response == "This is the final answer."
+    assert "Peanut allergy is serious." in llm_client.query.call_args[0][0]
+
+def test_server_handles_concurrent_and_bad_requests(running_server):
+    """
+    Tests that concurrent requests are all answered and malformed requests get a 400.
+    """
+    server, _, llm_client = running_server
+    client = QueryServerClient(server.url)
+
+    # WHEN several questions are sent at once
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda i: client.generate(f"question {i}"), range(16)))
+
+    # THEN every request is answered
+    assert responses == ["This is the final answer."] * 16
+    assert llm_client.query.call_count == 16
+
+    # AND a request without a query or with an unknown priority is rejected
+    assert requests.post(f"{server.url}/generate", json={}).status_code == 400
+    assert requests.post(f"{server.url}/generate", json={"query": "q", "priority": "urgent"}).status_code == 400
+
+def test_server_passes_request_priority_to_scheduler(mocker):
+    """
+    Tests that interactive and batch requests reach the LLM request scheduler with their priorities.
+    """
+    # GIVEN a server whose LLM client is a request scheduler
+    scheduler = mocker.Mock(spec=LLMRequestScheduler)
+    scheduler.query.return_value = "Scheduled answer."
+    server = QueryServer(retriever=mocker.Mock(), llm_client=scheduler, port=0)
+    server.start_background()
+    client = QueryServerClient(server.url)
+
+    # WHEN an interactive and a batch question are sent
+    client.generate("interactive question")
+    client.generate("batch question", priority="batch")
+    server.shutdown()
+
+    # THEN each is queued with its priority, interactive first
+    priorities = {call.args[0]: call.kwargs["priority"] for call in scheduler.query.call_args_list}
+    assert priorities == {"interactive question": PRIORITIES["interactive"], "batch question": PRIORITIES["batch"]}
+    assert PRIORITIES["interactive"] < PRIORITIES["batch"]
+
+def test_server_exports_stage_latencies(running_server):
+    """
+    Tests that per-stage timings of answered requests are reported in /stats and in Prometheus format on /metrics.
+    """
+    server, retriever, llm_client = running_server
+    retriever.embedding_cache = None
+    llm_client.get_stats.return_value = {}
+    client = QueryServerClient(server.url)
+
+    # WHEN a RAG question has been answered
+    client.generate("What is peanut allergy?", use_rag=True)
+
+    # THEN its stages are in the stats
+    stages = requests.get(f"{server.url}/stats").json()["stages"]
+    assert {"rag.query", "rag.retrieve", "rag.build_context", "rag.generate"} <= set(stages)
+    assert stages["rag.query"]["p95_ms"] >= stages["rag.generate"]["p50_ms"] >= 0
+    # AND in the Prometheus text export
+    response = requests.get(f"{server.url}/metrics")
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'rag_stage_duration_seconds_count{stage="rag.query"}' in response.text
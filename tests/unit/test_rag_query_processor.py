@@ -1,5 +1,10 @@
 import pytest
+import asyncio
+import json
 from classes.rag_query_processor import RAGQueryProcessor
+from classes.llm_client import LLMErrorToken
+from classes.response_cache import SemanticResponseCache
+from classes.tracer import Tracer
 
 @pytest.fixture
 def mock_llm_client(mocker):
@@ -55,4 +60,162 @@ def test_processor_with_rag_disabled(mock_llm_client, mock_retriever):
     mock_llm_client.query.assert_called_once()
     final_prompt = mock_llm_client.query.call_args[0][0]
     
-    assert final_prompt == "How dangerous is peanut allergy?", "No RAG - expected direct query to LLM."
\ No newline at end of file
+    assert final_prompt == "How dangerous is peanut allergy?", "No RAG - expected direct query to LLM."
+
+def test_processor_reuses_cached_response(mock_llm_client, mock_retriever):
+    """
+    Tests that a repeated question with the same retrieved chunks is answered from the response cache.
+    """
+    # GIVEN a retriever that returns the same chunk and embedding for similar questions
+    mock_retriever.query.return_value = [{"id": "doc1", "context": "Peanut allergy is deadly.", "score": 0.1}]
+    mock_retriever.embed_text.return_value = [0.6, 0.8]
+    mock_retriever.index_revision = "index:1"
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True,
+                                  response_cache=SemanticResponseCache(similarity_threshold=0.95))
+
+    # WHEN the question is asked twice
+    first = processor.query("How dangerous is peanut allergy?")
+    second = processor.query("how dangerous is peanut allergy")
+
+    # THEN the LLM is only called once
+    assert first == second == "This is the final answer."
+    mock_llm_client.query.assert_called_once()
+
+    # WHEN the collection is re-indexed, the LLM is asked again
+    mock_retriever.index_revision = "index:2"
+    processor.query("How dangerous is peanut allergy?")
+    assert mock_llm_client.query.call_count == 2
+
+def test_processor_stream_query_yields_llm_tokens(mock_llm_client, mock_retriever):
+    """
+    Tests that stream_query builds the RAG prompt and passes LLM tokens through as they arrive.
+    """
+    # GIVEN a streaming LLM client and a retriever that finds a document
+    mock_llm_client.stream_query.return_value = iter(["Peanut ", "allergy ", "is serious."])
+    mock_retriever.query.return_value = [{"context": "Peanut allergy is deadly.", "score": 0.1}]
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True)
+
+    # WHEN the query is streamed
+    tokens = list(processor.stream_query("How dangerous is peanut allergy?"))
+
+    # THEN the tokens come straight from the LLM client, which received the RAG prompt
+    assert tokens == ["Peanut ", "allergy ", "is serious."]
+    final_prompt = mock_llm_client.stream_query.call_args[0][0]
+    assert "Context:\n        Peanut allergy is deadly." in final_prompt
+    mock_llm_client.query.assert_not_called()
+
+def test_processor_stream_query_is_traced(mock_llm_client, mock_retriever, tmp_path):
+    """
+    Tests that a streamed query records the same rag.query and rag.generate spans as query().
+    """
+    # GIVEN a tracer and a streaming LLM client
+    mock_llm_client.stream_query.return_value = iter(["Peanut ", "allergy."])
+    mock_retriever.query.return_value = [{"context": "Peanut allergy is deadly.", "score": 0.1}]
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True)
+    processor.tracer = Tracer(jsonl_path=tmp_path / "traces.jsonl")
+
+    # WHEN the query is streamed while the caller traces its own work between tokens
+    for _ in processor.stream_query("How dangerous is peanut allergy?"):
+        with processor.tracer.span("client.write"):
+            pass
+    processor.tracer.close()
+
+    # THEN retrieval and generation nest under rag.query, and the caller's spans do not
+    records = {record["name"]: record for record in map(json.loads, (tmp_path / "traces.jsonl").read_text().splitlines())}
+    query_span = records["rag.query"]
+    assert records["rag.retrieve"]["parent_id"] == query_span["span_id"]
+    assert records["rag.generate"]["parent_id"] == query_span["span_id"]
+    assert records["rag.generate"]["attributes"] == {"tokens": 2, "failed": False}
+    assert query_span["attributes"]["prompt_tokens"] > 0
+    assert records["client.write"]["parent_id"] is None
+
+def test_processor_stream_query_does_not_cache_broken_stream(mock_llm_client, mock_retriever):
+    """
+    Tests that a stream that fails partway is not stored in the response cache.
+    """
+    # GIVEN a response cache and an LLM stream that breaks after one token
+    mock_retriever.query.return_value = [{"id": "doc1", "context": "Epinephrine treats anaphylaxis.", "score": 0.9}]
+    mock_retriever.embed_text.return_value = [0.6, 0.8]
+    mock_retriever.index_revision = "index:1"
+    mock_llm_client.stream_query.return_value = iter(["Epinephrine is ", LLMErrorToken("Error: Could not connect to the LLM.")])
+    response_cache = SemanticResponseCache(similarity_threshold=0.95)
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True, response_cache=response_cache)
+
+    # WHEN the query is streamed
+    tokens = list(processor.stream_query("What treats anaphylaxis?"))
+
+    # THEN the caller sees the partial answer and the error, but nothing is cached
+    assert tokens == ["Epinephrine is ", "Error: Could not connect to the LLM."]
+    assert response_cache.lookup([0.6, 0.8], ["doc1"], "index:1") is None
+
+    # AND the next stream is answered by the LLM again and then cached
+    mock_llm_client.stream_query.return_value = iter(["Epinephrine."])
+    assert list(processor.stream_query("What treats anaphylaxis?")) == ["Epinephrine."]
+    assert response_cache.lookup([0.6, 0.8], ["doc1"], "index:1") == "Epinephrine."
+
+def test_processor_aquery_handles_concurrent_questions(mock_llm_client, mock_retriever):
+    """
+    Tests that aquery answers concurrent questions using the async LLM client and offloaded retrieval.
+    """
+    # GIVEN an async LLM client and a retriever that finds a document
+    async def aquery(prompt):
+        await asyncio.sleep(0.01)
+        return "Async answer."
+    mock_llm_client.aquery = aquery
+    mock_retriever.query.return_value = [{"context": "Peanut allergy is deadly.", "score": 0.1}]
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True, max_concurrency=2)
+
+    # WHEN several questions are processed concurrently
+    async def run():
+        return await asyncio.gather(*(processor.aquery(f"Question {i}?") for i in range(5)))
+    responses = asyncio.run(run())
+
+    # THEN every question is answered through the async client, never the blocking one
+    assert responses == ["Async answer."] * 5
+    assert mock_retriever.query.call_count == 5
+    mock_llm_client.query.assert_not_called()
+
+def test_processor_limits_context_to_token_budget(mock_llm_client, mock_retriever, tmp_path):
+    """
+    Tests that the prompt only contains the chunks that fit the context builder's token budget.
+    """
+    # GIVEN a small context budget and more retrieved text than fits
+    from classes.context_builder import ContextBuilder
+    mock_retriever.query.return_value = [
+        {"id": "1", "context": "Peanut allergy is deadly.", "score": 0.9},
+        {"id": "2", "context": "Unrelated " * 50, "score": 0.6},
+    ]
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True,
+                                  context_builder=ContextBuilder(max_context_tokens=20))
+    processor.tracer = Tracer(jsonl_path=tmp_path / "traces.jsonl")
+
+    # WHEN a query is made
+    processor.query("How dangerous is peanut allergy?")
+    processor.tracer.close()
+
+    # THEN only the top chunk reaches the LLM and the prompt size is recorded
+    final_prompt = mock_llm_client.query.call_args[0][0]
+    assert "Peanut allergy is deadly." in final_prompt
+    assert "Unrelated" not in final_prompt
+    records = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+    query_span = next(record for record in records if record["name"] == "rag.query")
+    assert query_span["attributes"]["prompt_tokens"] > 0
+
+def test_processor_reranks_wide_candidate_set(mock_llm_client, mock_retriever, mocker):
+    """
+    Tests that with a reranker the retriever is asked for max_candidates and only the re-ranked chunks reach the prompt.
+    """
+    # GIVEN a reranker that keeps only the second retrieved chunk
+    mock_retriever.query.return_value = [{"id": "1", "context": "Unrelated text."}, {"id": "2", "context": "Peanut allergy is deadly."}]
+    reranker = mocker.Mock(max_candidates=20)
+    reranker.rerank.return_value = [{"id": "2", "context": "Peanut allergy is deadly.", "rerank_score": 4.2}]
+    processor = RAGQueryProcessor(llm_client=mock_llm_client, retriever=mock_retriever, use_rag=True, reranker=reranker)
+
+    # WHEN a query is made
+    processor.query("How dangerous is peanut allergy?")
+
+    # THEN the candidate set is widened and the prompt only contains the re-ranked chunk
+    mock_retriever.query.assert_called_once_with("How dangerous is peanut allergy?", top_k=20)
+    final_prompt = mock_llm_client.query.call_args[0][0]
+    assert "Peanut allergy is deadly." in final_prompt
+    assert "Unrelated text." not in final_prompt
@@ -0,0 +1,37 @@
+import pytest
+from classes.response_cache import SemanticResponseCache
+
+def test_cache_matches_similar_query_with_same_chunks():
+    """
+    Tests that a close enough query with the same retrieved chunks gets the stored answer.
+    """
+    cache = SemanticResponseCache(similarity_threshold=0.95)
+
+    # GIVEN a cached answer
+    cache.store([1.0, 0.0], ["doc1", "doc2"], "Cached answer.", index_revision="a:1")
+
+    # THEN a near-identical query with the same chunks (in any order) hits
+    assert cache.lookup([0.99, 0.05], ["doc2", "doc1"], index_revision="a:1") == "Cached answer."
+    # AND a dissimilar query or different retrieved chunks miss
+    assert cache.lookup([0.6, 0.8], ["doc1", "doc2"], index_revision="a:1") is None
+    assert cache.lookup([1.0, 0.0], ["doc1", "doc3"], index_revision="a:1") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_cache_evicts_and_invalidates_on_reindex():
+    """
+    Tests size-bounded eviction and invalidation when the index revision changes.
+    """
+    cache = SemanticResponseCache(similarity_threshold=0.95, max_entries=1)
+
+    # GIVEN two answers stored in a cache that holds one entry
+    cache.store([1.0, 0.0], ["doc1"], "First answer.", index_revision="a:1")
+    cache.store([0.0, 1.0], ["doc2"], "Second answer.", index_revision="a:1")
+
+    # THEN the oldest one has been evicted
+    assert cache.lookup([1.0, 0.0], ["doc1"], index_revision="a:1") is None
+    assert cache.lookup([0.0, 1.0], ["doc2"], index_revision="a:1") == "Second answer."
+
+    # WHEN the collection is re-indexed, cached answers are dropped
+    assert cache.lookup([0.0, 1.0], ["doc2"], index_revision="a:2") is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,68 @@
+import pytest
+from classes.retrieval_evaluator import RetrievalEvaluator
+
+LABELS = [
+    {"question": "What treats anaphylaxis?",
+     "relevant": [{"source": "anaphylaxis", "text": "Epinephrine is the first-line, life-saving treatment and must be given without delay."},
+                  {"source": "anaphylaxis", "text": "Call emergency services after giving epinephrine to the patient right away."}]},
+]
+
+def chunk(source, context):
+    return {"id": f"{source}::{context[:10]}", "source": source, "context": context}
+
+def test_chunk_matches_label_despite_case_punctuation_and_splitting():
+    """
+    Tests that a chunk covering part of a labeled passage matches it after normalization, and only from the same source.
+    """
+    # GIVEN an evaluator requiring 5 shared consecutive words
+    evaluator = RetrievalEvaluator(LABELS, min_match_words=5)
+
+    # WHEN chunks hold the tokenizer-cleaned passage, half of it, or the same words from another source
+    cleaned = chunk("anaphylaxis", "epinephrine is the first - line , life - saving treatment")
+    second_half = chunk("anaphylaxis", "... saving treatment and must be given without delay. Next topic")
+    wrong_source = chunk("asthma", "epinephrine is the first - line , life - saving treatment")
+
+    # THEN the first two match the first label and the other source does not
+    assert evaluator.matched_labels(0, cleaned) == {0}
+    assert evaluator.matched_labels(0, second_half) == {0}
+    assert evaluator.matched_labels(0, wrong_source) == set()
+
+def test_score_computes_recall_mrr_and_ndcg():
+    """
+    Tests the per-question metrics for a ranking with an irrelevant first result and one label found.
+    """
+    # GIVEN results ranked: irrelevant, first label, first label again
+    evaluator = RetrievalEvaluator(LABELS, min_match_words=5)
+    results = [chunk("asthma", "inhaled corticosteroids"),
+               chunk("anaphylaxis", "epinephrine is the first-line, life-saving treatment"),
+               chunk("anaphylaxis", "life-saving treatment and must be given without delay")]
+
+    # WHEN the ranking is scored at k=3
+    score = evaluator.score(0, results, top_k=3)
+
+    # THEN half the labels are covered, first hit at rank 2, and the duplicate hit earns no gain
+    assert score["recall"] == 0.5
+    assert score["mrr"] == 0.5
+    ideal = 1.0 + 1.0 / 1.5849625  # two labels at ranks 1 and 2
+    assert score["ndcg"] == pytest.approx((1.0 / 1.5849625) / ideal, rel=1e-5)
+    # AND at k=1 nothing relevant was retrieved
+    assert evaluator.score(0, results, top_k=1) == {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0}
+
+def test_evaluate_averages_metrics_and_reports_latency(mocker):
+    """
+    Tests that evaluate() queries the retriever with every question at the requested top_k.
+    """
+    # GIVEN a retriever returning both labeled passages best first
+    retriever = mocker.Mock()
+    retriever.query.return_value = [chunk("anaphylaxis", LABELS[0]["relevant"][0]["text"]),
+                                    chunk("anaphylaxis", LABELS[0]["relevant"][1]["text"])]
+    evaluator = RetrievalEvaluator(LABELS)
+
+    # WHEN the retriever is evaluated
+    metrics = evaluator.evaluate(retriever, top_k=2)
+
+    # THEN the ranking is perfect and latency is reported
+    retriever.query.assert_called_once_with("What treats anaphylaxis?", top_k=2)
+    assert metrics["recall"] == metrics["mrr"] == metrics["ndcg"] == 1.0
+    assert metrics["questions"] == 1 and metrics["top_k"] == 2
+    assert metrics["latency_p95_ms"] >= metrics["latency_p50_ms"] >= 0
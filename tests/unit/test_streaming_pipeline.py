@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+from classes.streaming_pipeline import StreamingPipeline
+
+@pytest.fixture
+def pipeline_parts(mocker):
+    """Provides mocked ingestor, preparer and loader stages."""
+    ingestor = mocker.Mock()
+    ingestor.file_list = ["a.txt", "empty.txt", "b.pdf"]
+    ingestor.iter_ingested_files.return_value = iter([
+        ("a.txt", ["chunk a1", "chunk a2"], 0.1),
+        ("empty.txt", None, 0.0),
+        ("b.pdf", ["chunk b1"], 0.2),
+    ])
+    preparer = mocker.Mock()
+    preparer.generate_embeddings.side_effect = lambda chunks: np.ones((len(chunks), 3), dtype=np.float32)
+    loader = mocker.Mock()
+    return ingestor, preparer, loader
+
+def test_pipeline_streams_chunks_into_loader(pipeline_parts):
+    """
+    Tests that chunks flow from ingestion through embedding into storage without intermediate files.
+    """
+    ingestor, preparer, loader = pipeline_parts
+    pipeline = StreamingPipeline(ingestor=ingestor, preparer=preparer, loader=loader, queue_size=1)
+
+    # WHEN the pipeline runs
+    pipeline.run(prune_missing_sources=True)
+
+    # THEN every non-empty document is stored in input order with its embeddings
+    stored = [call.args for call in loader.store_chunks.call_args_list]
+    assert [(stem, chunks) for stem, chunks, _ in stored] == [("a", ["chunk a1", "chunk a2"]), ("b", ["chunk b1"])]
+    assert stored[0][2].shape == (2, 3)
+    assert pipeline.num_chunks == 3
+
+    # AND sources outside the file list are pruned before the manifest is saved
+    loader.remove_missing_sources.assert_called_once_with(keep_stems={"a", "empty", "b"})
+    loader.finalize.assert_called_once()
+
+    # AND no intermediate files are written
+    ingestor.save_chunks.assert_not_called()
+    preparer.save_embeddings.assert_not_called()
+
+def test_pipeline_continues_after_stage_failure(pipeline_parts):
+    """
+    Tests that a failure while embedding one document does not stop the others, and that intermediates can be persisted.
+    """
+    ingestor, preparer, loader = pipeline_parts
+    preparer.generate_embeddings.side_effect = [RuntimeError("out of memory"), np.ones((1, 3), dtype=np.float32)]
+    pipeline = StreamingPipeline(ingestor=ingestor, preparer=preparer, loader=loader, persist_intermediates=True)
+
+    # WHEN the pipeline runs
+    pipeline.run()
+
+    # THEN only the second document is stored, and its intermediates are saved
+    assert [call.args[0] for call in loader.store_chunks.call_args_list] == ["b"]
+    assert ingestor.save_chunks.call_count == 2
+    preparer.save_embeddings.assert_called_once()
+    loader.remove_missing_sources.assert_not_called()
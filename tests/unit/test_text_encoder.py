@@ -0,0 +1,48 @@
+import pytest
+from classes.model_registry import ModelRegistry
+from classes.text_encoder import TextEncoder
+
+def test_get_caches_encoders_per_constructor_arguments(mocker):
+    """
+    Tests that TextEncoder.get() does not hand out an encoder built with different arguments.
+    """
+    # GIVEN an encoder constructor that does not load a model
+    constructed = []
+    def fake_init(self, model_name, **kwargs):
+        constructed.append((model_name, kwargs))
+        self.model_name = model_name
+    mocker.patch.object(TextEncoder, "__init__", fake_init)
+    TextEncoder.clear_shared()
+
+    # WHEN the same model is requested with default and with custom batching
+    default = TextEncoder.get("mini")
+    custom = TextEncoder.get("mini", batch_size=8)
+
+    # THEN each arguments set gets its own encoder, and the same arguments share one
+    assert custom is not default
+    assert TextEncoder.get("mini", batch_size=8) is custom
+    assert constructed == [("mini", {}), ("mini", {"batch_size": 8})]
+    # AND release() with the same arguments drops the matching reference
+    TextEncoder.release("mini", batch_size=8)
+    TextEncoder.release("mini", batch_size=8)
+    TextEncoder.release("mini")
+    assert [model["refs"] for model in ModelRegistry.get().stats()["models"] if model["kind"] == TextEncoder.REGISTRY_KIND] == [0, 0]
+    ModelRegistry.get().clear(TextEncoder.REGISTRY_KIND)
+
+def test_failed_model_load_releases_tokenizer(mocker):
+    """
+    Tests that the tokenizer reference taken by the constructor is dropped when the model cannot be loaded.
+    """
+    # GIVEN a tokenizer that loads and a model that does not
+    mocker.patch("classes.text_encoder.AutoTokenizer.from_pretrained", return_value=object())
+    mocker.patch("classes.text_encoder.AutoModel.from_pretrained", side_effect=OSError("offline"))
+    TextEncoder.clear_shared()
+
+    # WHEN the encoder is requested
+    with pytest.raises(OSError):
+        TextEncoder.get("broken-model")
+
+    # THEN no reference to the shared tokenizer is left behind, and no encoder is cached
+    models = ModelRegistry.get().stats()["models"]
+    assert [(model["kind"], model["refs"]) for model in models] == [("tokenizer", 0)]
+    TextEncoder.clear_shared()
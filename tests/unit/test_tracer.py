@@ -0,0 +1,125 @@
+import asyncio
+import json
+import pytest
+from classes.tracer import Tracer
+
+@pytest.fixture
+def tracer(tmp_path):
+    """Provides a tracer that exports spans to a JSON-lines file."""
+    tracer = Tracer(jsonl_path=tmp_path / "traces.jsonl")
+    yield tracer
+    tracer.close()
+
+def read_records(tracer):
+    assert tracer.flush()
+    return [json.loads(line) for line in tracer.jsonl_path.read_text().splitlines()]
+
+def test_nested_spans_share_a_trace_and_are_exported(tracer):
+    """
+    Tests that spans opened inside another span become its children and every span is written as a JSON line.
+    """
+    # WHEN a query span wraps a retrieval and a generation stage
+    with tracer.span("rag.query", use_rag=True):
+        with tracer.span("rag.retrieve") as span:
+            span.set(chunks=3)
+        with tracer.span("rag.generate"):
+            pass
+
+    # THEN all three spans are exported, children first, under the same trace
+    records = read_records(tracer)
+    assert [r["name"] for r in records] == ["rag.retrieve", "rag.generate", "rag.query"]
+    root = records[2]
+    assert root["parent_id"] is None and root["attributes"] == {"use_rag": True}
+    assert all(r["trace_id"] == root["span_id"] for r in records)
+    assert records[0]["parent_id"] == root["span_id"]
+    assert records[0]["attributes"] == {"chunks": 3}
+
+def test_concurrent_tasks_get_separate_traces(tracer):
+    """
+    Tests that spans of concurrently running asyncio tasks do not nest into each other.
+    """
+    # GIVEN two queries whose stages interleave
+    async def handle(name):
+        with tracer.span("rag.query", query=name):
+            await asyncio.sleep(0.01)
+            with tracer.span("rag.generate", query=name):
+                await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(handle("a"), handle("b"))
+
+    # WHEN both are processed at once
+    asyncio.run(run())
+
+    # THEN each generate span belongs to the query of its own task
+    records = read_records(tracer)
+    roots = {r["attributes"]["query"]: r["span_id"] for r in records if r["name"] == "rag.query"}
+    for record in records:
+        if record["name"] == "rag.generate":
+            assert record["parent_id"] == roots[record["attributes"]["query"]]
+
+def test_stats_and_prometheus_report_percentiles_and_errors(tracer):
+    """
+    Tests that durations are aggregated into percentiles and failing stages are counted.
+    """
+    # GIVEN 100 recorded durations of 1..100 ms and one failing stage
+    for ms in range(1, 101):
+        tracer.record("retriever.search", ms / 1000.0)
+    with pytest.raises(ValueError):
+        with tracer.span("llm.query"):
+            raise ValueError("backend down")
+
+    # WHEN the aggregates are read
+    stats = tracer.stats()
+    metrics = tracer.to_prometheus()
+
+    # THEN the percentiles reflect the distribution
+    search = stats["retriever.search"]
+    assert search["count"] == 100
+    assert search["p50_ms"] == pytest.approx(50.5)
+    assert search["p99_ms"] == pytest.approx(99.01)
+    assert search["max_ms"] == pytest.approx(100.0)
+    # AND the failure is counted and exported
+    assert stats["llm.query"]["errors"] == 1
+    assert read_records(tracer)[-1]["error"] == "ValueError"
+    assert 'rag_stage_duration_seconds{stage="retriever.search",quantile="0.95"} 0.095050' in metrics
+    assert 'rag_stage_duration_seconds_count{stage="retriever.search"} 100' in metrics
+    assert 'rag_stage_errors_total{stage="llm.query"} 1' in metrics
+
+def test_disabled_tracer_records_nothing(tracer):
+    """
+    Tests that a disabled tracer still runs the traced code but keeps no spans.
+    """
+    # GIVEN a disabled tracer
+    tracer.configure(enabled=False)
+
+    # WHEN a stage is traced
+    with tracer.span("rag.query") as span:
+        result = 42
+
+    # THEN the code ran, but nothing was recorded
+    assert result == 42 and span is None
+    tracer.record("ingest.file", 0.5)
+    assert tracer.stats() == {}
+    assert tracer.flush()
+    assert tracer.jsonl_path.read_text() == ""
+
+def test_jsonl_export_rotates_by_size(tmp_path):
+    """
+    Tests that the export file is rotated once it reaches jsonl_max_bytes and only jsonl_backups old files are kept.
+    """
+    # GIVEN a tracer whose export file holds about one span
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(jsonl_path=path, jsonl_max_bytes=100, jsonl_backups=2)
+
+    # WHEN four spans are finished, one at a time
+    for i in range(4):
+        tracer.record("ingest.file", 0.1, file=i)
+        assert tracer.flush()
+    tracer.close()
+
+    # THEN the newest spans are in the backups, the oldest was dropped
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"]
+    assert path.read_text() == ""
+    assert json.loads((tmp_path / "traces.jsonl.1").read_text())["attributes"] == {"file": 3}
+    assert json.loads((tmp_path / "traces.jsonl.2").read_text())["attributes"] == {"file": 2}